@@ -0,0 +1,52 @@
+"""
+Streaming AI analysis for AI Medical Assistant
+
+The streaming approve route forwards the model's output to the admin UI as
+server-sent events while it is generated:
+
+    event: delta     {"text": "...next piece of model output..."}
+    event: medicine  {...medicine entry, as soon as its name is complete...}
+    event: fallback  {"reason": "..."}   (model failed; mock analysis follows)
+    event: done      {"message": ..., "analysis": {...final persisted result...}}
+    event: error     {"error": "..."}
+
+Medicines are detected with the same keyword containment as
+parse_gemini_response_to_json, so the incremental entries match the final
+result; the final analysis is still built from the full response and saved
+in one transaction.
+"""
+
+import json
+
+
+def sse(event, data):
+    """
+    One server-sent event frame
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class IncrementalMedicineParser:
+    """
+    Reports each medicine keyword once it appears in the streamed text
+    """
+
+    def __init__(self, patterns):
+        self.patterns = patterns
+        # Re-scan this much of the old text so keywords split across chunks are found
+        self.overlap = max((len(keyword) for keyword in patterns), default=1) - 1
+        self.tail = ''
+        self.found = set()
+
+    def feed(self, chunk):
+        """
+        Medicine entries whose keyword first appears with this chunk
+        """
+        window = self.tail + chunk.lower()
+        self.tail = window[-self.overlap:] if self.overlap else ''
+        completed = []
+        for keyword, medicine_info in self.patterns.items():
+            if keyword not in self.found and keyword in window:
+                self.found.add(keyword)
+                completed.append(dict(medicine_info))
+        return completed
@@ -1,14 +1,40 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, send_file, Response, stream_with_context, g
 from models import db, User, Prescription
+import review_queue
+import dashboard_cache
+import reanalysis
+import retention
+from knowledge_base import MEDICINE_PATTERNS, GEMINI_MEDICINE_PATTERNS, ANALYSIS_PROMPT, IMAGE_PROMPT_NOTE
+from image_preprocess import is_image, prepare as prepare_image
+from chunked_analysis import needs_chunking, analyze_in_chunks
+from interactions import check_interactions
+from fuzzy import TrigramIndex
+from idempotency import idempotent
+from db_config import build_engine_options, configure_engine
+from db_routing import STICKY_HEADER, replica_binds, replica_reads, setup_routing
+from json_provider import FastJSONProvider, splice_json, json_array, raw_json_response
+from export import EXPORT_FORMATS, export_stream
+from analysis_stream import IncrementalMedicineParser, sse
+from logging_config import setup_logging, log_payload
+import metrics
+import profiling
+from compression import setup_compression
+import jobs
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
+import sqlalchemy as sa
+import io
 import json
+import logging
 import os
 from datetime import datetime
+import time
 import uuid
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
+logger = setup_logging(app)
 
 # CORS configuration for production
 if os.environ.get('FLASK_ENV') == 'production':
@@ -16,14 +42,16 @@ if os.environ.get('FLASK_ENV') == 'production':
     CORS(app, origins=[
         os.environ.get('FRONTEND_URL', 'https://your-frontend-url.railway.app'),
         'http://localhost:3000'  # For local development
-    ])
+    ], expose_headers=[STICKY_HEADER])
 else:
     # In development, allow all origins
-    CORS(app)
+    CORS(app, expose_headers=[STICKY_HEADER])
 
 # Config - Updated for Railway deployment
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///' + os.path.join(os.path.dirname(os.path.abspath(__file__)), 'db.sqlite3'))
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = build_engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+app.config['SQLALCHEMY_BINDS'] = replica_binds()  # Read replicas from DATABASE_REPLICA_URLS, if any
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
@@ -56,65 +84,141 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'txt'}
 
 # Initialize database
 db.init_app(app)
+with app.app_context():
+    configure_engine(db.engine)
+    metrics.setup_metrics(app, db.engine)
+    profiling.setup_profiling(app, db.engine)
+setup_compression(app)
+
+# Replicas get the same SQL listeners, so routed reads count toward request metrics and profiles
+def instrument_engine(engine):
+    metrics.instrument_engine(engine)
+    profiling.instrument_engine(engine)
+
+setup_routing(app, db, instrument_engine)
+dashboard_cache.setup_dashboard_cache(app.config['SQLALCHEMY_DATABASE_URI'])
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def analyze_prescription_with_ai(text, image_data=None):
+def model_contents(text, file_path=None):
+    """
+    Prompt for the model, with the preprocessed upload attached when it is an image
+    """
+    prompt = ANALYSIS_PROMPT.format(text=text)
+    if not is_image(file_path):
+        return prompt
+    data = retention.read_upload(app.config['UPLOAD_FOLDER'], file_path)
+    if data is None:
+        return prompt
+    try:
+        image = prepare_image(data, file_path)
+    except Exception as e:
+        logger.warning("Could not preprocess image %s, sending text only: %s", file_path, e)
+        return prompt
+    return [prompt + IMAGE_PROMPT_NOTE, {"mime_type": image["mime_type"], "data": image["data"]}]
+
+def analyze_prescription_with_ai(text, file_path=None):
     """
     Analyze prescription using Gemini AI for comprehensive medical analysis
     """
     try:
         # If Gemini API key is not set, fall back to mock analysis
         if not model:
-            print("Gemini API key not found, using mock analysis")
+            logger.info("Gemini model not configured, using mock analysis")
             return analyze_prescription_mock(text)
         
-        print(f"Attempting Gemini AI analysis for text: {text[:100]}...")
-        
-        # Use the same prompt format as the working Python script
-        prompt = f"""
-You are a medical assistant. Analyze the prescription below:
+        # Long prescriptions are analyzed page by page and merged
+        if needs_chunking(text):
+            return analyze_in_chunks(text, _analyze_chunk, file_path)
 
-\"\"\"{text}\"\"\"
-
-Extract the following:
-- List of medicines with dose and purpose
-- Food to avoid for each medicine
-- Safety considerations (e.g. pregnancy, diabetic)
-- Nutrition tips
-- Safety recommendations
-
-Format the answer clearly and simply.
-"""
+        log_payload(logger, "Starting Gemini analysis", text, text_chars=len(text or ''))
         
-        # Call Gemini API
-        print("Calling Gemini API...")
-        response = model.generate_content(prompt)
-        ai_response = response.text.strip()
-        print(f"Gemini API response received: {ai_response[:200]}...")
+        # Use the same prompt format as the working Python script, plus the image if any
+        contents = model_contents(text, file_path)
         
-        # Convert the text response to our JSON format
+        # Call Gemini API
+        started = time.perf_counter()
         try:
-            # Parse the text response and convert to structured format
-            analysis_result = parse_gemini_response_to_json(ai_response, text)
-            print("Gemini AI analysis completed successfully!")
-            return analysis_result
-            
-        except Exception as parse_error:
-            print(f"Failed to parse Gemini response: {parse_error}")
-            print(f"Raw response: {ai_response}")
-            # Fall back to mock analysis if parsing fails
-            return analyze_prescription_mock(text)
+            response = model.generate_content(contents)
+            ai_response = response.text.strip()
+        except Exception:
+            metrics.record_model_call("error", time.perf_counter() - started)
+            raise
+        metrics.record_model_call("success", time.perf_counter() - started)
+        return analysis_from_response(ai_response, text)
             
     except Exception as e:
-        print(f"Gemini API error: {e}")
-        print(f"Error type: {type(e).__name__}")
-        import traceback
-        print(f"Full traceback: {traceback.format_exc()}")
+        logger.error("Gemini API error (%s): %s", type(e).__name__, e, exc_info=logger.isEnabledFor(logging.DEBUG))
         # Fall back to mock analysis
         return analyze_prescription_mock(text)
 
+def analysis_from_response(ai_response, text):
+    """
+    Convert the model's text response to our JSON format, falling back to the mock analysis
+    """
+    log_payload(logger, "Gemini response received", ai_response)
+    try:
+        # Parse the text response and convert to structured format
+        analysis_result = parse_gemini_response_to_json(ai_response, text)
+        logger.info("Gemini analysis completed",
+                    extra={"medicines": len(analysis_result.get("medicines", []))})
+        return analysis_result
+
+    except Exception as parse_error:
+        logger.warning("Failed to parse Gemini response: %s", parse_error)
+        log_payload(logger, "Unparsed Gemini response", ai_response)
+        # Fall back to mock analysis if parsing fails
+        return analyze_prescription_mock(text)
+
+def _analyze_chunk(chunk, file_path):
+    # Runs on the chunk pool, outside the caller's app context
+    with app.app_context():
+        return analyze_prescription_with_ai(chunk, file_path)
+
+def stream_analysis_with_ai(text, file_path=None):
+    """
+    Streaming variant of analyze_prescription_with_ai: yields (event, data) pairs
+    while the model generates, then ("result", analysis)
+    """
+    if not model:
+        logger.info("Gemini model not configured, using mock analysis")
+        result = analyze_prescription_mock(text)
+        for medicine in result["medicines"]:
+            yield "medicine", medicine
+        yield "result", result
+        return
+
+    if needs_chunking(text):
+        # Chunks run concurrently, so there is no single token stream to forward
+        result = analyze_prescription_with_ai(text, file_path)
+        for medicine in result["medicines"]:
+            yield "medicine", medicine
+        yield "result", result
+        return
+
+    parser = IncrementalMedicineParser(GEMINI_MEDICINE_PATTERNS)
+    chunks = []
+    started = time.perf_counter()
+    try:
+        for chunk in model.generate_content(model_contents(text, file_path), stream=True):
+            piece = chunk.text
+            if not chunks:
+                metrics.REGISTRY.observe("model_first_token_seconds", time.perf_counter() - started)
+            chunks.append(piece)
+            yield "delta", {"text": piece}
+            for medicine in parser.feed(piece):
+                yield "medicine", medicine
+    except Exception as e:
+        metrics.record_model_call("error", time.perf_counter() - started)
+        logger.error("Gemini API error (%s): %s", type(e).__name__, e, exc_info=logger.isEnabledFor(logging.DEBUG))
+        yield "fallback", {"reason": "AI analysis unavailable, using fallback analysis"}
+        yield "result", analyze_prescription_mock(text)
+        return
+    metrics.record_model_call("success", time.perf_counter() - started)
+
+    yield "result", analysis_from_response("".join(chunks).strip(), text)
+
 def parse_gemini_response_to_json(gemini_response, original_text):
     """
     Parse the Gemini text response and convert it to our JSON format
@@ -127,75 +231,23 @@ def parse_gemini_response_to_json(gemini_response, original_text):
             "nutrition_tips": [],
             "analysis_confidence": 0.9,
             "recommendations": [],
+            "interactions": [],
             "raw_gemini_response": gemini_response  # Include the original response
         }
         
         # Extract medicines from the response
         medicines = []
+        matches = []
         text_lower = gemini_response.lower()
         
         # Look for medicine patterns in the response
-        medicine_patterns = {
-            'remdesivir': {
-                "name": "Remdesivir (Remdec)",
-                "purpose": "Antiviral medication for COVID-19 treatment",
-                "dosage": "200mg STAT, then 100mg once daily for 4 days",
-                "price": "৳5000-15000",
-                "alternatives": ["Molnupiravir", "Paxlovid", "Favipiravir"],
-                "foodToAvoid": ["Grapefruit juice", "Alcohol", "High-fat meals"],
-                "side_effects": ["Nausea", "Liver problems", "Kidney issues", "Allergic reactions"]
-            },
-            'tocilizumab': {
-                "name": "Tocilizumab (Actemra)",
-                "purpose": "Immunosuppressive medication for severe COVID-19",
-                "dosage": "400mg once daily for 2 doses with 2-day gap",
-                "price": "৳15000-30000",
-                "alternatives": ["Baricitinib", "Dexamethasone", "Methylprednisolone"],
-                "foodToAvoid": ["Raw foods", "Unpasteurized dairy", "Alcohol"],
-                "side_effects": ["Infection risk", "Liver problems", "Allergic reactions", "Blood clotting issues"]
-            },
-            'phexin': {
-                "name": "Phexin (Cephalexin)",
-                "purpose": "Antibiotic for bacterial infections",
-                "dosage": "500mg 2-3 times daily",
-                "price": "৳30-80",
-                "alternatives": ["Amoxicillin", "Azithromycin", "Clarithromycin"],
-                "foodToAvoid": ["Dairy products (2 hours before/after)", "Alcohol"],
-                "side_effects": ["Diarrhea", "Nausea", "Stomach upset", "Allergic reactions"]
-            },
-            'zeedol': {
-                "name": "Zeedol PT (Paracetamol + Tramadol)",
-                "purpose": "Pain reliever and fever reducer",
-                "dosage": "As prescribed by doctor",
-                "price": "৳15-30",
-                "alternatives": ["Paracetamol", "Ibuprofen", "Diclofenac"],
-                "foodToAvoid": ["Alcohol", "Grapefruit juice"],
-                "side_effects": ["Drowsiness", "Nausea", "Constipation", "Dizziness"]
-            },
-            'stolin': {
-                "name": "Stolin Gum Paint",
-                "purpose": "Oral antiseptic for gum problems",
-                "dosage": "Apply 2-3 times daily",
-                "price": "৳50-120",
-                "alternatives": ["Betadine mouthwash", "Chlorhexidine", "Salt water rinse"],
-                "foodToAvoid": ["Spicy foods", "Hot foods", "Alcohol"],
-                "side_effects": ["Temporary staining", "Taste changes", "Mild irritation"]
-            },
-            'colgate': {
-                "name": "Colgate Plax Mouthwash",
-                "purpose": "Oral hygiene and fresh breath",
-                "dosage": "Rinse 2-3 times daily",
-                "price": "৳80-150",
-                "alternatives": ["Listerine", "Betadine mouthwash", "Salt water rinse"],
-                "foodToAvoid": ["None specific"],
-                "side_effects": ["Temporary burning sensation", "Taste changes"]
-            }
-        }
+        medicine_patterns = GEMINI_MEDICINE_PATTERNS
         
         # Check for medicines in the response
         for keyword, medicine_info in medicine_patterns.items():
             if keyword in text_lower:
-                medicines.append(medicine_info)
+                medicines.append(dict(medicine_info))
+                matches.append((keyword, medicine_info["name"]))
         
         # Extract nutrition tips from the response
         nutrition_tips = []
@@ -252,11 +304,12 @@ def parse_gemini_response_to_json(gemini_response, original_text):
         result["explanation"] = explanation
         result["nutrition_tips"] = nutrition_tips
         result["recommendations"] = recommendations
+        result["interactions"] = check_interactions(matches)
         
         return result
         
     except Exception as e:
-        print(f"Error parsing Gemini response: {e}")
+        logger.warning("Error parsing Gemini response: %s", e)
         # Return a basic structure with the raw response
         return {
             "medicines": [],
@@ -264,9 +317,13 @@ def parse_gemini_response_to_json(gemini_response, original_text):
             "nutrition_tips": ["Maintain a balanced diet", "Stay hydrated", "Get adequate rest"],
             "analysis_confidence": 0.7,
             "recommendations": ["Consult your doctor for proper interpretation"],
+            "interactions": [],
             "raw_gemini_response": gemini_response
         }
 
+# Trigram index for catching misspelled medicine names in the mock analysis
+MEDICINE_INDEX = TrigramIndex(MEDICINE_PATTERNS)
+
 def analyze_prescription_mock(text):
     """
     Fallback mock analysis when Gemini API is not available
@@ -274,6 +331,7 @@ def analyze_prescription_mock(text):
     try:
         # Mock AI analysis based on common prescription patterns
         medicines = []
+        matches = []
         nutrition_tips = []
         explanation = ""
         
@@ -281,228 +339,19 @@ def analyze_prescription_mock(text):
         text_lower = text.lower()
         
         # Enhanced medicine detection with more medications
-        medicine_patterns = {
-            # Antibiotics
-            'phexin': {
-                "name": "Phexin (Cephalexin)",
-                "purpose": "Antibiotic for bacterial infections",
-                "dosage": "500mg 2-3 times daily",
-                "price": "৳30-80",
-                "alternatives": ["Amoxicillin", "Azithromycin", "Clarithromycin"],
-                "foodToAvoid": ["Dairy products (2 hours before/after)", "Alcohol"],
-                "side_effects": ["Diarrhea", "Nausea", "Stomach upset", "Allergic reactions"]
-            },
-            'amoxicillin': {
-                "name": "Amoxicillin",
-                "purpose": "Antibiotic for bacterial infections",
-                "dosage": "As prescribed by doctor",
-                "price": "৳20-50",
-                "alternatives": ["Azithromycin", "Clarithromycin", "Cephalexin"],
-                "foodToAvoid": ["Dairy products (2 hours before/after)"],
-                "side_effects": ["Diarrhea", "Nausea", "Allergic reactions"]
-            },
-            'azithromycin': {
-                "name": "Azithromycin",
-                "purpose": "Antibiotic for bacterial infections",
-                "dosage": "As prescribed by doctor",
-                "price": "৳40-100",
-                "alternatives": ["Amoxicillin", "Clarithromycin", "Cephalexin"],
-                "foodToAvoid": ["Dairy products", "Alcohol"],
-                "side_effects": ["Nausea", "Diarrhea", "Stomach pain"]
-            },
-            
-            # COVID-19 and antiviral medications
-            'remdec': {
-                "name": "Remdec (Remdesivir)",
-                "purpose": "Antiviral medication for COVID-19 treatment",
-                "dosage": "200mg STAT, then 100mg once daily for 4 days",
-                "price": "৳5000-15000",
-                "alternatives": ["Molnupiravir", "Paxlovid", "Favipiravir"],
-                "foodToAvoid": ["Grapefruit juice", "Alcohol", "High-fat meals"],
-                "side_effects": ["Nausea", "Liver problems", "Kidney issues", "Allergic reactions"]
-            },
-            'remdesivir': {
-                "name": "Remdesivir",
-                "purpose": "Antiviral medication for COVID-19 treatment",
-                "dosage": "200mg STAT, then 100mg once daily for 4 days",
-                "price": "৳5000-15000",
-                "alternatives": ["Molnupiravir", "Paxlovid", "Favipiravir"],
-                "foodToAvoid": ["Grapefruit juice", "Alcohol", "High-fat meals"],
-                "side_effects": ["Nausea", "Liver problems", "Kidney issues", "Allergic reactions"]
-            },
-            'actemra': {
-                "name": "Actemra (Tocilizumab)",
-                "purpose": "Immunosuppressive medication for severe COVID-19",
-                "dosage": "400mg once daily for 2 doses with 2-day gap",
-                "price": "৳15000-30000",
-                "alternatives": ["Baricitinib", "Dexamethasone", "Methylprednisolone"],
-                "foodToAvoid": ["Raw foods", "Unpasteurized dairy", "Alcohol"],
-                "side_effects": ["Infection risk", "Liver problems", "Allergic reactions", "Blood clotting issues"]
-            },
-            'tocilizumab': {
-                "name": "Tocilizumab",
-                "purpose": "Immunosuppressive medication for severe COVID-19",
-                "dosage": "400mg once daily for 2 doses with 2-day gap",
-                "price": "৳15000-30000",
-                "alternatives": ["Baricitinib", "Dexamethasone", "Methylprednisolone"],
-                "foodToAvoid": ["Raw foods", "Unpasteurized dairy", "Alcohol"],
-                "side_effects": ["Infection risk", "Liver problems", "Allergic reactions", "Blood clotting issues"]
-            },
-            
-            # Pain relievers and fever reducers
-            'paracetamol': {
-                "name": "Paracetamol/Acetaminophen",
-                "purpose": "Fever reducer and pain reliever",
-                "dosage": "500-1000mg every 4-6 hours",
-                "price": "৳5-15",
-                "alternatives": ["Ibuprofen", "Aspirin", "Diclofenac"],
-                "foodToAvoid": ["Alcohol", "High-fat meals"],
-                "side_effects": ["Nausea", "Liver problems (in high doses)"]
-            },
-            'napa': {
-                "name": "Napa (Paracetamol)",
-                "purpose": "Fever reducer and pain reliever",
-                "dosage": "500-1000mg every 4-6 hours",
-                "price": "৳5-15",
-                "alternatives": ["Ace", "Paracetamol", "Fevco"],
-                "foodToAvoid": ["Alcohol", "High-fat meals"],
-                "side_effects": ["Nausea", "Liver problems (in high doses)"]
-            },
-            'zeedol': {
-                "name": "Zeedol PT (Paracetamol + Tramadol)",
-                "purpose": "Pain reliever and fever reducer",
-                "dosage": "As prescribed by doctor",
-                "price": "৳15-30",
-                "alternatives": ["Paracetamol", "Ibuprofen", "Diclofenac"],
-                "foodToAvoid": ["Alcohol", "Grapefruit juice"],
-                "side_effects": ["Drowsiness", "Nausea", "Constipation", "Dizziness"]
-            },
-            'ibuprofen': {
-                "name": "Ibuprofen",
-                "purpose": "Pain reliever, fever reducer, anti-inflammatory",
-                "dosage": "200-400mg every 4-6 hours",
-                "price": "৳8-20",
-                "alternatives": ["Paracetamol", "Aspirin", "Diclofenac"],
-                "foodToAvoid": ["Alcohol", "Spicy foods"],
-                "side_effects": ["Stomach upset", "Heartburn", "Dizziness"]
-            },
-            
-            # Stomach acid reducers
-            'omeprazole': {
-                "name": "Omeprazole",
-                "purpose": "Reduce stomach acid production",
-                "dosage": "20-40mg daily",
-                "price": "৳15-30",
-                "alternatives": ["Esomeprazole", "Lansoprazole", "Pantoprazole"],
-                "foodToAvoid": ["Spicy foods", "Citrus fruits", "Coffee"],
-                "side_effects": ["Headache", "Diarrhea", "Vitamin B12 deficiency"]
-            },
-            'sergel': {
-                "name": "Sergel (Omeprazole)",
-                "purpose": "Reduce stomach acid production",
-                "dosage": "20-40mg daily",
-                "price": "৳15-30",
-                "alternatives": ["Esomeprazole", "Lansoprazole", "Pantoprazole"],
-                "foodToAvoid": ["Spicy foods", "Citrus fruits", "Coffee"],
-                "side_effects": ["Headache", "Diarrhea", "Vitamin B12 deficiency"]
-            },
-            'pantoprazole': {
-                "name": "Pantoprazole",
-                "purpose": "Reduce stomach acid production",
-                "dosage": "20-40mg daily",
-                "price": "৳20-40",
-                "alternatives": ["Omeprazole", "Esomeprazole", "Lansoprazole"],
-                "foodToAvoid": ["Spicy foods", "Citrus fruits", "Coffee"],
-                "side_effects": ["Headache", "Diarrhea", "Nausea"]
-            },
-            
-            # Oral care products
-            'stolin': {
-                "name": "Stolin Gum Paint",
-                "purpose": "Oral antiseptic for gum problems",
-                "dosage": "Apply 2-3 times daily",
-                "price": "৳50-120",
-                "alternatives": ["Betadine mouthwash", "Chlorhexidine", "Salt water rinse"],
-                "foodToAvoid": ["Spicy foods", "Hot foods", "Alcohol"],
-                "side_effects": ["Temporary staining", "Taste changes", "Mild irritation"]
-            },
-            'colgate': {
-                "name": "Colgate Plax Mouthwash",
-                "purpose": "Oral hygiene and fresh breath",
-                "dosage": "Rinse 2-3 times daily",
-                "price": "৳80-150",
-                "alternatives": ["Listerine", "Betadine mouthwash", "Salt water rinse"],
-                "foodToAvoid": ["None specific"],
-                "side_effects": ["Temporary burning sensation", "Taste changes"]
-            },
-            'oral-b': {
-                "name": "Oral-B Pro 2 2000N",
-                "purpose": "Electric toothbrush for better oral hygiene",
-                "dosage": "Use 2 times daily for 2 minutes",
-                "price": "৳2000-4000",
-                "alternatives": ["Manual toothbrush", "Other electric toothbrushes"],
-                "foodToAvoid": ["None specific"],
-                "side_effects": ["Gum sensitivity initially", "None serious"]
-            },
-            
-            # Antihistamines
-            'cetirizine': {
-                "name": "Cetirizine",
-                "purpose": "Antihistamine for allergies",
-                "dosage": "10mg once daily",
-                "price": "৳10-25",
-                "alternatives": ["Loratadine", "Fexofenadine", "Chlorpheniramine"],
-                "foodToAvoid": ["Alcohol", "Grapefruit juice"],
-                "side_effects": ["Drowsiness", "Dry mouth", "Headache"]
-            },
-            'loratadine': {
-                "name": "Loratadine",
-                "purpose": "Antihistamine for allergies",
-                "dosage": "10mg once daily",
-                "price": "৳15-30",
-                "alternatives": ["Cetirizine", "Fexofenadine", "Chlorpheniramine"],
-                "foodToAvoid": ["Alcohol", "Grapefruit juice"],
-                "side_effects": ["Headache", "Dry mouth", "Fatigue"]
-            },
-            
-            # Antacids
-            'ranitidine': {
-                "name": "Ranitidine",
-                "purpose": "Reduce stomach acid and treat ulcers",
-                "dosage": "150-300mg twice daily",
-                "price": "৳10-25",
-                "alternatives": ["Omeprazole", "Pantoprazole", "Famotidine"],
-                "foodToAvoid": ["Spicy foods", "Citrus fruits", "Coffee"],
-                "side_effects": ["Headache", "Dizziness", "Constipation"]
-            },
-            
-            # Vitamins and supplements
-            'vitamin': {
-                "name": "Vitamin Supplements",
-                "purpose": "Nutritional support",
-                "dosage": "As prescribed by doctor",
-                "price": "৳50-200",
-                "alternatives": ["Natural food sources", "Other vitamin brands"],
-                "foodToAvoid": ["None specific"],
-                "side_effects": ["Nausea (if taken on empty stomach)", "None serious"]
-            },
-            
-            # Cough and cold medicines
-            'dextromethorphan': {
-                "name": "Dextromethorphan",
-                "purpose": "Cough suppressant",
-                "dosage": "As prescribed by doctor",
-                "price": "৳20-50",
-                "alternatives": ["Honey", "Salt water gargle", "Other cough syrups"],
-                "foodToAvoid": ["Alcohol", "Grapefruit juice"],
-                "side_effects": ["Drowsiness", "Dizziness", "Nausea"]
-            }
-        }
+        medicine_patterns = MEDICINE_PATTERNS
+        
+        # Misspelled names (e.g. "Remdisivir") that the exact check would miss
+        fuzzy_hits = MEDICINE_INDEX.match_text(text_lower)
         
         # Check for each medicine pattern
         for keyword, medicine_info in medicine_patterns.items():
             if keyword in text_lower:
-                medicines.append(medicine_info)
+                medicines.append(dict(medicine_info))
+                matches.append((keyword, medicine_info["name"]))
+            elif keyword in fuzzy_hits:
+                medicines.append(dict(medicine_info, matched_from=fuzzy_hits[keyword]))
+                matches.append((keyword, medicine_info["name"]))
         
         # Add specific nutrition tips based on detected medicines
         if any('antibiotic' in med['purpose'].lower() for med in medicines):
@@ -590,19 +439,47 @@ def analyze_prescription_mock(text):
                 "Don't skip doses",
                 "Store medications properly",
                 "Consult your doctor if you experience severe side effects"
-            ]
+            ],
+            "interactions": check_interactions(matches)
         }
         
     except Exception as e:
-        print(f"Mock Analysis error: {e}")
+        logger.exception("Mock analysis error: %s", e)
         return {
             "medicines": [],
             "explanation": "Unable to analyze prescription at this time. Please consult your healthcare provider.",
             "nutrition_tips": ["Maintain a balanced diet", "Stay hydrated"],
             "analysis_confidence": 0.0,
-            "recommendations": ["Consult your doctor for proper interpretation"]
+            "recommendations": ["Consult your doctor for proper interpretation"],
+            "interactions": []
         }
 
+def pending_analysis_json():
+    return json.dumps({
+        "medicines": [],
+        "explanation": "Pending admin review",
+        "nutrition_tips": [],
+        "analysis_confidence": 0.0,
+        "recommendations": ["Your prescription is under review by our medical team"]
+    })
+
+def rejection_analysis_json(reason):
+    return json.dumps({
+        "medicines": [],
+        "explanation": f"Prescription rejected: {reason}",
+        "nutrition_tips": [],
+        "analysis_confidence": 0.0,
+        "recommendations": ["Please consult with your healthcare provider"]
+    })
+
+BULK_ACTIONS = {'approve', 'reject', 'delete', 'status'}
+MAX_BULK_ACTIONS = int(os.environ.get('MAX_BULK_ACTIONS', '500'))
+# Each AI approval is a model call made while the request waits
+MAX_BULK_AI_APPROVALS = int(os.environ.get('MAX_BULK_AI_APPROVALS', '20'))
+
+def positive_int(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
 # Simple admin authentication check
 def require_admin(f):
     def decorated_function(*args, **kwargs):
@@ -614,6 +491,7 @@ def require_admin(f):
 
 # Route: Get all users
 @app.route("/users", methods=["GET"])
+@replica_reads
 def get_users():
     users = User.query.all()
     return jsonify([
@@ -696,6 +574,7 @@ def login():
 
 # Route: Upload and analyze prescription
 @app.route('/analyze', methods=['POST'])
+@idempotent
 def analyze_prescription():
     try:
         user_id = request.form.get('user_id')
@@ -704,6 +583,10 @@ def analyze_prescription():
         
         if not user_id:
             return jsonify({"error": "Missing user_id"}), 400
+        try:
+            user_id = int(user_id)
+        except ValueError:
+            return jsonify({"error": "Invalid user_id"}), 400
         
         if not text and not file:
             return jsonify({"error": "Please provide prescription text or upload a file"}), 400
@@ -721,6 +604,7 @@ def analyze_prescription():
             full_file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
             file.save(full_file_path)
             file_type = file.content_type
+            metrics.record_upload(os.path.getsize(full_file_path))
             
             # Store only the filename in database for easier URL construction
             file_path = unique_filename
@@ -736,17 +620,14 @@ def analyze_prescription():
         new_rx.raw_text = text
         new_rx.file_path = file_path
         new_rx.file_type = file_type
-        new_rx.analysis_json = json.dumps({
-            "medicines": [],
-            "explanation": "Pending admin review",
-            "nutrition_tips": [],
-            "analysis_confidence": 0.0,
-            "recommendations": ["Your prescription is under review by our medical team"]
-        })
+        new_rx.analysis_json = pending_analysis_json()
         new_rx.status = 'pending'  # Changed from 'analyzed' to 'pending'
         
         db.session.add(new_rx)
+        db.session.flush()
+        review_queue.enqueue(new_rx)
         db.session.commit()
+        dashboard_cache.invalidate([user_id])
 
         return jsonify({
             "message": "Prescription submitted for review",
@@ -755,32 +636,56 @@ def analyze_prescription():
         }), 201
 
     except Exception as e:
-        print(f"Error in analyze_prescription: {e}")
+        logger.exception("Error in analyze_prescription: %s", e)
         return jsonify({"error": "Failed to submit prescription"}), 500
 
 # Route: Get prescriptions for user
 @app.route('/dashboard', methods=['GET'])
+@replica_reads
 def get_prescriptions_for_user():
     user_id = request.args.get('user_id')
     if not user_id:
         return jsonify({"error": "Missing user_id"}), 400
 
+    cached, generation = dashboard_cache.get(user_id)
+    if cached is not None:
+        return raw_json_response(cached)
+
     prescriptions = Prescription.query.filter_by(user_id=user_id).order_by(Prescription.created_at.desc()).all()
 
-    return jsonify([
-        {
+    # Stored analysis JSON is spliced in as-is, without a decode/encode round trip
+    body = json_array([
+        splice_json({
             "id": p.id,
             "raw_text": p.raw_text,
             "file_path": p.file_path,
             "file_type": p.file_type,
-            "analysis": json.loads(p.analysis_json),
             "timestamp": p.created_at.strftime("%Y-%m-%d %H:%M"),
             "status": p.status
-        } for p in prescriptions
+        }, analysis=p.analysis_json) for p in prescriptions
     ])
+    dashboard_cache.put(user_id, generation, body, from_replica=bool(g.get('db_replica_reads')))
+    return raw_json_response(body)
+
+def admin_prescription_json(p, user):
+    return splice_json({
+        "id": p.id,
+        "user": {
+            "id": user.id,
+            "name": f"{user.first_name} {user.last_name}",
+            "email": user.email
+        },
+        "raw_text": p.raw_text,
+        "file_path": p.file_path,
+        "file_type": p.file_type,
+        "timestamp": p.created_at.strftime("%Y-%m-%d %H:%M"),
+        "status": p.status,
+        "created_at": p.created_at.isoformat()
+    }, analysis=p.analysis_json)
 
 # Route: Get all prescriptions for admin
 @app.route('/admin/prescriptions', methods=['GET'])
+@replica_reads
 @require_admin
 def get_all_prescriptions():
     try:
@@ -791,33 +696,18 @@ def get_all_prescriptions():
             user = User.query.get(p.user_id)
             if not user:
                 continue  # Skip if user not found
-                
-            analysis_data = json.loads(p.analysis_json)
             
-            result.append({
-                "id": p.id,
-                "user": {
-                    "id": user.id,
-                    "name": f"{user.first_name} {user.last_name}",
-                    "email": user.email
-                },
-                "raw_text": p.raw_text,
-                "file_path": p.file_path,
-                "file_type": p.file_type,
-                "analysis": analysis_data,
-                "timestamp": p.created_at.strftime("%Y-%m-%d %H:%M"),
-                "status": p.status,
-                "created_at": p.created_at.isoformat()
-            })
+            result.append(admin_prescription_json(p, user))
         
-        return jsonify(result)
+        return raw_json_response(json_array(result))
     except Exception as e:
-        print(f"Error getting all prescriptions: {e}")
+        logger.exception("Error getting all prescriptions: %s", e)
         return jsonify({"error": "Failed to get prescriptions"}), 500
 
 # Route: Update prescription status and analysis (admin only)
 @app.route('/admin/prescription/<int:prescription_id>', methods=['PUT'])
 @require_admin
+@idempotent
 def update_prescription_admin(prescription_id):
     try:
         data = request.json
@@ -829,24 +719,32 @@ def update_prescription_admin(prescription_id):
         # Update status
         if 'status' in data and data['status']:
             prescription.status = data['status']
+            if prescription.status != 'pending':
+                review_queue.complete([prescription_id])
+            else:
+                review_queue.enqueue_missing([prescription_id])
         
         # Update analysis if provided
         if 'analysis' in data and data['analysis']:
             prescription.analysis_json = json.dumps(data['analysis'])
+            reanalysis.record(prescription_id, prescription.raw_text, data['analysis'], 'custom')
         
+        user_id = prescription.user_id
         db.session.commit()
+        dashboard_cache.invalidate([user_id])
         
         return jsonify({
             "message": "Prescription updated successfully",
             "prescription_id": prescription_id
         }), 200
     except Exception as e:
-        print(f"Error updating prescription: {e}")
+        logger.exception("Error updating prescription %s: %s", prescription_id, e)
         return jsonify({"error": "Failed to update prescription"}), 500
 
 # Route: Approve prescription with AI analysis
 @app.route('/admin/prescription/<int:prescription_id>/approve', methods=['POST'])
 @require_admin
+@idempotent
 def approve_prescription(prescription_id):
     try:
         data = request.json or {}
@@ -862,20 +760,79 @@ def approve_prescription(prescription_id):
         # Update prescription
         prescription.analysis_json = json.dumps(analysis_result)
         prescription.status = 'approved'
+        review_queue.complete([prescription_id])
+        reanalysis.record(prescription_id, prescription.raw_text, analysis_result,
+                          'custom' if data.get('custom_analysis') else 'ai')
         
+        user_id = prescription.user_id
         db.session.commit()
+        dashboard_cache.invalidate([user_id])
         
         return jsonify({
             "message": "Prescription approved successfully",
             "analysis": analysis_result
         }), 200
     except Exception as e:
-        print(f"Error approving prescription: {e}")
+        logger.exception("Error approving prescription %s: %s", prescription_id, e)
         return jsonify({"error": "Failed to approve prescription"}), 500
 
+# Route: Approve prescription, streaming the AI analysis as server-sent events
+@app.route('/admin/prescription/<int:prescription_id>/approve/stream', methods=['POST'])
+@require_admin
+def approve_prescription_stream(prescription_id):
+    prescription = db.session.get(Prescription, prescription_id)
+    if prescription is None:
+        return jsonify({"error": "Prescription not found"}), 404
+    # A stream can't be replayed under an Idempotency-Key; a retried approval is refused instead
+    if prescription.status == 'approved':
+        return jsonify({"error": "Prescription is already approved"}), 409
+    raw_text, file_path = prescription.raw_text, prescription.file_path
+    # Don't hold a transaction open while the model generates
+    db.session.rollback()
+
+    def events():
+        analysis_result = None
+        for event, data in stream_analysis_with_ai(raw_text, file_path):
+            if event == "result":
+                analysis_result = data
+            else:
+                yield sse(event, data)
+
+        # Persist only the complete analysis, in one transaction
+        try:
+            prescription = db.session.get(Prescription, prescription_id)
+            if prescription is None:
+                yield sse("error", {"error": "Prescription not found"})
+                return
+            if prescription.status == 'approved':
+                # Another approval of the same prescription finished first
+                yield sse("error", {"error": "Prescription is already approved"})
+                return
+            prescription.analysis_json = json.dumps(analysis_result)
+            prescription.status = 'approved'
+            review_queue.complete([prescription_id])
+            reanalysis.record(prescription_id, raw_text, analysis_result, 'ai')
+            user_id = prescription.user_id
+            db.session.commit()
+            dashboard_cache.invalidate([user_id])
+        except Exception as e:
+            db.session.rollback()
+            logger.exception("Error approving prescription %s: %s", prescription_id, e)
+            yield sse("error", {"error": "Failed to approve prescription"})
+            return
+
+        yield sse("done", {"message": "Prescription approved successfully", "analysis": analysis_result})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Route: Reject prescription
 @app.route('/admin/prescription/<int:prescription_id>/reject', methods=['POST'])
 @require_admin
+@idempotent
 def reject_prescription(prescription_id):
     try:
         data = request.json or {}
@@ -883,53 +840,260 @@ def reject_prescription(prescription_id):
         
         # Update with rejection reason
         rejection_reason = data.get('reason', 'Prescription rejected by admin')
-        prescription.analysis_json = json.dumps({
-            "medicines": [],
-            "explanation": f"Prescription rejected: {rejection_reason}",
-            "nutrition_tips": [],
-            "analysis_confidence": 0.0,
-            "recommendations": ["Please consult with your healthcare provider"]
-        })
+        prescription.analysis_json = rejection_analysis_json(rejection_reason)
         prescription.status = 'rejected'
+        review_queue.complete([prescription_id])
         
+        user_id = prescription.user_id
         db.session.commit()
+        dashboard_cache.invalidate([user_id])
         
         return jsonify({
             "message": "Prescription rejected successfully"
         }), 200
     except Exception as e:
-        print(f"Error rejecting prescription: {e}")
+        logger.exception("Error rejecting prescription %s: %s", prescription_id, e)
         return jsonify({"error": "Failed to reject prescription"}), 500
 
+# Route: Apply approve/reject/delete/status actions to many prescriptions (admin only)
+@app.route('/admin/prescriptions/bulk', methods=['POST'])
+@require_admin
+@idempotent
+def bulk_prescriptions():
+    data = request.json or {}
+    items = data.get('actions')
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Provide a non-empty 'actions' list"}), 400
+    if len(items) > MAX_BULK_ACTIONS:
+        return jsonify({"error": f"At most {MAX_BULK_ACTIONS} actions per request"}), 400
+
+    results = []
+    valid = {}
+    for item in items:
+        item = item if isinstance(item, dict) else {}
+        pid, action = item.get('id'), item.get('action')
+        result = {"id": pid, "action": action, "ok": False}
+        results.append(result)
+        if not isinstance(pid, int) or isinstance(pid, bool) or action not in BULK_ACTIONS:
+            result["error"] = "Invalid id or action"
+        elif pid in valid:
+            result["error"] = "Duplicate id in request"
+        elif action == 'status' and not item.get('status'):
+            result["error"] = "Missing status"
+        else:
+            valid[pid] = (item, result)
+
+    ai_approvals = sum(1 for item, _ in valid.values() if item['action'] == 'approve' and not item.get('custom_analysis'))
+    if ai_approvals > MAX_BULK_AI_APPROVALS:
+        return jsonify({"error": f"At most {MAX_BULK_AI_APPROVALS} AI approvals per request; "
+                                 "send custom_analysis or split the batch"}), 400
+
+    try:
+        rows = {}
+        if valid:
+            rows = {r.id: r for r in db.session.query(Prescription.id, Prescription.user_id,
+                                                      Prescription.raw_text, Prescription.file_path)
+                    .filter(Prescription.id.in_(list(valid))).all()}
+        # The SELECT began a transaction; end it so none stays open across the model calls below
+        db.session.rollback()
+
+        approvals, rejections, statuses, deletions, files, analyzed = [], {}, {}, [], [], []
+        for pid, (item, result) in valid.items():
+            row = rows.get(pid)
+            if row is None:
+                result["error"] = "Prescription not found"
+                continue
+            action = item['action']
+            if action == 'approve':
+                # Analysis runs before the transaction so the write phase stays short
+                analysis = item.get('custom_analysis') or analyze_prescription_with_ai(row.raw_text, row.file_path)
+                db.session.rollback()  # Nothing is written yet; drop any read transaction the analysis began
+                approvals.append({"id": pid, "analysis_json": json.dumps(analysis), "status": 'approved'})
+                analyzed.append((pid, row.raw_text, analysis, 'custom' if item.get('custom_analysis') else 'ai'))
+            elif action == 'reject':
+                rejections.setdefault(item.get('reason') or 'Prescription rejected by admin', []).append(pid)
+            elif action == 'status':
+                statuses.setdefault(item['status'], []).append(pid)
+            else:
+                deletions.append(pid)
+                if row.file_path:
+                    files.append(row.file_path)
+            result["ok"] = True
+
+        # One transaction, one set-based statement per action group
+        review_queue.complete([a["id"] for a in approvals] + deletions
+                              + [pid for ids in rejections.values() for pid in ids]
+                              + [pid for status, ids in statuses.items() if status != 'pending' for pid in ids])
+        if approvals:
+            db.session.bulk_update_mappings(Prescription, approvals)
+            for args in analyzed:
+                reanalysis.record(*args)
+        for reason, ids in rejections.items():
+            db.session.execute(sa.update(Prescription).where(Prescription.id.in_(ids))
+                               .values(status='rejected', analysis_json=rejection_analysis_json(reason))
+                               .execution_options(synchronize_session=False))
+        for status, ids in statuses.items():
+            db.session.execute(sa.update(Prescription).where(Prescription.id.in_(ids))
+                               .values(status=status).execution_options(synchronize_session=False))
+        # Prescriptions moved back to pending go back in the review queue
+        review_queue.enqueue_missing(statuses.get('pending', []))
+        if deletions:
+            reanalysis.forget(deletions)
+            retention.forget(deletions)
+            db.session.execute(sa.delete(Prescription).where(Prescription.id.in_(deletions))
+                               .execution_options(synchronize_session=False))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Error applying bulk prescription actions: %s", e)
+        return jsonify({"error": "Failed to apply bulk actions"}), 500
+    dashboard_cache.invalidate({rows[r["id"]].user_id for r in results if r["ok"]})
+
+    # Remove uploads only once the rows are gone, off the request path
+    if files:
+        jobs.submit('delete_uploads', retention.remove_uploads, app, files)
+
+    succeeded = sum(1 for r in results if r["ok"])
+    return jsonify({
+        "message": f"Applied {succeeded} of {len(results)} actions",
+        "results": results
+    }), 200
+
+# Route: Review queue summary (admin only)
+@app.route('/admin/queue', methods=['GET'])
+@require_admin
+def review_queue_stats():
+    return jsonify(review_queue.stats())
+
+# Route: Lease the next pending prescriptions to a reviewer (admin only)
+@app.route('/admin/queue/claim', methods=['POST'])
+@require_admin
+def claim_review_items():
+    data = request.json or {}
+    reviewer = data.get('reviewer')
+    if not reviewer:
+        return jsonify({"error": "Missing reviewer"}), 400
+    count, lease_seconds = data.get('count', 10), data.get('lease_seconds')
+    if not positive_int(count):
+        return jsonify({"error": "count must be a positive integer"}), 400
+    if lease_seconds is not None and not positive_int(lease_seconds):
+        return jsonify({"error": "lease_seconds must be a positive integer"}), 400
+
+    try:
+        token, expires_at, ids = review_queue.claim(reviewer, count, lease_seconds)
+        rows = (db.session.query(Prescription, User).join(User, User.id == Prescription.user_id)
+                .filter(Prescription.id.in_(ids)).all()) if ids else []
+        by_id = {p.id: admin_prescription_json(p, u) for p, u in rows}
+
+        body = splice_json({
+            "reviewer": reviewer,
+            "claim_token": token,
+            "lease_expires_at": expires_at.isoformat()
+        }, prescriptions=json_array([by_id[pid] for pid in ids if pid in by_id]))
+        return raw_json_response(body)
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Error claiming review items: %s", e)
+        return jsonify({"error": "Failed to claim review items"}), 500
+
+# Route: Extend or give back leases (admin only)
+@app.route('/admin/queue/<any(renew, release):op>', methods=['POST'])
+@require_admin
+def update_review_leases(op):
+    data = request.json or {}
+    reviewer, ids = data.get('reviewer'), data.get('ids')
+    if not reviewer or not isinstance(ids, list):
+        return jsonify({"error": "Provide reviewer and a list of ids"}), 400
+    lease_seconds = data.get('lease_seconds')
+    if lease_seconds is not None and not positive_int(lease_seconds):
+        return jsonify({"error": "lease_seconds must be a positive integer"}), 400
+
+    try:
+        if op == 'renew':
+            held, expires_at = review_queue.renew(reviewer, ids, lease_seconds)
+            return jsonify({"renewed": held, "lease_expires_at": expires_at.isoformat()})
+        return jsonify({"released": review_queue.release(reviewer, ids)})
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Error updating review leases (%s): %s", op, e)
+        return jsonify({"error": f"Failed to {op} leases"}), 500
+
+# Route: Preview which analyses a knowledge-base or prompt change affects (admin only)
+@app.route('/admin/reanalysis/plan', methods=['GET'])
+@require_admin
+def reanalysis_plan():
+    include_prompt = request.args.get('include_prompt', '').lower() in ('1', 'true', 'yes')
+    return jsonify(reanalysis.plan(include_prompt))
+
+# Route: Start a background re-analysis of affected prescriptions (admin only)
+@app.route('/admin/reanalysis', methods=['POST'])
+@require_admin
+def start_reanalysis():
+    data = request.json or {}
+    try:
+        job = reanalysis.start(
+            app,
+            analyze_prescription_with_ai,
+            include_prompt=bool(data.get('include_prompt')),
+            batch_size=data.get('batch_size'),
+            throttle_seconds=data.get('throttle_seconds')
+        )
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Error starting re-analysis: %s", e)
+        return jsonify({"error": "Failed to start re-analysis"}), 500
+    if job is None:
+        return jsonify({"error": "A re-analysis job is already running"}), 409
+    return jsonify(reanalysis.job_status(job)), 202
+
+# Route: Re-analysis job progress (admin only)
+@app.route('/admin/reanalysis/<int:job_id>', methods=['GET'])
+@require_admin
+def reanalysis_progress(job_id):
+    job = db.session.get(reanalysis.ReanalysisJob, job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(reanalysis.job_status(job))
+
 # Route: Get uploaded file
 @app.route('/uploads/<filename>')
+@replica_reads
 def uploaded_file(filename):
     try:
-        print(f"Requesting file: {filename}")
-        print(f"Upload folder: {app.config['UPLOAD_FOLDER']}")
-        full_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        print(f"Full path: {full_path}")
-        print(f"File exists: {os.path.exists(full_path)}")
+        logger.debug("Serving upload", extra={"upload": filename})
+        if not os.path.isfile(os.path.join(app.config['UPLOAD_FOLDER'], filename)):
+            # Older uploads may have been compressed or moved to cold storage
+            data = retention.read_upload(app.config['UPLOAD_FOLDER'], filename)
+            if data is not None:
+                return send_file(io.BytesIO(data), download_name=filename)
         return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
     except Exception as e:
-        print(f"Error serving file {filename}: {e}")
+        logger.warning("Error serving file %s: %s", filename, e)
         return jsonify({"error": "File not found"}), 404
 
 # Route: Delete prescription
 @app.route('/prescription/<int:prescription_id>', methods=['DELETE'])
+@idempotent
 def delete_prescription(prescription_id):
     try:
         prescription = Prescription.query.get_or_404(prescription_id)
+        file_path = prescription.file_path
+        user_id = prescription.user_id
         
-        # Delete associated file if exists
-        if prescription.file_path and os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], prescription.file_path)):
-            os.remove(os.path.join(app.config['UPLOAD_FOLDER'], prescription.file_path))
-        
+        review_queue.complete([prescription_id])
+        reanalysis.forget([prescription_id])
+        retention.forget([prescription_id])
         db.session.delete(prescription)
         db.session.commit()
+        dashboard_cache.invalidate([user_id])
+        
+        # Delete associated file from whichever storage tier holds it
+        if file_path:
+            retention.remove_uploads(app, [file_path])
         
         return jsonify({"message": "Prescription deleted successfully"}), 200
     except Exception as e:
+        logger.exception("Error deleting prescription %s: %s", prescription_id, e)
         return jsonify({"error": "Failed to delete prescription"}), 500
 
 # Route: Health check
@@ -937,8 +1101,59 @@ def delete_prescription(prescription_id):
 def health_check():
     return jsonify({"status": "healthy", "timestamp": datetime.utcnow().isoformat()})
 
+# Route: Prometheus metrics
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Route: List stored slow-request profiles (admin only)
+@app.route('/admin/profiles', methods=['GET'])
+@require_admin
+def list_profiles():
+    return jsonify(profiling.list_profiles())
+
+# Route: Get or download a stored profile (admin only)
+@app.route('/admin/profiles/<profile_id>', methods=['GET'])
+@require_admin
+def get_profile(profile_id):
+    if request.args.get('format') == 'prof':
+        path = profiling.find_profile(profile_id, '.prof')
+        if not path or not os.path.exists(path):
+            return jsonify({"error": "Profile not found"}), 404
+        return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                         download_name=f"{profile_id}.prof")
+
+    path = profiling.find_profile(profile_id)
+    if not path:
+        return jsonify({"error": "Profile not found"}), 404
+    return send_file(path, mimetype='application/json')
+
+# Route: Storage tiers and archived analyses (admin only)
+@app.route('/admin/retention', methods=['GET'])
+@require_admin
+def retention_stats():
+    return jsonify(retention.stats())
+
+# Route: Start a retention pass in the background (admin only)
+@app.route('/admin/retention/run', methods=['POST'])
+@require_admin
+def run_retention():
+    if not retention.start(app):
+        return jsonify({"error": "A retention pass is already running"}), 409
+    return jsonify({"message": "Retention run started"}), 202
+
+# Route: Archived analysis fields of a prescription (admin only)
+@app.route('/admin/prescription/<int:prescription_id>/archive', methods=['GET'])
+@require_admin
+def archived_analysis(prescription_id):
+    fields = retention.load_archived_fields(prescription_id)
+    if fields is None:
+        return jsonify({"error": "No archived analysis for this prescription"}), 404
+    return jsonify({"prescription_id": prescription_id, "fields": fields})
+
 # Route: Get all users for admin
 @app.route('/admin/users', methods=['GET'])
+@replica_reads
 @require_admin
 def get_all_users():
     try:
@@ -967,14 +1182,50 @@ def get_all_users():
         
         return jsonify(result)
     except Exception as e:
-        print(f"Error getting all users: {e}")
+        logger.exception("Error getting all users: %s", e)
         return jsonify({"error": "Failed to get users"}), 500
 
+# Route: Stream export of prescriptions or users (admin only)
+@app.route('/admin/export/<table>', methods=['GET'])
+@replica_reads
+@require_admin
+def export_table(table):
+    if table not in ('prescriptions', 'users'):
+        return jsonify({"error": "Unknown export table"}), 404
+
+    fmt = request.args.get('format', 'ndjson').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": "Format must be ndjson or csv"}), 400
+
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    filename = f"{table}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{fmt}" + ('.gz' if compress else '')
+
+    headers = {
+        "Content-Disposition": f"attachment; filename={filename}",
+        "X-Accel-Buffering": "no"  # Disable proxy buffering so rows flow immediately
+    }
+
+    # A .gz file, not a Content-Encoding, so clients save it still compressed
+    return Response(
+        stream_with_context(export_stream(table, fmt, compress)),
+        mimetype='application/gzip' if compress else EXPORT_FORMATS[fmt],
+        headers=headers
+    )
+
+def _prescription_status_counts():
+    rows = db.session.query(Prescription.status, db.func.count(Prescription.id)).group_by(Prescription.status).all()
+    return {(("status", status or "unknown"),): count for status, count in rows}
+
+metrics.REGISTRY.gauge("prescriptions_by_status", _prescription_status_counts,
+                       "Prescriptions per status; status=pending is the review queue depth")
+
 # Initialize database tables
 def init_db():
     with app.app_context():
         try:
             db.create_all()
+            review_queue.backfill()
+            reanalysis.backfill()
             print("Database tables created successfully!")
         except Exception as e:
             print(f"Error creating database tables: {e}")
@@ -0,0 +1,430 @@
+"""
+ASGI entry point for AI Medical Assistant
+
+Serves the I/O-bound routes natively async, so one process can hold
+thousands of slow uploads and model calls without a worker per request:
+
+- POST /analyze streams the upload to disk with aiofiles
+- POST /admin/prescription/<id>/approve awaits the Gemini async client
+
+Both use an async SQLAlchemy engine (aiosqlite / asyncpg) over the same
+models. Existing helpers (review queue, re-analysis index) run unchanged
+through AsyncSession.run_sync. Every other route is the Flask app, mounted
+through WSGIMiddleware on a thread pool.
+
+Flask's request hooks do not run for the async routes. They get the
+request-id echo, HTTP request metrics and the read-your-writes marker
+(X-DB-Primary-Until and its cookie) from request_hooks() below. Response
+compression, request profiling and the per-request SQL counters are
+Flask-only: these routes return small JSON bodies and their SQL runs on
+the async engine.
+
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT
+
+Requires the packages in requirements-asgi.txt.
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from functools import wraps
+
+import aiofiles
+import aiofiles.os
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from werkzeug.utils import secure_filename
+
+import app as flask_app
+import dashboard_cache
+import idempotency
+import metrics
+import reanalysis
+import review_queue
+from chunked_analysis import needs_chunking
+from db_config import async_database_url, build_async_engine_options, configure_engine
+from db_routing import READ_YOUR_WRITES_SECONDS, STICKY_COOKIE, STICKY_HEADER, primary_until
+from logging_config import get_logger
+from models import Prescription, IdempotencyRecord
+
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+logger = get_logger('asgi')
+
+# The URL Flask-SQLAlchemy resolved (relative SQLite paths live in the instance folder)
+with flask_app.app.app_context():
+    _database_uri = flask_app.db.engine.url.render_as_string(hide_password=False)
+engine = create_async_engine(async_database_url(_database_uri), **build_async_engine_options(_database_uri))
+if engine.dialect.name == 'sqlite':
+    configure_engine(engine.sync_engine)
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+def _error(message, status):
+    return JSONResponse({"error": message}, status_code=status)
+
+
+def request_hooks(route):
+    """
+    What the Flask after_request hooks add: metrics, X-Request-ID and the read-your-writes marker
+    """
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(request):
+            started = time.perf_counter()
+            response = await handler(request)
+            labels = (("method", request.method), ("route", route))
+            metrics.REGISTRY.inc("http_requests_total", labels + (("status", str(response.status_code)),))
+            metrics.REGISTRY.observe("http_request_duration_seconds", time.perf_counter() - started, labels)
+
+            response.headers['X-Request-ID'] = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+            if response.status_code < 400:
+                value = primary_until()
+                response.headers[STICKY_HEADER] = value
+                response.set_cookie(STICKY_COOKIE, value, max_age=int(READ_YOUR_WRITES_SECONDS) + 1,
+                                    httponly=True, samesite='lax')
+            return response
+        return wrapper
+    return decorator
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+def within_upload_limit(handler):
+    """
+    Refuse bodies larger than MAX_CONTENT_LENGTH: declared ones before anything
+    reads them, chunked or understated ones as soon as the limit is crossed
+    """
+    @wraps(handler)
+    async def wrapper(request):
+        limit = flask_app.app.config['MAX_CONTENT_LENGTH']
+        try:
+            content_length = int(request.headers.get('content-length') or 0)
+        except ValueError:
+            return _error("Invalid Content-Length", 400)
+        if content_length > limit:
+            return _error("File too large", 413)
+
+        received = 0
+
+        async def receive():
+            nonlocal received
+            message = await request.receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > limit:
+                    raise BodyTooLarge()
+            return message
+
+        try:
+            # Every reader below (the idempotency fingerprint, the form parser) goes through receive()
+            return await handler(Request(request.scope, receive))
+        except BodyTooLarge:
+            return _error("File too large", 413)
+    return wrapper
+
+
+def idempotent(handler):
+    """
+    Async counterpart of idempotency.idempotent, sharing its table and rules
+    """
+    @wraps(handler)
+    async def wrapper(request):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return await handler(request)
+        if len(key) > idempotency.MAX_KEY_LENGTH:
+            return _error("Idempotency-Key is too long", 400)
+
+        path = request.url.path
+        scope = f"{request.method} {path}"[:200]
+        query = list(request.query_params.multi_items())
+        if request.headers.get('content-type', '').split(';')[0].strip() in idempotency.FORM_MIMETYPES:
+            # Parsed once here; the handler gets the same cached form
+            form = await request.form()
+            fields = [(name, value) for name, value in form.multi_items() if isinstance(value, str)]
+            files = [(name, value.filename, await _file_digest(value))
+                     for name, value in form.multi_items() if not isinstance(value, str)]
+            owner = idempotency.owner_for(path, form.get('user_id') or request.query_params.get('user_id'))
+            request_hash = idempotency.fingerprint(request.method, path, query, fields=fields, files=files)
+        else:
+            owner = idempotency.owner_for(path, request.query_params.get('user_id'))
+            request_hash = idempotency.fingerprint(request.method, path, query, body=await request.body())
+
+        async with Session() as session:
+            existing = await session.get(IdempotencyRecord, (owner, key))
+            if existing is not None and existing.expires_at < datetime.utcnow():
+                await session.delete(existing)
+                await session.commit()
+                existing = None
+            if existing is None:
+                session.add(IdempotencyRecord(
+                    owner=owner,
+                    key=key,
+                    scope=scope,
+                    request_hash=request_hash,
+                    expires_at=datetime.utcnow() + timedelta(seconds=idempotency.IDEMPOTENCY_LOCK_SECONDS),
+                ))
+                try:
+                    await session.commit()
+                except IntegrityError:
+                    await session.rollback()
+                    existing = await session.get(IdempotencyRecord, (owner, key))
+            if existing is not None:
+                error = idempotency.conflict(existing, scope, request_hash)
+                if error:
+                    return _error(*error)
+                body = zlib.decompress(existing.body) if existing.compressed else (existing.body or b'')
+                return Response(body, status_code=existing.status_code, media_type=existing.content_type,
+                                headers={"Idempotent-Replayed": "true"})
+
+        try:
+            response = await handler(request)
+        except Exception:
+            await _forget_key(owner, key)
+            raise
+
+        if idempotency.should_store(response.status_code):
+            compressed = len(response.body) >= idempotency.COMPRESS_MIN_BYTES
+            async with Session() as session:
+                record = await session.get(IdempotencyRecord, (owner, key))
+                if record is not None:
+                    record.status_code = response.status_code
+                    record.content_type = response.media_type
+                    record.body = zlib.compress(response.body) if compressed else response.body
+                    record.compressed = compressed
+                    record.expires_at = datetime.utcnow() + timedelta(hours=idempotency.IDEMPOTENCY_TTL_HOURS)
+                    await session.commit()
+        else:
+            await _forget_key(owner, key)
+        return response
+    return wrapper
+
+
+async def _file_digest(upload):
+    digest = hashlib.sha256()
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        digest.update(chunk)
+    await upload.seek(0)
+    return digest.hexdigest()
+
+
+async def _forget_key(owner, key):
+    async with Session() as session:
+        record = await session.get(IdempotencyRecord, (owner, key))
+        if record is not None:
+            await session.delete(record)
+            await session.commit()
+
+
+def _model_contents(text, file_path):
+    # Reading an archived upload needs the Flask app's database session
+    with flask_app.app.app_context():
+        return flask_app.model_contents(text, file_path)
+
+
+def _analyze_in_context(text, file_path):
+    with flask_app.app.app_context():
+        return flask_app.analyze_prescription_with_ai(text, file_path)
+
+
+async def analyze_with_ai(text, file_path=None):
+    """
+    analyze_prescription_with_ai with the model call awaited instead of blocking a thread
+    """
+    model = flask_app.model
+    if not model or needs_chunking(text) or not hasattr(model, 'generate_content_async'):
+        # Mock fallback, chunked map-reduce and sync-only clients: the shared pipeline as is
+        return await run_in_threadpool(_analyze_in_context, text, file_path)
+
+    contents = await run_in_threadpool(_model_contents, text, file_path)
+    started = time.perf_counter()
+    try:
+        response = await model.generate_content_async(contents)
+        ai_response = response.text.strip()
+    except Exception as e:
+        metrics.record_model_call("error", time.perf_counter() - started)
+        logger.error("Gemini API error (%s): %s", type(e).__name__, e)
+        return flask_app.analyze_prescription_mock(text)
+    metrics.record_model_call("success", time.perf_counter() - started)
+    return flask_app.analysis_from_response(ai_response, text)
+
+
+async def _save_upload(upload, folder):
+    """
+    Stream an upload to disk; returns (filename, size) or raises ValueError if too large
+    """
+    unique_filename = f"{uuid.uuid4()}_{secure_filename(upload.filename)}"
+    path = os.path.join(folder, unique_filename)
+    limit = flask_app.app.config['MAX_CONTENT_LENGTH']
+    size = 0
+    async with aiofiles.open(path, 'wb') as f:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > limit:
+                break
+            await f.write(chunk)
+    if size > limit:
+        await aiofiles.os.remove(path)
+        raise ValueError("File too large")
+    return unique_filename, size
+
+
+@request_hooks('/analyze')
+@within_upload_limit
+@idempotent
+async def analyze(request):
+    form = await request.form()
+    try:
+        user_id = form.get('user_id')
+        text = form.get('text') or ''
+        upload = form.get('file')
+        has_file = upload is not None and not isinstance(upload, str) and upload.filename
+
+        if not user_id:
+            return _error("Missing user_id", 400)
+        try:
+            user_id = int(user_id)
+        except ValueError:
+            return _error("Invalid user_id", 400)
+        if not text and not has_file:
+            return _error("Please provide prescription text or upload a file", 400)
+
+        file_path = None
+        file_type = None
+        if has_file:
+            if not flask_app.allowed_file(upload.filename):
+                return _error("File type not allowed", 400)
+            try:
+                file_path, size = await _save_upload(upload, flask_app.app.config['UPLOAD_FOLDER'])
+            except ValueError:
+                return _error("File too large", 413)
+            file_type = upload.content_type
+            metrics.record_upload(size)
+
+        async with Session() as session:
+            new_rx = Prescription(
+                user_id=user_id,
+                raw_text=text,
+                file_path=file_path,
+                file_type=file_type,
+                analysis_json=flask_app.pending_analysis_json(),
+                status='pending',
+            )
+            session.add(new_rx)
+            await session.flush()
+            review_queue.enqueue(new_rx, session)
+            await session.commit()
+        await run_in_threadpool(dashboard_cache.invalidate, [user_id])
+
+        return JSONResponse({
+            "message": "Prescription submitted for review",
+            "prescription_id": new_rx.id,
+            "status": "pending"
+        }, status_code=201)
+    except Exception as e:
+        logger.exception("Error in analyze_prescription: %s", e)
+        return _error("Failed to submit prescription", 500)
+    finally:
+        await form.close()
+
+
+@request_hooks('/admin/prescription/<int:prescription_id>/approve')
+@idempotent
+async def approve(request):
+    prescription_id = int(request.path_params['prescription_id'])
+    try:
+        body = await request.body()
+        data = (json.loads(body) if body else None) or {}
+
+        async with Session() as session:
+            prescription = await session.get(Prescription, prescription_id)
+            if prescription is None:
+                return _error("Prescription not found", 404)
+            raw_text, file_path = prescription.raw_text, prescription.file_path
+
+        # The model call holds no connection and no thread while it waits
+        if data.get('custom_analysis'):
+            analysis_result = data['custom_analysis']
+        else:
+            analysis_result = await analyze_with_ai(raw_text, file_path)
+
+        def apply(sync_session):
+            p = sync_session.get(Prescription, prescription_id)
+            if p is None:
+                return None  # Deleted while the model ran
+            p.analysis_json = json.dumps(analysis_result)
+            p.status = 'approved'
+            review_queue.complete([prescription_id], sync_session)
+            reanalysis.record(prescription_id, raw_text, analysis_result,
+                              'custom' if data.get('custom_analysis') else 'ai', session=sync_session)
+            return p.user_id
+
+        async with Session() as session:
+            user_id = await session.run_sync(apply)
+            if user_id is None:
+                return _error("Prescription not found", 404)
+            await session.commit()
+        await run_in_threadpool(dashboard_cache.invalidate, [user_id])
+
+        return JSONResponse({
+            "message": "Prescription approved successfully",
+            "analysis": analysis_result
+        })
+    except Exception as e:
+        logger.exception("Error approving prescription %s: %s", prescription_id, e)
+        return _error("Failed to approve prescription", 500)
+
+
+async def _dispose_engine():
+    await engine.dispose()
+
+
+if os.environ.get('FLASK_ENV') == 'production':
+    _origins = [os.environ.get('FRONTEND_URL', 'https://your-frontend-url.railway.app'), 'http://localhost:3000']
+else:
+    _origins = ['*']
+
+async_routes = Starlette(
+    routes=[
+        Route('/analyze', analyze, methods=['POST']),
+        Route('/admin/prescription/{prescription_id:int}/approve', approve, methods=['POST']),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=_origins, allow_methods=['*'], allow_headers=['*'],
+                           expose_headers=[STICKY_HEADER])],
+    on_shutdown=[_dispose_engine],
+)
+wsgi_routes = WSGIMiddleware(flask_app.app)
+
+ASYNC_PATHS = re.compile(r'^/(analyze|admin/prescription/\d+/approve)$')
+
+
+async def app(scope, receive, send):
+    """
+    Dispatch async routes (and lifespan) to Starlette, everything else to Flask
+    """
+    if scope['type'] == 'lifespan' or ASYNC_PATHS.match(scope.get('path', '')):
+        await async_routes(scope, receive, send)
+    else:
+        await wsgi_routes(scope, receive, send)
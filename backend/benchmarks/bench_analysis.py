@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the analysis engine
+
+Times analyze_prescription_mock and parse_gemini_response_to_json over a
+synthetic corpus, measures allocations per call with tracemalloc, and
+checks every output against golden digests so matcher optimizations can
+be shown to be both correct and faster.
+
+Usage:
+    python benchmarks/bench_analysis.py [--repeat 20]
+    python benchmarks/bench_analysis.py --update-golden   # after an intended output change
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from itertools import zip_longest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from app import analyze_prescription_mock, parse_gemini_response_to_json  # noqa: E402
+from benchmarks.corpus import build_corpus  # noqa: E402
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden', 'analysis.json')
+CORPUS_SIZE = 200
+CORPUS_SEED = 1234
+
+TARGETS = {
+    'analyze_prescription_mock': lambda case: analyze_prescription_mock(case['prescription']),
+    'parse_gemini_response_to_json': lambda case: parse_gemini_response_to_json(case['gemini_response'],
+                                                                               case['prescription']),
+}
+
+
+def digest(result):
+    """
+    Stable digest of an analysis result (tip order is not significant)
+    """
+    normalized = dict(result, nutrition_tips=sorted(result.get('nutrition_tips', [])))
+    canonical = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def time_calls(fn, cases, repeat):
+    per_profile = {}
+    for case in cases:
+        samples = per_profile.setdefault(case['profile'], [])
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn(case)
+            samples.append(time.perf_counter() - started)
+    return per_profile
+
+
+def measure_allocations(fn, cases):
+    per_profile = {}
+    tracemalloc.start()
+    try:
+        for case in cases:
+            tracemalloc.clear_traces()
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            fn(case)
+            _, peak = tracemalloc.get_traced_memory()
+            per_profile.setdefault(case['profile'], []).append(peak - before)
+    finally:
+        tracemalloc.stop()
+    return per_profile
+
+
+def check_golden(cases, update):
+    current = {name: [digest(fn(case)) for case in cases] for name, fn in TARGETS.items()}
+    if update:
+        os.makedirs(os.path.dirname(GOLDEN_PATH), exist_ok=True)
+        with open(GOLDEN_PATH, 'w') as f:
+            json.dump({"corpus_size": CORPUS_SIZE, "corpus_seed": CORPUS_SEED, "digests": current}, f, indent=1)
+            f.write("\n")
+        return {name: 0 for name in current}
+
+    with open(GOLDEN_PATH) as f:
+        golden = json.load(f)["digests"]
+    mismatches = {}
+    for name, digests in current.items():
+        if name not in golden:
+            print(f"golden mismatch: no digests recorded for {name}", file=sys.stderr)
+            mismatches[name] = len(digests)
+            continue
+        expected = golden[name]
+        if len(expected) != len(digests):
+            print(f"golden mismatch: {name} has {len(digests)} cases, golden has {len(expected)}", file=sys.stderr)
+        # Missing or extra cases count as mismatches rather than being cut off by zip()
+        bad = [i for i, (a, b) in enumerate(zip_longest(digests, expected)) if a != b]
+        mismatches[name] = len(bad)
+        for i in bad[:3]:
+            profile = cases[i]['profile'] if i < len(cases) else 'missing'
+            print(f"golden mismatch: {name} case {i} ({profile})", file=sys.stderr)
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20, help="timed calls per case")
+    parser.add_argument("--update-golden", action="store_true")
+    args = parser.parse_args()
+
+    cases = build_corpus(CORPUS_SIZE, CORPUS_SEED)
+    mismatches = check_golden(cases, args.update_golden)
+
+    report = {"corpus_size": len(cases), "repeat": args.repeat, "golden_mismatches": mismatches, "functions": {}}
+    for name, fn in TARGETS.items():
+        timings = time_calls(fn, cases, args.repeat)
+        allocations = measure_allocations(fn, cases)
+        report["functions"][name] = {
+            profile: {
+                "mean_us": round(statistics.fmean(samples) * 1e6, 2),
+                "p50_us": round(statistics.median(samples) * 1e6, 2),
+                "p95_us": round(sorted(samples)[int(len(samples) * 0.95) - 1] * 1e6, 2),
+                "peak_alloc_bytes": int(statistics.fmean(allocations[profile])),
+            } for profile, samples in timings.items()
+        }
+
+    print(json.dumps(report, indent=2))
+    if any(mismatches.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Concurrent write benchmark for the SQLite engine settings
+
+Runs the same mixed insert/update/read workload against a stock SQLite
+engine and one configured through db_config, and prints throughput and
+"database is locked" errors for each.
+
+Usage: python benchmarks/bench_concurrent_writes.py [--threads 8] [--ops 200]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, select, update  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from db_config import build_engine_options, configure_engine  # noqa: E402
+from models import db, User, Prescription  # noqa: E402
+
+ANALYSIS = json.dumps({
+    "medicines": [],
+    "explanation": "Pending admin review",
+    "nutrition_tips": [],
+    "analysis_confidence": 0.0,
+    "recommendations": ["Your prescription is under review by our medical team"]
+})
+
+
+def make_engine(path, tuned):
+    uri = f"sqlite:///{path}"
+    if not tuned:
+        # Stock settings: rollback journal, synchronous=FULL, sqlite3's default 5s busy timeout
+        return create_engine(uri, connect_args={"check_same_thread": False})
+    return configure_engine(create_engine(uri, **build_engine_options(uri)))
+
+
+def seed(engine):
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{
+            "first_name": "Bench", "last_name": "User", "username": "bench",
+            "email": "bench@example.com", "password": "x", "age": 30, "gender": "other"
+        }])
+
+
+def worker(engine, ops, counters, lock):
+    done = errors = 0
+    for i in range(ops):
+        try:
+            with engine.begin() as conn:
+                if i % 4 == 3:
+                    # Admin-style status update on an existing row
+                    conn.execute(update(Prescription.__table__)
+                                 .where(Prescription.__table__.c.status == 'pending')
+                                 .values(status='approved'))
+                else:
+                    conn.execute(Prescription.__table__.insert(), [{
+                        "user_id": 1, "raw_text": "Tab. Napa 500mg 1+0+1", "analysis_json": ANALYSIS,
+                        "status": "pending"
+                    }])
+                conn.execute(select(Prescription.__table__.c.id).limit(20)).fetchall()
+            done += 1
+        except OperationalError:
+            errors += 1
+    with lock:
+        counters["ok"] += done
+        counters["locked"] += errors
+
+
+def run(tuned, threads, ops):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(os.path.join(tmp, "bench.sqlite3"), tuned)
+        seed(engine)
+        counters = {"ok": 0, "locked": 0}
+        lock = threading.Lock()
+        pool = [threading.Thread(target=worker, args=(engine, ops, counters, lock)) for _ in range(threads)]
+        start = time.perf_counter()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed = time.perf_counter() - start
+        engine.dispose()
+    return {
+        "mode": "tuned" if tuned else "stock",
+        "threads": threads,
+        "ok": counters["ok"],
+        "locked_errors": counters["locked"],
+        "seconds": round(elapsed, 3),
+        "tx_per_sec": round(counters["ok"] / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=200, help="transactions per thread")
+    args = parser.parse_args()
+
+    results = [run(False, args.threads, args.ops), run(True, args.threads, args.ops)]
+    for r in results:
+        print(json.dumps(r))
+
+
+if __name__ == "__main__":
+    main()
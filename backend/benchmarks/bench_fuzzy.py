@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Fuzzy medicine matching benchmark
+
+Builds a trigram index over a synthetic catalogue of N drug-like names
+plus the real medicine keywords, then times lookups of misspelled tokens
+(one or two random edits) and of unrelated words, and reports recall on
+the misspellings.
+
+Usage: python benchmarks/bench_fuzzy.py [--names 30000] [--queries 2000] [--seed 7]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fuzzy import TrigramIndex, allowed_distance  # noqa: E402
+from knowledge_base import ALL_MEDICINE_KEYWORDS  # noqa: E402
+
+CONSONANTS = 'bcdfgklmnprstvxz'
+VOWELS = 'aeiou'
+SUFFIXES = ['', '', '', 'cillin', 'mycin', 'prazole', 'sartan', 'statin', 'olol', 'pine', 'vir', 'mab', 'xacin']
+
+
+def catalogue(rng, size):
+    """
+    Brand/generic-like names: 2-4 random syllables plus an optional class suffix
+    """
+    names = set(ALL_MEDICINE_KEYWORDS)
+    while len(names) < size:
+        syllables = ''.join(rng.choice(CONSONANTS) + rng.choice(VOWELS) for _ in range(rng.randint(2, 4)))
+        names.add(syllables + rng.choice(SUFFIXES))
+    return sorted(names)
+
+
+def misspell(rng, word, edits):
+    for _ in range(edits):
+        i = rng.randrange(len(word))
+        op = rng.choice('sid')
+        letter = rng.choice(string.ascii_lowercase)
+        if op == 's':
+            word = word[:i] + letter + word[i + 1:]
+        elif op == 'i':
+            word = word[:i] + letter + word[i:]
+        elif len(word) > 4:
+            word = word[:i] + word[i + 1:]
+    return word
+
+
+def time_lookups(index, tokens):
+    samples, results = [], []
+    for token in tokens:
+        started = time.perf_counter()
+        results.append(index.lookup(token))
+        samples.append(time.perf_counter() - started)
+    return samples, results
+
+
+def summary(samples):
+    ordered = sorted(samples)
+    return {
+        "mean_us": round(statistics.fmean(samples) * 1e6, 2),
+        "p50_us": round(ordered[len(ordered) // 2] * 1e6, 2),
+        "p99_us": round(ordered[int(len(ordered) * 0.99) - 1] * 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--names", type=int, default=30000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    names = catalogue(rng, args.names)
+    started = time.perf_counter()
+    index = TrigramIndex(names)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    targets = [rng.choice(names) for _ in range(args.queries)]
+    misspelled = [misspell(rng, name, rng.choice([1, 1, 2])) for name in targets]
+    unrelated = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 12))) for _ in range(args.queries)]
+
+    miss_samples, miss_results = time_lookups(index, misspelled)
+    other_samples, _ = time_lookups(index, unrelated)
+
+    # Only count cases the distance limit allows the matcher to recover
+    eligible = [(t, r) for t, m, r in zip(targets, misspelled, miss_results)
+                if allowed_distance(m) >= 1 and m != t]
+    recovered = sum(1 for t, r in eligible if r is not None)
+    exact = sum(1 for t, r in eligible if r is not None and r[0] == t)
+
+    print(json.dumps({
+        "catalogue_size": len(names),
+        "build_ms": round(build_ms, 1),
+        "misspelled": summary(miss_samples),
+        "unrelated": summary(other_samples),
+        "recall": round(recovered / len(eligible), 3) if eligible else None,
+        "matched_intended_name": round(exact / len(eligible), 3) if eligible else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
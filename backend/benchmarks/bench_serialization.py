@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark for /admin/prescriptions
+
+Seeds a temporary SQLite database with N prescriptions, then compares the
+old response path (json.loads of analysis_json + stdlib jsonify) with the
+spliced fast path, and times the full endpoint through the test client.
+
+Usage: python benchmarks/bench_serialization.py [--rows 10000] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp = tempfile.TemporaryDirectory()
+# Never the exported DATABASE_URL: seeding writes thousands of rows
+os.environ['DATABASE_URL'] = (os.environ.get('BENCH_DATABASE_URL')
+                              or 'sqlite:///' + os.path.join(_tmp.name, 'bench.sqlite3'))
+os.environ.pop('DATABASE_REPLICA_URLS', None)
+
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+from app import app, db, analyze_prescription_mock  # noqa: E402
+from json_provider import splice_json, json_array  # noqa: E402
+from benchmarks.seed import require_empty_database  # noqa: E402
+from models import User, Prescription  # noqa: E402
+
+SAMPLE_TEXT = "Tab. Napa 500mg 1+0+1, Cap. Sergel 20mg 1+0+0, Tab. Cetirizine 10mg 0+0+1, Phexin 500mg"
+
+
+def seed(rows):
+    require_empty_database(app)
+    with app.app_context():
+        db.create_all()
+        user = User(first_name="Bench", last_name="User", username="bench", email="bench@example.com",
+                    password="x", age=30, gender="other")
+        db.session.add(user)
+        db.session.flush()
+        analysis = json.dumps(analyze_prescription_mock(SAMPLE_TEXT))
+        db.session.bulk_insert_mappings(Prescription, [{
+            "user_id": user.id, "raw_text": SAMPLE_TEXT, "analysis_json": analysis, "status": "approved"
+        } for _ in range(rows)])
+        db.session.commit()
+
+
+def row_dict(p, user):
+    return {
+        "id": p.id,
+        "user": {"id": user.id, "name": f"{user.first_name} {user.last_name}", "email": user.email},
+        "raw_text": p.raw_text,
+        "file_path": p.file_path,
+        "file_type": p.file_type,
+        "timestamp": p.created_at.strftime("%Y-%m-%d %H:%M"),
+        "status": p.status,
+        "created_at": p.created_at.isoformat()
+    }
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = len(fn())
+        timings.append(time.perf_counter() - start)
+    return round(min(timings) * 1000, 2), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    seed(args.rows)
+    stdlib = DefaultJSONProvider(app)
+
+    with app.app_context():
+        rows = Prescription.query.all()
+        user = User.query.first()
+
+        def before():
+            return stdlib.dumps([dict(row_dict(p, user), analysis=json.loads(p.analysis_json)) for p in rows])
+
+        def after():
+            return json_array([splice_json(row_dict(p, user), analysis=p.analysis_json) for p in rows])
+
+        before_ms, before_size = best_of(args.repeat, before)
+        after_ms, after_size = best_of(args.repeat, after)
+
+    client = app.test_client()
+    endpoint_ms, _ = best_of(args.repeat, lambda: client.get('/admin/prescriptions').data)
+
+    print(json.dumps({
+        "rows": args.rows,
+        "serialize_before_ms": before_ms,
+        "serialize_after_ms": after_ms,
+        "speedup": round(before_ms / after_ms, 2) if after_ms else None,
+        "bytes_before": before_size,
+        "bytes_after": after_size,
+        "endpoint_ms": endpoint_ms,
+    }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Synthetic prescription corpus for analysis benchmarks
+
+Generates prescriptions and Gemini-style responses of varying length and
+medicine density. Output is deterministic for a given seed, so it can be
+used for golden-output checks.
+"""
+
+import random
+
+MEDICINES = [
+    ('Phexin', '500mg'), ('Amoxicillin', '250mg'), ('Azithromycin', '500mg'), ('Remdec', '100mg'),
+    ('Remdesivir', '200mg'), ('Actemra', '400mg'), ('Tocilizumab', '400mg'), ('Paracetamol', '500mg'),
+    ('Napa', '500mg'), ('Zeedol PT', '1 tab'), ('Ibuprofen', '400mg'), ('Omeprazole', '20mg'),
+    ('Sergel', '20mg'), ('Pantoprazole', '40mg'), ('Stolin Gum Paint', 'apply'), ('Colgate Plax', '10ml'),
+    ('Oral-B Pro 2', 'brush'), ('Cetirizine', '10mg'), ('Loratadine', '10mg'), ('Ranitidine', '150mg'),
+    ('Vitamin D3', '1000IU'), ('Dextromethorphan', '10ml'),
+]
+
+# Names the matchers do not know, so density can be varied independently of hits
+UNKNOWN = [('Montelukast', '10mg'), ('Metformin', '500mg'), ('Atorvastatin', '10mg'), ('Losartan', '50mg'),
+           ('Salbutamol', '2 puffs'), ('Domperidone', '10mg'), ('Fexo', '120mg'), ('Rupa', '10mg')]
+
+SCHEDULES = ['1+0+1', '1+1+1', '0+0+1', '1+0+0', 'STAT', 'x 7 days', 'after meal', 'before meal']
+
+FILLER = [
+    "Patient complains of fever and sore throat for three days.",
+    "BP 120/80, pulse 84/min, SpO2 97% on room air.",
+    "Advice: plenty of fluids, rest, follow up after one week.",
+    "History of mild gastritis, no known drug allergy.",
+    "CBC, CRP and chest X-ray advised before next visit.",
+    "Dr. A. Rahman, MBBS, FCPS (Medicine), Reg. No. 12345.",
+]
+
+TIPS = [
+    "Drink at least eight glasses of water every day",
+    "Prefer light home-cooked meals over fried or spicy food",
+    "Include fresh fruits and leafy vegetables in each meal",
+    "Avoid caffeine late in the evening to improve sleep",
+]
+
+CAUTIONS = [
+    "Complete the full course of antibiotics even if you feel better",
+    "Do not drive if you feel drowsy after taking the medicine",
+    "Tell your doctor if you are pregnant or planning pregnancy",
+    "Diabetic patients should monitor blood sugar more closely",
+]
+
+
+def _medicine_lines(rng, count, density):
+    lines = []
+    for _ in range(count):
+        name, dose = rng.choice(MEDICINES) if rng.random() < density else rng.choice(UNKNOWN)
+        lines.append(f"Tab. {name} {dose} {rng.choice(SCHEDULES)}")
+    return lines
+
+
+def make_prescription(rng, medicines=4, density=0.7, filler=2):
+    lines = rng.sample(FILLER, min(filler, len(FILLER))) + ["Rx"]
+    lines += _medicine_lines(rng, medicines, density)
+    return "\n".join(lines)
+
+
+def make_gemini_response(rng, medicines=4, density=0.7, bullets=3):
+    lines = ["**List of medicines:**"]
+    for line in _medicine_lines(rng, medicines, density):
+        lines.append(f"* {line} - take as directed")
+    lines += ["", "**Food to avoid:**", "* Alcohol", "* Grapefruit juice", "", "**Safety considerations:**"]
+    lines += [f"* {c}" for c in rng.sample(CAUTIONS, min(bullets, len(CAUTIONS)))]
+    lines += ["", "**Nutrition tips:**"]
+    lines += [f"- {t}" for t in rng.sample(TIPS, min(bullets, len(TIPS)))]
+    lines += ["", "**Safety recommendations:**"]
+    lines += [f"• {c}" for c in rng.sample(CAUTIONS, min(bullets, len(CAUTIONS)))]
+    return "\n".join(lines)
+
+
+# (label, medicines, density, filler/bullets)
+PROFILES = [
+    ('short_sparse', 2, 0.3, 1),
+    ('short_dense', 3, 1.0, 1),
+    ('medium', 6, 0.7, 3),
+    ('long_dense', 20, 0.9, 4),
+    ('very_long', 60, 0.6, 6),
+]
+
+
+def build_corpus(size=200, seed=1234):
+    """
+    Return a list of cases: {"id", "profile", "prescription", "gemini_response"}
+    """
+    rng = random.Random(seed)
+    cases = []
+    for i in range(size):
+        label, medicines, density, extra = PROFILES[i % len(PROFILES)]
+        cases.append({
+            "id": i,
+            "profile": label,
+            "prescription": make_prescription(rng, medicines, density, extra),
+            "gemini_response": make_gemini_response(rng, medicines, density, extra),
+        })
+    return cases
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Load generator for the backend API
+
+Seeds a synthetic database (users, prescriptions, upload files), swaps in
+a stub AI model, serves the app on a local threaded WSGI server and drives
+a weighted mix of /login, /analyze, /dashboard, /admin/prescriptions,
+/admin/users and approve/reject from concurrent clients.
+
+Prints one JSON document with p50/p95/p99 latency and throughput per
+endpoint plus peak RSS, so runs can be diffed across commits.
+
+Usage:
+    python benchmarks/load_test.py --users 200 --prescriptions 5000 \\
+        --concurrency 16 --duration 30 --output bench_output.json
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp = tempfile.TemporaryDirectory()
+# Never the exported DATABASE_URL: seeding writes thousands of rows
+os.environ['DATABASE_URL'] = (os.environ.get('BENCH_DATABASE_URL')
+                              or 'sqlite:///' + os.path.join(_tmp.name, 'bench.sqlite3'))
+os.environ.pop('DATABASE_REPLICA_URLS', None)
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from werkzeug.serving import make_server  # noqa: E402
+
+import app as backend  # noqa: E402
+from benchmarks.seed import BENCH_PASSWORD, prescription_text, seed_database  # noqa: E402
+from benchmarks.stub_model import StubModel  # noqa: E402
+
+# (name, weight) - read-heavy, like production traffic
+SCENARIOS = [
+    ('login', 10),
+    ('analyze', 10),
+    ('dashboard', 35),
+    ('admin_prescriptions', 10),
+    ('admin_users', 10),
+    ('approve', 15),
+    ('reject', 10),
+]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    # Nearest-rank percentile
+    rank = math.ceil(pct / 100.0 * len(sorted_values))
+    return sorted_values[min(len(sorted_values), max(rank, 1)) - 1]
+
+
+def _request(base, method, path, body=None, headers=None):
+    req = urllib.request.Request(base + path, data=body, method=method, headers=headers or {})
+    try:
+        with urllib.request.urlopen(req, timeout=120) as resp:
+            resp.read()
+            return resp.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code
+
+
+def _multipart(fields, filename, content):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n')
+    parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+                 'Content-Type: text/plain\r\n\r\n')
+    body = ''.join(parts).encode('utf-8') + content + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+    return body, {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+
+
+class LoadGenerator:
+    def __init__(self, base, user_ids, prescription_ids, rng_seed=7):
+        self.base = base
+        self.user_ids = user_ids
+        self.prescription_ids = prescription_ids
+        self.rng_seed = rng_seed
+        self.lock = threading.Lock()
+        self.samples = {name: [] for name, _ in SCENARIOS}
+        self.errors = {name: 0 for name, _ in SCENARIOS}
+
+    def run_one(self, rng, name):
+        json_headers = {'Content-Type': 'application/json'}
+        if name == 'login':
+            user = rng.choice(self.user_ids) - self.user_ids[0]
+            body = json.dumps({"email": f"bench{user}@example.com", "password": BENCH_PASSWORD}).encode()
+            return _request(self.base, 'POST', '/login', body, json_headers)
+        if name == 'analyze':
+            text = prescription_text(rng)
+            body, headers = _multipart({"user_id": rng.choice(self.user_ids), "text": text},
+                                       'rx.txt', text.encode('utf-8'))
+            return _request(self.base, 'POST', '/analyze', body, headers)
+        if name == 'dashboard':
+            return _request(self.base, 'GET', f'/dashboard?user_id={rng.choice(self.user_ids)}')
+        if name == 'admin_prescriptions':
+            return _request(self.base, 'GET', '/admin/prescriptions')
+        if name == 'admin_users':
+            return _request(self.base, 'GET', '/admin/users')
+        if name == 'approve':
+            return _request(self.base, 'POST', f'/admin/prescription/{rng.choice(self.prescription_ids)}/approve',
+                            b'{}', json_headers)
+        return _request(self.base, 'POST', f'/admin/prescription/{rng.choice(self.prescription_ids)}/reject',
+                        json.dumps({"reason": "benchmark"}).encode(), json_headers)
+
+    def worker(self, index, deadline, max_requests):
+        rng = random.Random(self.rng_seed + index)
+        names = [name for name, _ in SCENARIOS]
+        weights = [weight for _, weight in SCENARIOS]
+        done = 0
+        while time.perf_counter() < deadline and (not max_requests or done < max_requests):
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                status = self.run_one(rng, name)
+            except Exception:
+                status = 0
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.samples[name].append(elapsed)
+                if status >= 400 or status == 0:
+                    self.errors[name] += 1
+            done += 1
+
+    def run(self, concurrency, duration, requests_per_worker):
+        deadline = time.perf_counter() + duration
+        threads = [threading.Thread(target=self.worker, args=(i, deadline, requests_per_worker))
+                   for i in range(concurrency)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return time.perf_counter() - started
+
+
+def summarize(samples, errors, elapsed):
+    endpoints = {}
+    total = 0
+    for name, values in samples.items():
+        values = sorted(values)
+        total += len(values)
+        endpoints[name] = {
+            "count": len(values),
+            "errors": errors[name],
+            "rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(values, 50) * 1000, 2) if values else None,
+            "p95_ms": round(percentile(values, 95) * 1000, 2) if values else None,
+            "p99_ms": round(percentile(values, 99) * 1000, 2) if values else None,
+            "max_ms": round(values[-1] * 1000, 2) if values else None,
+        }
+    return endpoints, total
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--prescriptions", type=int, default=2000)
+    parser.add_argument("--uploads", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds to run")
+    parser.add_argument("--requests", type=int, default=0, help="stop each client after N requests")
+    parser.add_argument("--model-latency", type=float, default=0.05, help="stub model delay in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    app = backend.app
+    app.config['UPLOAD_FOLDER'] = os.path.join(_tmp.name, 'uploads')
+    backend.model = StubModel(latency=args.model_latency)
+
+    seed_started = time.perf_counter()
+    user_ids, prescription_ids = seed_database(app, args.users, args.prescriptions, args.uploads, args.seed)
+    seed_seconds = time.perf_counter() - seed_started
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    generator = LoadGenerator(base, user_ids, prescription_ids, args.seed)
+    elapsed = generator.run(args.concurrency, args.duration, args.requests)
+    server.shutdown()
+
+    endpoints, total = summarize(generator.samples, generator.errors, elapsed)
+    report = {
+        "revision": git_revision(),
+        "config": vars(args),
+        "seed_seconds": round(seed_seconds, 2),
+        "elapsed_seconds": round(elapsed, 2),
+        "total_requests": total,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        # Server and clients share this process, so this is an upper bound for the server
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1),
+        "endpoints": endpoints,
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
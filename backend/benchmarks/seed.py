@@ -0,0 +1,98 @@
+"""
+Synthetic data for benchmarks
+
+Seeds users, prescriptions and upload files into the app's database and
+upload folder. Generation is deterministic for a given seed.
+"""
+
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+from werkzeug.security import generate_password_hash
+
+from models import db, User, Prescription
+
+BENCH_PASSWORD = "benchpass123"
+
+MEDICINE_WORDS = ['Napa', 'Phexin', 'Sergel', 'Cetirizine', 'Remdec', 'Actemra', 'Omeprazole',
+                  'Amoxicillin', 'Azithromycin', 'Ibuprofen', 'Zeedol PT', 'Stolin Gum Paint',
+                  'Loratadine', 'Pantoprazole', 'Vitamin B complex', 'Dextromethorphan']
+DOSES = ['1+0+1', '1+1+1', '0+0+1', '1+0+0', '200mg STAT', '500mg x 7 days', '10ml twice daily']
+STATUSES = ['pending', 'pending', 'approved', 'rejected']
+
+
+def prescription_text(rng, max_items=6):
+    items = rng.sample(MEDICINE_WORDS, rng.randint(1, max_items))
+    return "\n".join(f"Tab. {name} {rng.choice(DOSES)}" for name in items)
+
+
+def require_empty_database(app):
+    """
+    Exit unless the app's database has no rows in any of its tables
+    """
+    with app.app_context():
+        existing = set(sa.inspect(db.engine).get_table_names())
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing:
+                continue
+            if db.session.execute(sa.select(sa.literal(1)).select_from(table).limit(1)).first():
+                raise SystemExit(f"Refusing to seed benchmark data: table {table.name!r} in "
+                                 f"{db.engine.url.render_as_string()} is not empty")
+
+
+def seed_database(app, users=100, prescriptions=1000, uploads=50, seed=42):
+    """
+    Create tables and bulk-insert synthetic rows; returns (user_ids, prescription_ids)
+    """
+    require_empty_database(app)
+    rng = random.Random(seed)
+    password = generate_password_hash(BENCH_PASSWORD)  # Hashed once, shared by all users
+    upload_folder = app.config['UPLOAD_FOLDER']
+    os.makedirs(upload_folder, exist_ok=True)
+
+    with app.app_context():
+        db.create_all()
+        db.session.bulk_insert_mappings(User, [{
+            "first_name": f"Bench{i}",
+            "last_name": "User",
+            "username": f"bench{i}",
+            "email": f"bench{i}@example.com",
+            "password": password,
+            "age": rng.randint(18, 90),
+            "gender": rng.choice(['male', 'female']),
+        } for i in range(users)])
+        db.session.commit()
+        user_ids = [u for (u,) in db.session.query(User.id).all()]
+
+        pending = json.dumps({
+            "medicines": [],
+            "explanation": "Pending admin review",
+            "nutrition_tips": [],
+            "analysis_confidence": 0.0,
+            "recommendations": ["Your prescription is under review by our medical team"]
+        })
+        now = datetime.utcnow()
+        rows = []
+        for i in range(prescriptions):
+            file_path = None
+            if i < uploads:
+                file_path = f"bench_{i}.txt"
+                with open(os.path.join(upload_folder, file_path), 'w') as f:
+                    f.write(prescription_text(rng))
+            rows.append({
+                "user_id": rng.choice(user_ids),
+                "raw_text": prescription_text(rng),
+                "file_path": file_path,
+                "file_type": 'text/plain' if file_path else None,
+                "analysis_json": pending,
+                "created_at": now - timedelta(minutes=rng.randint(0, 60 * 24 * 90)),
+                "status": rng.choice(STATUSES),
+            })
+        db.session.bulk_insert_mappings(Prescription, rows)
+        db.session.commit()
+        prescription_ids = [p for (p,) in db.session.query(Prescription.id).all()]
+
+    return user_ids, prescription_ids
@@ -0,0 +1,86 @@
+"""
+Stub AI model for benchmarks
+
+Mimics the part of google.generativeai.GenerativeModel that app.py uses
+(generate_content / generate_content_async -> object with .text, or with
+stream=True an iterator of such chunks), with configurable latency and a
+canned Gemini-style answer built from the medicines in the prompt.
+Image parts ({"mime_type", "data"}) are accepted and their sizes recorded
+in image_bytes.
+"""
+
+import asyncio
+import time
+
+STREAM_CHUNK_CHARS = 24
+
+CANNED_MEDICINES = ['remdesivir', 'tocilizumab', 'phexin', 'zeedol', 'stolin', 'colgate']
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    def __init__(self, latency=0.0, fail_every=0):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.calls = 0
+        self.image_bytes = []
+
+    def _prompt(self, contents):
+        if isinstance(contents, str):
+            return contents
+        parts = []
+        for part in contents:
+            if isinstance(part, dict):
+                self.image_bytes.append(len(part["data"]))
+            else:
+                parts.append(str(part))
+        return "\n".join(parts)
+
+    def _answer(self, prompt):
+        prompt_lower = prompt.lower()
+        found = [m for m in CANNED_MEDICINES if m in prompt_lower] or ['paracetamol']
+        lines = ["**Medicines:**"]
+        lines += [f"* {m.title()} - dose as prescribed, purpose per label" for m in found]
+        lines += [
+            "",
+            "**Nutrition tips:**",
+            "* Drink plenty of water throughout the day",
+            "* Eat light, easily digestible meals",
+            "",
+            "**Safety recommendations:**",
+            "* Complete the full course of treatment",
+            "* Report any allergic reaction to your doctor immediately",
+        ]
+        return "\n".join(lines)
+
+    def _stream(self, answer):
+        # Spread the latency over the chunks, like tokens arriving from the model
+        pieces = [answer[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(answer), STREAM_CHUNK_CHARS)]
+        for piece in pieces:
+            if self.latency:
+                time.sleep(self.latency / len(pieces))
+            yield StubResponse(piece)
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.calls += 1
+        if stream:
+            if self.fail_every and self.calls % self.fail_every == 0:
+                raise RuntimeError("stub model failure")
+            return self._stream(self._answer(self._prompt(prompt)))
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_every and self.calls % self.fail_every == 0:
+            raise RuntimeError("stub model failure")
+        return StubResponse(self._answer(self._prompt(prompt)))
+
+    async def generate_content_async(self, prompt, **kwargs):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.fail_every and self.calls % self.fail_every == 0:
+            raise RuntimeError("stub model failure")
+        return StubResponse(self._answer(self._prompt(prompt)))
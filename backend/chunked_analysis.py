@@ -0,0 +1,185 @@
+"""
+Chunked (map-reduce) AI analysis for long prescriptions
+
+Text longer than ANALYSIS_CHUNK_TOKENS (estimated at CHARS_PER_TOKEN
+characters per token) is split on page breaks (form feeds or "Page N"
+lines), then on blank-line sections, then on lines. Every page is chunked
+on its own, so editing one page only changes that page's chunks. The
+chunks are analyzed concurrently on a pool of ANALYSIS_CHUNK_WORKERS
+threads, which also bounds how many model calls run at once, and the
+results are merged: medicines, tips and recommendations de-duplicated in
+order of appearance, interactions recomputed across all chunks.
+
+Each chunk's analysis is stored in ChunkAnalysis under a digest of its
+text (and attached image), the knowledge-base version and the prompt
+version, so re-analysing an edited prescription only calls the model for
+the chunks that changed.
+"""
+
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+import jobs
+import metrics
+from interactions import check_interactions
+from knowledge_base import KB_VERSION, PROMPT_VERSION, MEDICINE_PATTERNS, GEMINI_MEDICINE_PATTERNS
+from logging_config import get_logger
+from models import db, ChunkAnalysis
+
+CHUNK_TOKENS = int(os.environ.get('ANALYSIS_CHUNK_TOKENS', '3000'))
+CHARS_PER_TOKEN = 4
+CHUNK_WORKERS = int(os.environ.get('ANALYSIS_CHUNK_WORKERS', '4'))
+
+PAGE_BREAK = re.compile(r'\f|\n(?=[ \t]*(?:-+[ \t]*)?page[ \t]+\d+\b)', re.IGNORECASE)
+SECTION_BREAK = re.compile(r'\n[ \t]*\n')
+
+# Display name -> keyword, to recompute interactions over the merged medicines
+NAME_KEYWORDS = {info["name"]: keyword
+                 for patterns in (GEMINI_MEDICINE_PATTERNS, MEDICINE_PATTERNS)
+                 for keyword, info in patterns.items()}
+
+logger = get_logger('chunked_analysis')
+
+_executor = ThreadPoolExecutor(max_workers=CHUNK_WORKERS, thread_name_prefix='chunk')
+
+
+def needs_chunking(text):
+    return len(text or '') > CHUNK_TOKENS * CHARS_PER_TOKEN
+
+
+def _split_lines(text, limit):
+    pieces, current = [], ''
+    for line in text.split('\n'):
+        if current and len(line) > limit:
+            # Keep the lines before an over-long one ahead of its pieces
+            pieces.append(current)
+            current = ''
+        while len(line) > limit:
+            pieces.append(line[:limit])
+            line = line[limit:]
+        if current and len(current) + 1 + len(line) > limit:
+            pieces.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_chunks(text, max_tokens=None):
+    """
+    Split text into chunks of at most max_tokens (estimated) on page and section boundaries
+    """
+    limit = (max_tokens or CHUNK_TOKENS) * CHARS_PER_TOKEN
+    chunks = []
+    for page in PAGE_BREAK.split(text):
+        current = ''
+        for section in SECTION_BREAK.split(page):
+            section = section.strip()
+            if not section:
+                continue
+            for piece in ([section] if len(section) <= limit else _split_lines(section, limit)):
+                if current and len(current) + 2 + len(piece) > limit:
+                    chunks.append(current)
+                    current = piece
+                else:
+                    current = f"{current}\n\n{piece}" if current else piece
+        if current:
+            chunks.append(current)
+    return chunks
+
+
+def _digest(chunk, file_path):
+    key = f"{KB_VERSION}\0{PROMPT_VERSION}\0{file_path or ''}\0{chunk}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _unique(items, key=lambda item: item):
+    seen = set()
+    result = []
+    for item in items:
+        k = key(item)
+        if k not in seen:
+            seen.add(k)
+            result.append(item)
+    return result
+
+
+def merge_analyses(results):
+    """
+    Reduce per-chunk analyses into one analysis in the usual format
+    """
+    medicines = _unique((m for r in results for m in r.get("medicines", [])),
+                        key=lambda m: m.get("name", "").lower())
+    matches = [(NAME_KEYWORDS[m["name"]], m["name"]) for m in medicines if m.get("name") in NAME_KEYWORDS]
+    merged = {
+        "medicines": medicines,
+        "explanation": "\n\n".join(_unique(r["explanation"] for r in results if r.get("explanation"))),
+        "nutrition_tips": _unique(t for r in results for t in r.get("nutrition_tips", [])),
+        "analysis_confidence": min((r.get("analysis_confidence", 0.0) for r in results), default=0.0),
+        "recommendations": _unique(t for r in results for t in r.get("recommendations", [])),
+        "interactions": check_interactions(matches),
+    }
+    raw = [r["raw_gemini_response"] for r in results if r.get("raw_gemini_response")]
+    if raw:
+        merged["raw_gemini_response"] = "\n\n".join(raw)
+    return merged
+
+
+def analyze_in_chunks(text, analyze_chunk, file_path=None):
+    """
+    Map analyze_chunk(chunk, file_path) over the chunks of text, reusing cached chunk analyses
+    """
+    chunks = split_chunks(text)
+    # The upload (if any) goes with the first chunk only
+    paths = [file_path] + [None] * (len(chunks) - 1)
+    digests = [_digest(chunk, path) for chunk, path in zip(chunks, paths)]
+
+    cached = {row.digest: json.loads(row.analysis_json)
+              for row in ChunkAnalysis.query.filter(ChunkAnalysis.digest.in_(set(digests))).all()}
+    futures = {}
+    for chunk, path, digest in zip(chunks, paths, digests):
+        metrics.record_cache("analysis_chunk", digest in cached)
+        if digest not in cached and digest not in futures:
+            futures[digest] = _executor.submit(analyze_chunk, chunk, path)
+
+    results = dict(cached)
+    for digest, future in futures.items():
+        results[digest] = future.result()
+    # Only model output is reusable; a mock fallback after a model error is not
+    fresh = {digest: json.dumps(results[digest]) for digest in futures if results[digest].get("raw_gemini_response")}
+    if fresh:
+        # Written on its own connection, outside the caller's (possibly bulk) transaction
+        jobs.submit('chunk_cache', _store, db.engine, fresh)
+
+    metrics.REGISTRY.observe("analysis_chunks", len(chunks), (), metrics.COUNT_BUCKETS)
+    logger.info("Chunked analysis finished",
+                extra={"chunks": len(chunks), "cached": len(chunks) - len(futures), "analyzed": len(futures)})
+    return merge_analyses([results[digest] for digest in digests])
+
+
+def _store(engine, analyses):
+    with Session(engine) as session:
+        for digest, analysis_json in analyses.items():
+            session.merge(ChunkAnalysis(digest=digest, kb_version=KB_VERSION, prompt_version=PROMPT_VERSION,
+                                        analysis_json=analysis_json))
+        session.commit()
+
+
+def purge_stale():
+    """
+    Drop cached chunk analyses made under an older knowledge base or prompt
+    """
+    result = db.session.execute(sa.delete(ChunkAnalysis)
+                                .where(sa.or_(ChunkAnalysis.kb_version != KB_VERSION,
+                                              ChunkAnalysis.prompt_version != PROMPT_VERSION))
+                                .execution_options(synchronize_session=False))
+    db.session.commit()
+    return result.rowcount
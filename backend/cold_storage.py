@@ -0,0 +1,82 @@
+"""
+Cold object storage for archived uploads
+
+get_store() returns an S3 bucket client when COLD_STORAGE_S3_BUCKET is set
+(boto3, with COLD_STORAGE_S3_ENDPOINT for MinIO and other S3-compatible
+servers), and otherwise a local directory that stands in for a bucket
+with the same put/get/delete interface.
+"""
+
+import os
+
+try:
+    import boto3
+except ImportError:
+    boto3 = None
+
+COLD_STORAGE_DIR = os.environ.get('COLD_STORAGE_DIR', 'cold_storage')
+COLD_STORAGE_S3_BUCKET = os.environ.get('COLD_STORAGE_S3_BUCKET')
+COLD_STORAGE_S3_ENDPOINT = os.environ.get('COLD_STORAGE_S3_ENDPOINT')
+
+
+class LocalObjectStore:
+    """
+    Directory-backed bucket; keys map to files under root
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError(f"Invalid object key '{key}'")
+        return path
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.part'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def get(self, key):
+        with open(self._path(key), 'rb') as f:
+            return f.read()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3ObjectStore:
+    def __init__(self, bucket, endpoint_url=None):
+        self.bucket = bucket
+        self.client = boto3.client('s3', endpoint_url=endpoint_url)
+
+    def put(self, key, data):
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data)
+
+    def get(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        if COLD_STORAGE_S3_BUCKET:
+            if boto3 is None:
+                raise RuntimeError("COLD_STORAGE_S3_BUCKET is set but boto3 is not installed")
+            _store = S3ObjectStore(COLD_STORAGE_S3_BUCKET, COLD_STORAGE_S3_ENDPOINT)
+        else:
+            _store = LocalObjectStore(COLD_STORAGE_DIR)
+    return _store
@@ -0,0 +1,134 @@
+"""
+Response compression for AI Medical Assistant
+
+Negotiates brotli (when the Brotli package is installed) or gzip from
+Accept-Encoding and compresses JSON/text responses above
+COMPRESSION_MIN_BYTES. Large compressed bodies are cached by content
+digest: an unchanged collection (the same /admin/prescriptions or
+/dashboard payload) costs one hash instead of a fresh compression on every
+refresh. Streaming and file responses pass through untouched.
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+import metrics
+
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+COMPRESSION_CACHE_MIN_BYTES = int(os.environ.get('COMPRESSION_CACHE_MIN_BYTES', '16384'))
+COMPRESSION_CACHE_MB = int(os.environ.get('COMPRESSION_CACHE_MB', '32'))
+GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '5'))
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'application/javascript', 'text/')
+
+# Preferred first when the client rates encodings equally
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+
+
+class CompressedCache:
+    """
+    Byte-bounded LRU of compressed bodies keyed by (encoding, digest)
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+
+CACHE = CompressedCache(COMPRESSION_CACHE_MB * 1024 * 1024)
+
+metrics.REGISTRY.gauge("compression_cache_bytes", lambda: {(): CACHE.size}, "Bytes held in the compressed-body cache")
+
+
+def negotiate(accept_encodings):
+    """
+    Best encoding we support from an Accept-Encoding header, or None
+    """
+    best, best_q = None, 0
+    for encoding in ENCODINGS:
+        q = accept_encodings.quality(encoding)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _compressible(response):
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    return (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)
+
+
+def setup_compression(app):
+    """
+    Install the compression hook on an app
+    """
+    @app.after_request
+    def _compress_response(response):
+        response.vary.add('Accept-Encoding')
+        if not _compressible(response):
+            return response
+        encoding = negotiate(request.accept_encodings)
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < COMPRESSION_MIN_BYTES:
+            return response
+
+        if len(data) >= COMPRESSION_CACHE_MIN_BYTES:
+            key = (encoding, hashlib.sha256(data).digest())
+            body = CACHE.get(key)
+            metrics.record_cache("compression", body is not None)
+            if body is None:
+                body = compress(data, encoding)
+                CACHE.put(key, body)
+        else:
+            body = compress(data, encoding)
+
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        metrics.REGISTRY.inc("compressed_responses_total", (("encoding", encoding),))
+        metrics.REGISTRY.inc("compression_saved_bytes_total", (), len(data) - len(body))
+        return response
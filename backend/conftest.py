@@ -0,0 +1,55 @@
+"""
+Shared pytest fixtures: every test gets the Flask app on a fresh SQLite database
+"""
+
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix='medassist-tests-')
+# Must be set before app is imported
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp, 'test.sqlite3')
+os.environ['DASHBOARD_CACHE_PATH'] = os.path.join(_tmp, 'dashboard.sqlite3')
+os.environ['COLD_STORAGE_DIR'] = os.path.join(_tmp, 'cold_storage')
+os.environ.pop('METRICS_DIR', None)
+os.environ.pop('DATABASE_REPLICA_URLS', None)
+
+import pytest
+
+import app as flask_app
+import reanalysis
+import review_queue
+from models import db, User
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setitem(flask_app.app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    with flask_app.app.app_context():
+        db.drop_all()
+        db.create_all()
+        review_queue._backfilled = False
+        reanalysis._baseline_checked = False
+        for user_id in (1, 2):
+            db.session.add(User(id=user_id, first_name='Test', last_name=f'User{user_id}',
+                                username=f'user{user_id}', email=f'user{user_id}@example.com',
+                                password='x', age=30, gender='other'))
+        db.session.commit()
+        yield flask_app.app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def submit(client):
+    """
+    Submit a prescription for review; returns its id
+    """
+    def submit(text, user_id=1):
+        response = client.post('/analyze', data={'user_id': str(user_id), 'text': text})
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['prescription_id']
+    return submit
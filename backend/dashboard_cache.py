@@ -0,0 +1,274 @@
+"""
+Per-user dashboard cache for AI Medical Assistant
+
+/dashboard bodies are cached per user, already serialized, in a SQLite file
+shared by every worker on the host (DASHBOARD_CACHE_PATH; by default a file
+in the temp directory named after the database, so separate databases never
+share entries).
+
+Every write path that changes a user's prescriptions calls invalidate()
+after committing. That bumps the user's generation, and a body is stored
+only if the generation it was built under is still current, so a dashboard
+read that raced a write is never cached. Bodies read from a replica are not
+cached within DB_READ_YOUR_WRITES_SECONDS of the user's last write, while
+the replica may still be behind.
+
+If an invalidation fails (the file is locked or unwritable), a marker
+file next to the cache makes every worker bypass it. The first worker
+that can write again invalidates every user and removes the marker, so a
+missed invalidation is never served for the rest of the TTL.
+
+DASHBOARD_CACHE_MB bounds the stored bodies (least recently used are
+evicted; triggers keep a running total, so a store never sums the table)
+and DASHBOARD_CACHE_TTL_SECONDS bounds how long an entry can outlive a
+change made outside the app. Hit rate is on /metrics as
+cache_requests_total{cache="dashboard"}.
+"""
+
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import metrics
+from logging_config import get_logger
+
+CACHE_PATH = os.environ.get('DASHBOARD_CACHE_PATH')
+CACHE_MB = int(os.environ.get('DASHBOARD_CACHE_MB', '32'))
+TTL_SECONDS = float(os.environ.get('DASHBOARD_CACHE_TTL_SECONDS', '3600'))
+REPLICA_LAG_SECONDS = float(os.environ.get('DB_READ_YOUR_WRITES_SECONDS', '5'))
+
+# Refresh an entry's LRU timestamp at most this often, so hits stay read-only
+ACCESS_RESOLUTION_SECONDS = 30
+# Generations of users without a cached body are kept this long after their last write
+GENERATION_RETENTION_SECONDS = 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dashboard_cache (
+    user_id TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL DEFAULT 0,
+    invalidated_at REAL,
+    body BLOB,
+    size INTEGER NOT NULL DEFAULT 0,
+    stored_at REAL,
+    accessed_at REAL
+);
+CREATE TABLE IF NOT EXISTS dashboard_cache_total (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO dashboard_cache_total (id, size) SELECT 0, COALESCE(SUM(size), 0) FROM dashboard_cache;
+CREATE TRIGGER IF NOT EXISTS dashboard_cache_size_insert AFTER INSERT ON dashboard_cache BEGIN
+    UPDATE dashboard_cache_total SET size = size + NEW.size;
+END;
+CREATE TRIGGER IF NOT EXISTS dashboard_cache_size_update AFTER UPDATE OF size ON dashboard_cache BEGIN
+    UPDATE dashboard_cache_total SET size = size - OLD.size + NEW.size;
+END;
+CREATE TRIGGER IF NOT EXISTS dashboard_cache_size_delete AFTER DELETE ON dashboard_cache BEGIN
+    UPDATE dashboard_cache_total SET size = size - OLD.size;
+END;
+"""
+
+logger = get_logger('dashboard_cache')
+
+
+class DashboardCache:
+    """
+    Byte-bounded, generation-checked cache of dashboard bodies in a shared SQLite file
+    """
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.stale_path = f"{path}.stale"
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._stale = False
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Losing the cache in a crash is harmless
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def usable(self):
+        """
+        False while a failed invalidation may have left stale bodies; retries the recovery
+        """
+        if not self._stale and not os.path.exists(self.stale_path):
+            return True
+        # Marker first: an invalidation failing during the wipe re-creates it and is not lost
+        try:
+            os.remove(self.stale_path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            return False
+        self._stale = False
+        try:
+            # Every user, since nobody knows which invalidation was missed
+            self._connect().execute("UPDATE dashboard_cache SET generation = generation + 1, body = NULL, size = 0")
+        except sqlite3.Error:
+            self.mark_stale()
+            return False
+        logger.info("Dashboard cache recovered after a failed invalidation")
+        return True
+
+    def mark_stale(self):
+        """
+        Make every worker bypass the cache until usable() can wipe it
+        """
+        self._stale = True
+        try:
+            with open(self.stale_path, 'a'):
+                pass
+        except OSError as e:
+            logger.error("Could not mark the dashboard cache stale for other workers: %s", e)
+
+    def get(self, user_id):
+        """
+        (body or None, generation) for a user; pass the generation back to put()
+        """
+        conn = self._connect()
+        row = conn.execute("SELECT body, generation, stored_at, accessed_at FROM dashboard_cache WHERE user_id = ?",
+                           (user_id,)).fetchone()
+        if row is None:
+            return None, 0
+        body, generation, stored_at, accessed_at = row
+        now = time.time()
+        if body is None or now - stored_at > TTL_SECONDS:
+            return None, generation
+        if now - accessed_at > ACCESS_RESOLUTION_SECONDS:
+            conn.execute("UPDATE dashboard_cache SET accessed_at = ? WHERE user_id = ?", (now, user_id))
+        return body, generation
+
+    def put(self, user_id, generation, body, from_replica=False):
+        """
+        Store a body built under generation, unless the user has been invalidated since
+        """
+        if len(body) > self.max_bytes:
+            return False
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT generation, invalidated_at FROM dashboard_cache WHERE user_id = ?",
+                               (user_id,)).fetchone()
+            current, invalidated_at = row if row else (0, None)
+            if current != generation or (from_replica and invalidated_at and now - invalidated_at < REPLICA_LAG_SECONDS):
+                conn.execute("COMMIT")
+                return False
+            conn.execute("INSERT INTO dashboard_cache (user_id, generation, body, size, stored_at, accessed_at) "
+                         "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(user_id) DO UPDATE SET "
+                         "body = excluded.body, size = excluded.size, "
+                         "stored_at = excluded.stored_at, accessed_at = excluded.accessed_at",
+                         (user_id, generation, body, len(body), now, now))
+            self._evict(conn, now)
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn, now):
+        total = conn.execute("SELECT size FROM dashboard_cache_total").fetchone()[0]
+        while total > self.max_bytes:
+            # Drop bodies but keep generations, so an in-flight read of an evicted user is still checked
+            rows = conn.execute("SELECT user_id, size FROM dashboard_cache WHERE body IS NOT NULL "
+                                "ORDER BY accessed_at LIMIT 32").fetchall()
+            if not rows:
+                break
+            for user_id, size in rows:
+                conn.execute("UPDATE dashboard_cache SET body = NULL, size = 0 WHERE user_id = ?", (user_id,))
+                total -= size
+                metrics.REGISTRY.inc("dashboard_cache_evictions_total")
+                if total <= self.max_bytes:
+                    break
+        conn.execute("DELETE FROM dashboard_cache WHERE body IS NULL AND COALESCE(invalidated_at, 0) < ?",
+                     (now - GENERATION_RETENTION_SECONDS,))
+
+    def invalidate(self, user_ids):
+        """
+        Drop the cached bodies of these users and bump their generations
+        """
+        now = time.time()
+        self._connect().executemany(
+            "INSERT INTO dashboard_cache (user_id, generation, invalidated_at) VALUES (?, 1, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET generation = generation + 1, body = NULL, size = 0, "
+            "invalidated_at = excluded.invalidated_at",
+            [(user_id, now) for user_id in user_ids])
+
+    def size(self):
+        return self._connect().execute("SELECT size FROM dashboard_cache_total").fetchone()[0]
+
+
+_cache = None
+
+
+def setup_dashboard_cache(database_uri):
+    """
+    Open the cache file for this database
+    """
+    global _cache
+    path = CACHE_PATH or os.path.join(
+        tempfile.gettempdir(),
+        f"medassist-dashboard-{hashlib.sha256(database_uri.encode('utf-8')).hexdigest()[:12]}.sqlite3")
+    _cache = DashboardCache(path, CACHE_MB * 1024 * 1024)
+    metrics.REGISTRY.gauge("dashboard_cache_bytes", lambda: {(): _cache.size()},
+                           "Bytes of dashboard bodies in the shared cache")
+    return _cache
+
+
+def cache_key(user_id):
+    # Only canonical integer ids, so "01" and "1" can't hold separate, unevictable entries
+    try:
+        return str(int(user_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def get(user_id):
+    """
+    Cached dashboard body for a user, or (None, generation) on a miss
+    """
+    key = cache_key(user_id)
+    if _cache is None or key is None or not _cache.usable():
+        return None, None
+    try:
+        body, generation = _cache.get(key)
+    except sqlite3.Error as e:
+        logger.warning("Dashboard cache read failed: %s", e)
+        return None, None
+    metrics.record_cache("dashboard", body is not None)
+    return body, generation
+
+
+def put(user_id, generation, body, from_replica=False):
+    key = cache_key(user_id)
+    if _cache is None or key is None or generation is None or not _cache.usable():
+        return
+    try:
+        _cache.put(key, generation, body, from_replica)
+    except sqlite3.Error as e:
+        logger.warning("Dashboard cache write failed: %s", e)
+
+
+def invalidate(user_ids):
+    """
+    Forget the dashboards of users whose prescriptions changed; call after committing
+    """
+    keys = {key for key in map(cache_key, user_ids) if key is not None}
+    if _cache is None or not keys:
+        return
+    try:
+        _cache.invalidate(keys)
+    except sqlite3.Error as e:
+        logger.error("Dashboard cache invalidation failed for users %s, bypassing the cache: %s",
+                     sorted(keys), e)
+        _cache.mark_stale()
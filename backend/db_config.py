@@ -0,0 +1,99 @@
+"""
+Database engine configuration for AI Medical Assistant
+
+Builds SQLALCHEMY_ENGINE_OPTIONS for the configured database and applies
+SQLite connection pragmas (WAL, synchronous=NORMAL, busy timeout, mmap).
+"""
+
+import os
+
+from sqlalchemy import event
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def is_sqlite_uri(uri):
+    return uri.startswith('sqlite')
+
+
+def build_engine_options(uri):
+    """
+    Return engine options for the given database URI, tuned from env
+    """
+    if is_sqlite_uri(uri):
+        return {
+            # Python-level wait on a locked database, in seconds
+            "connect_args": {
+                "timeout": _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000.0,
+                "check_same_thread": False,
+            },
+        }
+
+    options = {
+        "pool_size": _env_int('DB_POOL_SIZE', 5),
+        "max_overflow": _env_int('DB_MAX_OVERFLOW', 10),
+        "pool_timeout": _env_int('DB_POOL_TIMEOUT', 30),
+        "pool_recycle": _env_int('DB_POOL_RECYCLE', 1800),
+        "pool_pre_ping": True,
+    }
+
+    statement_timeout = _env_int('DB_STATEMENT_TIMEOUT_MS', 30000)
+    if uri.startswith('postgres') and statement_timeout > 0:
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout}"}
+
+    return options
+
+
+def async_database_url(uri):
+    """
+    Async-driver form of a database URI (aiosqlite / asyncpg)
+    """
+    if uri.startswith('sqlite:'):
+        return 'sqlite+aiosqlite:' + uri[len('sqlite:'):]
+    if uri.startswith('postgres://'):
+        return 'postgresql+asyncpg://' + uri[len('postgres://'):]
+    if uri.startswith('postgresql://'):
+        return 'postgresql+asyncpg://' + uri[len('postgresql://'):]
+    return uri
+
+
+def build_async_engine_options(uri):
+    """
+    Engine options for the async driver of the given database URI
+    """
+    options = build_engine_options(uri)
+    if is_sqlite_uri(uri):
+        options["connect_args"] = {"timeout": options["connect_args"]["timeout"]}
+    elif "connect_args" in options:
+        # asyncpg takes server settings directly instead of libpq options
+        statement_timeout = _env_int('DB_STATEMENT_TIMEOUT_MS', 30000)
+        options["connect_args"] = {"server_settings": {"statement_timeout": str(statement_timeout)}}
+    return options
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Apply per-connection pragmas to every new SQLite connection
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={_env_int('SQLITE_BUSY_TIMEOUT_MS', 5000)}")
+        cursor.execute(f"PRAGMA mmap_size={_env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)}")
+    finally:
+        cursor.close()
+
+
+def configure_engine(engine):
+    """
+    Attach dialect-specific connection hooks to an engine
+    """
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
@@ -0,0 +1,174 @@
+"""
+Read/write splitting for AI Medical Assistant
+
+With DATABASE_REPLICA_URLS set (comma-separated), each replica becomes a
+Flask-SQLAlchemy bind ("replica_0", ...). GET requests to views marked
+@replica_reads send their SELECTs to one replica; every write, every
+SELECT ... FOR UPDATE and anything after a write in the same session go
+to the primary.
+
+Read-your-writes: a successful mutation returns the time until which its
+client must read from the primary (now + DB_READ_YOUR_WRITES_SECONDS) in
+the X-DB-Primary-Until response header, and in the db_primary_until cookie
+for same-origin clients. A request that echoes either back while it is in
+the future reads from the primary. The frontend echoes the header on every
+call (apiFetch in config.js), which works across origins and workers without
+shared server state.
+
+For local testing, point DATABASE_REPLICA_URLS at a second SQLite file and
+copy the primary into it periodically to simulate replication lag:
+    python db_routing.py primary.sqlite3 replica.sqlite3 --interval 2
+"""
+
+import os
+import random
+import sqlite3
+import time
+
+import sqlalchemy as sa
+from flask import g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql import Select
+
+from db_config import build_engine_options, configure_engine
+import metrics
+
+REPLICA_URLS = [u.strip() for u in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if u.strip()]
+READ_YOUR_WRITES_SECONDS = float(os.environ.get('DB_READ_YOUR_WRITES_SECONDS', '5'))
+STICKY_COOKIE = 'db_primary_until'
+STICKY_HEADER = 'X-DB-Primary-Until'
+REPLICA_PREFIX = 'replica_'
+
+
+def replica_binds(urls=None):
+    """
+    SQLALCHEMY_BINDS entries for the configured replicas
+    """
+    return {f"{REPLICA_PREFIX}{i}": dict(build_engine_options(url), url=url)
+            for i, url in enumerate(REPLICA_URLS if urls is None else urls)}
+
+
+def replica_reads(view):
+    """
+    Mark a view whose GET requests may read from a replica
+    """
+    view.replica_reads = True
+    return view
+
+
+class RoutingSession(Session):
+    """
+    Session that sends plain SELECTs to a replica during replica-read requests
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._replica_allowed(clause):
+            replica = self._replica()
+            if replica is not None:
+                metrics.REGISTRY.inc("db_routed_statements_total", (("target", "replica"),))
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica_allowed(self, clause):
+        if not has_app_context() or not g.get('db_replica_reads') or self._flushing:
+            return False
+        if self.info.get('wrote') or self.new or self.dirty or self.deleted:
+            return False
+        return isinstance(clause, Select) and clause._for_update_arg is None
+
+    def _replica(self):
+        # One replica per session so a request sees a single consistent snapshot
+        if 'replica' not in self.info:
+            replicas = [engine for key, engine in self._db.engines.items()
+                        if key and key.startswith(REPLICA_PREFIX)]
+            self.info['replica'] = random.choice(replicas) if replicas else None
+        return self.info['replica']
+
+
+@sa.event.listens_for(RoutingSession, "after_flush")
+def _mark_flush(session, flush_context):
+    session.info['wrote'] = True
+
+
+@sa.event.listens_for(RoutingSession, "do_orm_execute")
+def _mark_write(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info['wrote'] = True
+
+
+def _sticky(now):
+    for value in (request.headers.get(STICKY_HEADER), request.cookies.get(STICKY_COOKIE)):
+        try:
+            if value and float(value) > now:
+                return True
+        except ValueError:
+            pass
+    return False
+
+
+def primary_until():
+    """
+    STICKY_HEADER / STICKY_COOKIE value for a client that just wrote
+    """
+    return f"{time.time() + READ_YOUR_WRITES_SECONDS:.3f}"
+
+
+def setup_routing(app, db, instrument=None):
+    """
+    Configure replica engines and install the per-request routing hooks
+
+    instrument(engine) is called on every replica engine, so the listeners
+    installed on the primary (metrics, profiling) also see routed reads.
+    """
+    with app.app_context():
+        replicas = [engine for key, engine in db.engines.items() if key and key.startswith(REPLICA_PREFIX)]
+    if not replicas:
+        return
+    for engine in replicas:
+        configure_engine(engine)
+        if instrument is not None:
+            instrument(engine)
+
+    @app.before_request
+    def _choose_route():
+        view = app.view_functions.get(request.endpoint)
+        g.db_replica_reads = (
+            request.method in ('GET', 'HEAD')
+            and getattr(view, 'replica_reads', False)
+            and not _sticky(time.time())
+        )
+
+    @app.after_request
+    def _stick_to_primary(response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+            value = primary_until()
+            response.headers[STICKY_HEADER] = value
+            response.set_cookie(STICKY_COOKIE, value, max_age=int(READ_YOUR_WRITES_SECONDS) + 1,
+                                httponly=True, samesite='Lax')
+        return response
+
+
+def copy_sqlite(primary_path, replica_path):
+    """
+    Snapshot a SQLite primary into a replica file with the online backup API
+    """
+    source = sqlite3.connect(primary_path)
+    target = sqlite3.connect(replica_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simulate a lagging SQLite replica")
+    parser.add_argument("primary")
+    parser.add_argument("replica")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between snapshots (the lag)")
+    args = parser.parse_args()
+    while True:
+        copy_sqlite(args.primary, args.replica)
+        time.sleep(args.interval)
@@ -0,0 +1,123 @@
+"""
+Streaming export of prescriptions and users
+
+Rows are read with a server-side cursor (yield_per) and written out one
+batch at a time as NDJSON or CSV, optionally gzip-compressed, so memory
+stays flat no matter how large the tables are.
+"""
+
+import csv
+import io
+import zlib
+
+from sqlalchemy import select
+
+from json_provider import dumps_bytes, splice_json
+from models import db, User, Prescription
+
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+PRESCRIPTION_FIELDS = ['id', 'user_id', 'user_name', 'user_email', 'raw_text', 'file_path',
+                       'file_type', 'status', 'created_at', 'analysis']
+USER_FIELDS = ['id', 'first_name', 'last_name', 'username', 'email', 'age', 'gender', 'created_at']
+
+
+def _stream(stmt):
+    result = db.session.execute(
+        stmt.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE)
+    )
+    for partition in result.partitions():
+        yield partition
+
+
+def _prescription_rows():
+    stmt = (
+        select(Prescription.id, Prescription.user_id, User.first_name, User.last_name, User.email,
+               Prescription.raw_text, Prescription.file_path, Prescription.file_type,
+               Prescription.status, Prescription.created_at, Prescription.analysis_json)
+        .join(User, User.id == Prescription.user_id)
+        .order_by(Prescription.id)
+    )
+    for partition in _stream(stmt):
+        yield [{
+            "id": r.id,
+            "user_id": r.user_id,
+            "user_name": f"{r.first_name} {r.last_name}",
+            "user_email": r.email,
+            "raw_text": r.raw_text,
+            "file_path": r.file_path,
+            "file_type": r.file_type,
+            "status": r.status,
+            "created_at": r.created_at.isoformat() if r.created_at else None,
+            "analysis": r.analysis_json,
+        } for r in partition]
+
+
+def _user_rows():
+    stmt = select(User.id, User.first_name, User.last_name, User.username, User.email,
+                  User.age, User.gender, User.created_at).order_by(User.id)
+    for partition in _stream(stmt):
+        yield [{
+            "id": r.id,
+            "first_name": r.first_name,
+            "last_name": r.last_name,
+            "username": r.username,
+            "email": r.email,
+            "age": r.age,
+            "gender": r.gender,
+            "created_at": r.created_at.isoformat() if r.created_at else None,
+        } for r in partition]
+
+
+def _ndjson(batches):
+    for batch in batches:
+        lines = []
+        for row in batch:
+            # Stored analysis JSON is written through untouched
+            raw_analysis = row.pop('analysis', None)
+            if raw_analysis is not None:
+                lines.append(splice_json(row, analysis=raw_analysis))
+            else:
+                lines.append(dumps_bytes(row))
+        yield b'\n'.join(lines) + b'\n'
+
+
+def _csv(batches, fields):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+    writer.writeheader()
+    yield buffer.getvalue().encode('utf-8')
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        # Sync-flush per batch so clients see data as it is produced
+        data += compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(table, fmt, compress=False):
+    """
+    Return a generator of encoded chunks for the given table and format
+    """
+    if table == 'prescriptions':
+        batches, fields = _prescription_rows(), PRESCRIPTION_FIELDS
+    else:
+        batches, fields = _user_rows(), USER_FIELDS
+
+    chunks = _ndjson(batches) if fmt == 'ndjson' else _csv(batches, fields)
+    return _gzip(chunks) if compress else chunks
@@ -0,0 +1,165 @@
+"""
+Fuzzy medicine name matching for misspelled prescriptions
+
+A trigram inverted index over the catalogue narrows each token to the few
+names that share enough trigrams to be within the edit-distance limit
+(one edit changes at most three trigrams), and only those candidates are
+checked with a bounded Levenshtein distance. Lookups stay well under a
+millisecond per token even for catalogues of tens of thousands of names.
+
+Short tokens are only matched exactly (most four- and five-letter words are
+one edit from some name), and common words that happen to sit near a
+catalogue name ("stolen", "college") are never fuzzy-matched.
+"""
+
+import os
+import re
+
+FUZZY_MAX_DISTANCE = int(os.environ.get('FUZZY_MAX_DISTANCE', '2'))
+# Tokens shorter than FUZZY_MIN_LENGTH must match exactly; from there one edit is
+# allowed, and one more per FUZZY_CHARS_PER_EDIT further characters
+FUZZY_MIN_LENGTH = int(os.environ.get('FUZZY_MIN_LENGTH', '6'))
+FUZZY_CHARS_PER_EDIT = int(os.environ.get('FUZZY_CHARS_PER_EDIT', '4'))
+
+# Everyday and prescription words of fuzzy-matchable length, never taken for a misspelled name
+STOPWORDS = frozenset("""
+    about above across action actually address advice affect after afternoon again against almost
+    already always amount animal another answer anyone anything appear around attack before behind
+    believe better between bottle breakfast brother called capsule capsules caught center central
+    change chemist chewed church clinic collar collate college colour common complete condition
+    continue control copper corner cotton couple course cousin dinner doctor dollar double during
+    either emergency enough evening family father female fever finger follow following friend garden
+    gentle ground health healthy hospital husband inhaler injection kitchen letter little lotion
+    mother medical medicine minute minutes months morning mostly nearly needle nights normal number
+    office ointment orange others parent patient pencil people period person pharmacy plenty please
+    pocket powder pretty reason record remedy remember result return school second severe should
+    simple sister solution spring stable stalin stolen stolid stomach street strong struck suffer
+    summer supper symptom system tablet tablets taking things though thought throat toilet travel
+    treatment twice unless village weekly weight window winter within without worker
+""".split())
+
+TOKEN_RE = re.compile(r"[a-z][a-z\-]+")
+
+
+def trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def bounded_levenshtein(a, b, limit):
+    """
+    Edit distance between a and b, or limit + 1 once it must exceed limit
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # Only cells within `limit` of the diagonal can stay under the limit
+    over = limit + 1
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        ca = a[i - 1]
+        lo, hi = max(1, i - limit), min(len(b), i + limit)
+        current = [over] * (len(b) + 1)
+        current[0] = i if i <= limit else over
+        row_min = current[0]
+        for j in range(lo, hi + 1):
+            cost = previous[j - 1] + (ca != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > limit:
+            return over
+        previous = current
+    return min(previous[-1], over)
+
+
+def allowed_distance(token, max_distance=None):
+    limit = FUZZY_MAX_DISTANCE if max_distance is None else max_distance
+    if len(token) < FUZZY_MIN_LENGTH:
+        return 0
+    edits = 1 + (len(token) - FUZZY_MIN_LENGTH) // max(FUZZY_CHARS_PER_EDIT, 1)
+    # Never more than len // 3 edits, or trigram filtering would prove nothing
+    return min(limit, edits, len(token) // 3)
+
+
+class TrigramIndex:
+    """
+    Prefix-filtered trigram index over a set of lowercase names
+
+    Trigrams are ranked globally from rarest to most common. A name within
+    d edits of a token shares all but 3 * d of its trigrams, so the two must
+    share one of their 3 * d + 1 rarest trigrams; each name is indexed under
+    only those, which keeps common fragments ("cil", "in ") from producing
+    candidates.
+    """
+
+    def __init__(self, names, max_distance=None):
+        self.max_distance = FUZZY_MAX_DISTANCE if max_distance is None else max_distance
+        self.names = sorted(set(names))
+        self.exact = frozenset(self.names)
+        self.grams = [trigrams(name) for name in self.names]
+        self.frequency = {}
+        for grams in self.grams:
+            for gram in grams:
+                self.frequency[gram] = self.frequency.get(gram, 0) + 1
+
+        # Postings are split by name length so a lookup only scans lengths within the limit
+        self.postings = {}
+        prefix = 3 * self.max_distance + 1
+        for i, (name, grams) in enumerate(zip(self.names, self.grams)):
+            for gram in self._rarest(grams)[:prefix]:
+                self.postings.setdefault((gram, len(name)), []).append(i)
+
+    def _rarest(self, grams):
+        frequency = self.frequency
+        return sorted(grams, key=lambda gram: (frequency.get(gram, 0), gram))
+
+    def _candidates(self, query, length, limit):
+        candidates = set()
+        for gram in self._rarest(query)[:3 * limit + 1]:
+            for n in range(length - limit, length + limit + 1):
+                candidates.update(self.postings.get((gram, n), ()))
+        return candidates
+
+    def lookup(self, token, max_distance=None):
+        """
+        Closest name within the allowed distance as (name, distance), or None
+        """
+        limit = min(allowed_distance(token, max_distance), self.max_distance)
+        if limit <= 0:
+            return None
+        query = trigrams(token)
+        names, grams = self.names, self.grams
+        # Best-first: names sharing the most trigrams are checked first, and
+        # each match tightens the bound for the rest
+        by_shared = {}
+        for i in self._candidates(query, len(token), limit):
+            by_shared.setdefault(len(query & grams[i]), []).append(i)
+        best = None
+        for shared in sorted(by_shared, reverse=True):
+            if shared < len(query) - 3 * limit:
+                break
+            for i in by_shared[shared]:
+                if shared < len(grams[i]) - 3 * limit:
+                    continue
+                distance = bounded_levenshtein(token, names[i], limit)
+                if distance <= limit and (best is None or (distance, names[i]) < best):
+                    best = (distance, names[i])
+                    limit = distance
+        return best[::-1] if best else None
+
+    def match_text(self, text, max_distance=None):
+        """
+        Map of catalogue name -> misspelled token for tokens that are not exact names
+        """
+        found = {}
+        for token in sorted(set(TOKEN_RE.findall(text.lower()))):
+            if token in self.exact or token in STOPWORDS:
+                continue
+            hit = self.lookup(token, max_distance)
+            if hit and hit[0] not in found:
+                found[hit[0]] = token
+        return found
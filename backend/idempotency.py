@@ -0,0 +1,213 @@
+"""
+Idempotency-Key support for mutating routes
+
+The first request with a given key runs normally and its response is
+stored (zlib-compressed when large) in IdempotencyRecord. Retries with the
+same key get the stored response back without running the view again, so
+a retried upload creates no second row and no second file.
+
+Keys are scoped to their owner (the admin, or the user_id the request is
+made for), and a key reused with a different request body gets 422.
+Client errors (4xx) and server errors are not stored, so a corrected retry
+runs again. While the first request runs, its placeholder expires after
+IDEMPOTENCY_LOCK_SECONDS, so a worker that died mid-request does not block
+the key for long; stored responses expire after IDEMPOTENCY_TTL_HOURS and
+are purged in the background.
+"""
+
+import hashlib
+import os
+import time
+import zlib
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request
+from sqlalchemy.exc import IntegrityError
+
+import jobs
+from logging_config import get_logger
+from models import db, IdempotencyRecord
+
+IDEMPOTENCY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_TTL_HOURS', '24'))
+IDEMPOTENCY_LOCK_SECONDS = int(os.environ.get('IDEMPOTENCY_LOCK_SECONDS', '300'))
+PURGE_INTERVAL_SECONDS = int(os.environ.get('IDEMPOTENCY_PURGE_INTERVAL_SECONDS', '600'))
+COMPRESS_MIN_BYTES = 512
+MAX_KEY_LENGTH = 200
+FORM_MIMETYPES = ('multipart/form-data', 'application/x-www-form-urlencoded')
+
+logger = get_logger('idempotency')
+
+_last_purge = 0.0
+
+
+def purge_expired(app):
+    """
+    Delete records past their TTL
+    """
+    with app.app_context():
+        deleted = IdempotencyRecord.query.filter(IdempotencyRecord.expires_at < datetime.utcnow()).delete(
+            synchronize_session=False)
+        db.session.commit()
+        if deleted:
+            logger.info("Purged expired idempotency records", extra={"deleted": deleted})
+
+
+def _maybe_schedule_purge():
+    global _last_purge
+    now = time.monotonic()
+    if now - _last_purge >= PURGE_INTERVAL_SECONDS:
+        _last_purge = now
+        jobs.submit('idempotency_purge', purge_expired, current_app._get_current_object())
+
+
+def owner_for(path, user_id=None):
+    """
+    Namespace of a request's keys: admin routes share one, user requests are per user_id
+    """
+    if path.startswith('/admin/'):
+        return 'admin'
+    return f"user:{user_id}"[:50] if user_id else 'anonymous'
+
+
+def fingerprint(method, path, query=(), body=b'', fields=(), files=()):
+    """
+    Digest of what a request asks for
+
+    Form fields and files ((field, filename, content digest) tuples) are
+    hashed by value, since a retried multipart body has a new boundary.
+    """
+    parts = [method, path, repr(sorted(query)), repr(sorted(fields)), repr(sorted(files))]
+    digest = hashlib.sha256('\0'.join(parts).encode('utf-8'))
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def _file_digest(storage):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: storage.stream.read(64 * 1024), b''):
+        digest.update(chunk)
+    storage.stream.seek(0)
+    return digest.hexdigest()
+
+
+def _request_fingerprint():
+    query = list(request.args.items(multi=True))
+    if request.mimetype in FORM_MIMETYPES:
+        files = [(name, storage.filename, _file_digest(storage))
+                 for name, storage in request.files.items(multi=True)]
+        return fingerprint(request.method, request.path, query,
+                           fields=list(request.form.items(multi=True)), files=files)
+    return fingerprint(request.method, request.path, query, body=request.get_data(cache=True))
+
+
+def _request_owner():
+    user_id = request.form.get('user_id') or request.args.get('user_id')
+    if not user_id and request.is_json:
+        data = request.get_json(silent=True)
+        user_id = data.get('user_id') if isinstance(data, dict) else None
+    return owner_for(request.path, user_id)
+
+
+def _replay(record):
+    body = zlib.decompress(record.body) if record.compressed else (record.body or b'')
+    response = current_app.response_class(body, status=record.status_code, content_type=record.content_type)
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _reserve(owner, key, scope, request_hash):
+    """
+    Insert an in-flight placeholder; returns an existing record on conflict
+    """
+    db.session.add(IdempotencyRecord(
+        owner=owner,
+        key=key,
+        scope=scope,
+        request_hash=request_hash,
+        expires_at=datetime.utcnow() + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS),
+    ))
+    try:
+        db.session.commit()
+        return None
+    except IntegrityError:
+        db.session.rollback()
+        return db.session.get(IdempotencyRecord, (owner, key))
+
+
+def _store(owner, key, response):
+    body = response.get_data()
+    compressed = len(body) >= COMPRESS_MIN_BYTES
+    record = db.session.get(IdempotencyRecord, (owner, key))
+    if record is None:
+        return
+    record.status_code = response.status_code
+    record.content_type = response.content_type
+    record.body = zlib.compress(body) if compressed else body
+    record.compressed = compressed
+    record.expires_at = datetime.utcnow() + timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+    db.session.commit()
+
+
+def _forget(owner, key):
+    db.session.rollback()
+    IdempotencyRecord.query.filter_by(owner=owner, key=key).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def conflict(existing, scope, request_hash):
+    """
+    Error (message, status) for a key that is in flight or was used for another request, else None
+    """
+    if existing.scope != scope or existing.request_hash != request_hash:
+        return "Idempotency-Key was already used for a different request", 422
+    if existing.status_code is None:
+        return "A request with this Idempotency-Key is still in progress", 409
+    return None
+
+
+def should_store(status_code):
+    # Only successes are final; a client or server error can be retried with the same key
+    return status_code < 400
+
+
+def idempotent(f):
+    """
+    Honour an Idempotency-Key header on a mutating view
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({"error": "Idempotency-Key is too long"}), 400
+
+        owner = _request_owner()
+        scope = f"{request.method} {request.path}"[:200]
+        request_hash = _request_fingerprint()
+        existing = db.session.get(IdempotencyRecord, (owner, key))
+        if existing is not None and existing.expires_at < datetime.utcnow():
+            _forget(owner, key)
+            existing = None
+        existing = existing or _reserve(owner, key, scope, request_hash)
+        if existing is not None:
+            error = conflict(existing, scope, request_hash)
+            if error:
+                message, status = error
+                return jsonify({"error": message}), status
+            return _replay(existing)
+
+        try:
+            response = make_response(f(*args, **kwargs))
+        except Exception:
+            _forget(owner, key)
+            raise
+
+        if should_store(response.status_code):
+            _store(owner, key, response)
+        else:
+            _forget(owner, key)
+        _maybe_schedule_purge()
+        return response
+    return decorated_function
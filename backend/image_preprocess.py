@@ -0,0 +1,98 @@
+"""
+Image preprocessing for multimodal prescription analysis
+
+Before an uploaded prescription image goes to the model it is rotated
+according to its EXIF orientation, converted to grayscale, downscaled so
+the longer side is at most IMAGE_MAX_SIDE pixels and re-encoded as JPEG.
+That is enough for the model to read the prescription and keeps the
+payload a fraction of a phone photo's size.
+
+Preprocessing runs in the calling thread (Pillow releases the GIL while
+decoding, resizing and encoding), but at most IMAGE_PREPROCESS_WORKERS
+images are decoded at once across all threads, which bounds the memory a
+burst of large photos can take. Results are cached by the SHA-256 of the
+original file, so re-analysing the same upload costs one hash.
+Without Pillow installed the original bytes are sent unchanged.
+"""
+
+import hashlib
+import io
+import mimetypes
+import os
+import threading
+import time
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+import metrics
+from compression import CompressedCache
+from logging_config import get_logger
+
+IMAGE_MAX_SIDE = int(os.environ.get('IMAGE_MAX_SIDE', '1600'))
+IMAGE_JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY', '80'))
+IMAGE_GRAYSCALE = os.environ.get('IMAGE_GRAYSCALE', '1').lower() in ('1', 'true', 'yes')
+IMAGE_PREPROCESS_WORKERS = int(os.environ.get('IMAGE_PREPROCESS_WORKERS', '2'))
+IMAGE_CACHE_MB = int(os.environ.get('IMAGE_CACHE_MB', '64'))
+
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+
+# Part of the cache key, so changing a setting never serves stale output
+SETTINGS = f"{IMAGE_MAX_SIDE}:{IMAGE_JPEG_QUALITY}:{int(IMAGE_GRAYSCALE)}"
+
+logger = get_logger('image_preprocess')
+
+_slots = threading.BoundedSemaphore(IMAGE_PREPROCESS_WORKERS)
+CACHE = CompressedCache(IMAGE_CACHE_MB * 1024 * 1024)
+
+metrics.REGISTRY.gauge("image_cache_bytes", lambda: {(): CACHE.size}, "Bytes held in the preprocessed-image cache")
+
+
+def is_image(filename):
+    return bool(filename) and '.' in filename and filename.rsplit('.', 1)[1].lower() in IMAGE_EXTENSIONS
+
+
+def preprocess(data):
+    """
+    EXIF-rotate, grayscale, downscale and JPEG-encode an image
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        # Let the JPEG decoder skip detail we would throw away anyway
+        img.draft('L' if IMAGE_GRAYSCALE else 'RGB', (IMAGE_MAX_SIDE, IMAGE_MAX_SIDE))
+        img = ImageOps.exif_transpose(img)
+        img = img.convert('L' if IMAGE_GRAYSCALE else 'RGB')
+        img.thumbnail((IMAGE_MAX_SIDE, IMAGE_MAX_SIDE), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, 'JPEG', quality=IMAGE_JPEG_QUALITY, optimize=True)
+    return out.getvalue()
+
+
+def prepare(data, filename=None):
+    """
+    Model-ready image part for upload bytes: {"mime_type", "data"} plus size/latency stats
+    """
+    started = time.perf_counter()
+    if Image is None:
+        mime_type = mimetypes.guess_type(filename or '')[0] or 'application/octet-stream'
+        return {"mime_type": mime_type, "data": data, "original_bytes": len(data),
+                "bytes": len(data), "seconds": 0.0, "cached": False}
+
+    key = (SETTINGS, hashlib.sha256(data).digest())
+    body = CACHE.get(key)
+    metrics.record_cache("image_preprocess", body is not None)
+    cached = body is not None
+    if body is None:
+        with _slots:
+            body = preprocess(data)
+        CACHE.put(key, body)
+    seconds = time.perf_counter() - started
+
+    metrics.REGISTRY.observe("image_payload_bytes", len(data), (("stage", "original"),), metrics.SIZE_BUCKETS)
+    metrics.REGISTRY.observe("image_payload_bytes", len(body), (("stage", "preprocessed"),), metrics.SIZE_BUCKETS)
+    metrics.REGISTRY.observe("image_preprocess_seconds", seconds, (("cached", str(cached).lower()),))
+    logger.info("Image prepared for model", extra={"original_bytes": len(data), "bytes": len(body),
+                                                   "seconds": round(seconds, 4), "cached": cached})
+    return {"mime_type": "image/jpeg", "data": body, "original_bytes": len(data),
+            "bytes": len(body), "seconds": seconds, "cached": cached}
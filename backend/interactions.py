@@ -0,0 +1,103 @@
+"""
+Drug-drug and drug-food interaction checks
+
+Rules live in data/interactions.json, keyed by a canonical medicine name
+that maps to one or more knowledge-base keywords (brand names). At import
+the rules are compiled once into a sparse adjacency map over integer
+medicine ids, so checking a prescription with k medicines is k² dict
+lookups and never touches the rule list.
+"""
+
+import json
+import os
+
+INTERACTIONS_PATH = os.environ.get(
+    'INTERACTIONS_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'interactions.json'),
+)
+
+SEVERITY_ORDER = {"major": 0, "moderate": 1, "minor": 2}
+
+
+class InteractionTable:
+    """
+    Compiled interaction rules: keyword -> id, and id -> {id: rule}
+    """
+
+    def __init__(self, data):
+        self.medicines = sorted(data.get("medicines", {}))
+        ids = {name: i for i, name in enumerate(self.medicines)}
+        self.keyword_ids = {}
+        for name, keywords in data.get("medicines", {}).items():
+            for keyword in keywords:
+                self.keyword_ids[keyword.lower()] = ids[name]
+
+        def medicine_id(name):
+            if name not in ids:
+                raise ValueError(f"Interaction rule references unknown medicine '{name}'")
+            return ids[name]
+
+        self.pairs = {}
+        for rule in data.get("drug_drug", []):
+            a, b = medicine_id(rule["a"]), medicine_id(rule["b"])
+            if a == b:
+                raise ValueError(f"Interaction rule pairs '{rule['a']}' with itself")
+            entry = {"severity": rule["severity"], "description": rule["description"]}
+            self.pairs.setdefault(a, {})[b] = entry
+            self.pairs.setdefault(b, {})[a] = entry
+
+        self.foods = {}
+        for rule in data.get("drug_food", []):
+            self.foods.setdefault(medicine_id(rule["drug"]), []).append(
+                {"food": rule["food"], "severity": rule["severity"], "description": rule["description"]})
+
+    def check(self, matches):
+        """
+        Interactions among matched medicines, given as (keyword, display name) pairs
+        """
+        present = {}
+        for keyword, name in matches:
+            medicine = self.keyword_ids.get(keyword)
+            if medicine is not None and medicine not in present:
+                present[medicine] = name
+
+        found = []
+        ordered = sorted(present)
+        for i, a in enumerate(ordered):
+            neighbours = self.pairs.get(a)
+            if neighbours:
+                for b in ordered[i + 1:]:
+                    rule = neighbours.get(b)
+                    if rule:
+                        found.append({"type": "drug-drug", "medicines": [present[a], present[b]], **rule})
+            for rule in self.foods.get(a, ()):
+                found.append({"type": "drug-food", "medicines": [present[a]], **rule})
+        found.sort(key=lambda item: SEVERITY_ORDER.get(item["severity"], len(SEVERITY_ORDER)))
+        return found
+
+    def rules_for(self, keyword):
+        """
+        Rules touching a keyword's medicine, in a stable form for fingerprinting
+        """
+        medicine = self.keyword_ids.get(keyword)
+        if medicine is None:
+            return []
+        pairs = sorted((self.medicines[other], rule["severity"], rule["description"])
+                       for other, rule in self.pairs.get(medicine, {}).items())
+        foods = sorted((rule["food"], rule["severity"], rule["description"]) for rule in self.foods.get(medicine, ()))
+        return [pairs, foods]
+
+
+def load(path=INTERACTIONS_PATH):
+    with open(path, encoding='utf-8') as f:
+        return InteractionTable(json.load(f))
+
+
+TABLE = load()
+
+
+def check_interactions(matches):
+    """
+    Interactions for (keyword, display name) pairs, most severe first
+    """
+    return TABLE.check(matches)
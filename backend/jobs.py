@@ -0,0 +1,60 @@
+"""
+Background jobs for AI Medical Assistant
+
+A small shared thread pool for work that must not sit on request latency
+(file deletion, re-analysis, preprocessing). Queue depth is exposed on
+/metrics as background_jobs_pending.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from logging_config import get_logger
+import metrics
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+
+logger = get_logger('jobs')
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+_pending = {}
+_lock = threading.Lock()
+
+
+def _pending_counts():
+    with _lock:
+        return {(("job", name),): count for name, count in _pending.items()}
+
+
+metrics.REGISTRY.gauge("background_jobs_pending", _pending_counts, "Queued or running background jobs")
+
+
+def submit(name, fn, *args, **kwargs):
+    """
+    Run fn(*args, **kwargs) on the background pool; errors are logged
+    """
+    with _lock:
+        _pending[name] = _pending.get(name, 0) + 1
+
+    def run():
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            logger.exception("Background job %s failed: %s", name, e)
+        finally:
+            with _lock:
+                _pending[name] -= 1
+
+    return _executor.submit(run)
+
+
+def remove_files(folder, filenames):
+    """
+    Delete files from folder, ignoring ones already gone
+    """
+    for filename in filenames:
+        try:
+            os.remove(os.path.join(folder, filename))
+        except FileNotFoundError:
+            pass
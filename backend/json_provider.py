@@ -0,0 +1,91 @@
+"""
+JSON serialization for API responses
+
+Uses orjson when it is installed and falls back to Flask's stdlib provider
+otherwise. Also provides helpers that splice JSON already stored in the
+database (e.g. Prescription.analysis_json) into a response without
+decoding and re-encoding it.
+"""
+
+import json
+
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def dumps_bytes(obj):
+    """
+    Serialize obj to compact UTF-8 JSON bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=DefaultJSONProvider.default,
+                            option=orjson.OPT_PASSTHROUGH_DATETIME)
+    return json.dumps(obj, default=DefaultJSONProvider.default,
+                      ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def splice_json(obj, **raw_fields):
+    """
+    Serialize a dict and append already-encoded JSON values as extra keys
+    """
+    body = dumps_bytes(obj)
+    if not raw_fields:
+        return body
+
+    parts = [body[:-1]]
+    sep = b'' if body == b'{}' else b','
+    for key, raw in raw_fields.items():
+        if isinstance(raw, str):
+            raw = raw.encode('utf-8')
+        parts.append(sep + dumps_bytes(key) + b':' + raw)
+        sep = b','
+    parts.append(b'}')
+    return b''.join(parts)
+
+
+def json_array(items):
+    """
+    Join pre-encoded JSON values into a JSON array
+    """
+    return b'[' + b','.join(items) + b']'
+
+
+def raw_json_response(body, status=200):
+    """
+    Wrap pre-encoded JSON bytes in a response
+    """
+    return current_app.response_class(body, status=status, mimetype='application/json')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson, with stdlib fallback
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None or (self.compact is None and self._app.debug):
+            # Keep Flask's pretty-printed output in debug mode
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._dumps_bytes(obj), mimetype=self.mimetype)
+
+    def _dumps_bytes(self, obj):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option)
@@ -0,0 +1,346 @@
+"""
+Medicine knowledge base for AI Medical Assistant
+
+Keyword -> medicine entry tables used by the analysis engine.
+MEDICINE_PATTERNS drives analyze_prescription_mock and
+GEMINI_MEDICINE_PATTERNS drives parse_gemini_response_to_json.
+
+Edits to the tables (and to interaction rules touching a medicine, see
+interactions.py) change KB_VERSION; edits to ANALYSIS_PROMPT or
+IMAGE_PROMPT_NOTE change PROMPT_VERSION. Both are recorded with each
+analysis so affected prescriptions can be re-analyzed.
+"""
+
+import hashlib
+import json
+
+from interactions import TABLE as INTERACTIONS
+
+ANALYSIS_PROMPT = """
+You are a medical assistant. Analyze the prescription below:
+
+\"\"\"{text}\"\"\"
+
+Extract the following:
+- List of medicines with dose and purpose
+- Food to avoid for each medicine
+- Safety considerations (e.g. pregnancy, diabetic)
+- Nutrition tips
+- Safety recommendations
+
+Format the answer clearly and simply.
+"""
+
+# Appended to the prompt when the uploaded prescription image is attached
+IMAGE_PROMPT_NOTE = """
+The prescription image is attached. Read the medicines and instructions from
+the image as well; the text above may be empty or incomplete.
+"""
+
+GEMINI_MEDICINE_PATTERNS = {
+    'remdesivir': {
+        "name": "Remdesivir (Remdec)",
+        "purpose": "Antiviral medication for COVID-19 treatment",
+        "dosage": "200mg STAT, then 100mg once daily for 4 days",
+        "price": "৳5000-15000",
+        "alternatives": ["Molnupiravir", "Paxlovid", "Favipiravir"],
+        "foodToAvoid": ["Grapefruit juice", "Alcohol", "High-fat meals"],
+        "side_effects": ["Nausea", "Liver problems", "Kidney issues", "Allergic reactions"]
+    },
+    'tocilizumab': {
+        "name": "Tocilizumab (Actemra)",
+        "purpose": "Immunosuppressive medication for severe COVID-19",
+        "dosage": "400mg once daily for 2 doses with 2-day gap",
+        "price": "৳15000-30000",
+        "alternatives": ["Baricitinib", "Dexamethasone", "Methylprednisolone"],
+        "foodToAvoid": ["Raw foods", "Unpasteurized dairy", "Alcohol"],
+        "side_effects": ["Infection risk", "Liver problems", "Allergic reactions", "Blood clotting issues"]
+    },
+    'phexin': {
+        "name": "Phexin (Cephalexin)",
+        "purpose": "Antibiotic for bacterial infections",
+        "dosage": "500mg 2-3 times daily",
+        "price": "৳30-80",
+        "alternatives": ["Amoxicillin", "Azithromycin", "Clarithromycin"],
+        "foodToAvoid": ["Dairy products (2 hours before/after)", "Alcohol"],
+        "side_effects": ["Diarrhea", "Nausea", "Stomach upset", "Allergic reactions"]
+    },
+    'zeedol': {
+        "name": "Zeedol PT (Paracetamol + Tramadol)",
+        "purpose": "Pain reliever and fever reducer",
+        "dosage": "As prescribed by doctor",
+        "price": "৳15-30",
+        "alternatives": ["Paracetamol", "Ibuprofen", "Diclofenac"],
+        "foodToAvoid": ["Alcohol", "Grapefruit juice"],
+        "side_effects": ["Drowsiness", "Nausea", "Constipation", "Dizziness"]
+    },
+    'stolin': {
+        "name": "Stolin Gum Paint",
+        "purpose": "Oral antiseptic for gum problems",
+        "dosage": "Apply 2-3 times daily",
+        "price": "৳50-120",
+        "alternatives": ["Betadine mouthwash", "Chlorhexidine", "Salt water rinse"],
+        "foodToAvoid": ["Spicy foods", "Hot foods", "Alcohol"],
+        "side_effects": ["Temporary staining", "Taste changes", "Mild irritation"]
+    },
+    'colgate': {
+        "name": "Colgate Plax Mouthwash",
+        "purpose": "Oral hygiene and fresh breath",
+        "dosage": "Rinse 2-3 times daily",
+        "price": "৳80-150",
+        "alternatives": ["Listerine", "Betadine mouthwash", "Salt water rinse"],
+        "foodToAvoid": ["None specific"],
+        "side_effects": ["Temporary burning sensation", "Taste changes"]
+    }
+}
+
+
+MEDICINE_PATTERNS = {
+    # Antibiotics
+    'phexin': {
+        "name": "Phexin (Cephalexin)",
+        "purpose": "Antibiotic for bacterial infections",
+        "dosage": "500mg 2-3 times daily",
+        "price": "৳30-80",
+        "alternatives": ["Amoxicillin", "Azithromycin", "Clarithromycin"],
+        "foodToAvoid": ["Dairy products (2 hours before/after)", "Alcohol"],
+        "side_effects": ["Diarrhea", "Nausea", "Stomach upset", "Allergic reactions"]
+    },
+    'amoxicillin': {
+        "name": "Amoxicillin",
+        "purpose": "Antibiotic for bacterial infections",
+        "dosage": "As prescribed by doctor",
+        "price": "৳20-50",
+        "alternatives": ["Azithromycin", "Clarithromycin", "Cephalexin"],
+        "foodToAvoid": ["Dairy products (2 hours before/after)"],
+        "side_effects": ["Diarrhea", "Nausea", "Allergic reactions"]
+    },
+    'azithromycin': {
+        "name": "Azithromycin",
+        "purpose": "Antibiotic for bacterial infections",
+        "dosage": "As prescribed by doctor",
+        "price": "৳40-100",
+        "alternatives": ["Amoxicillin", "Clarithromycin", "Cephalexin"],
+        "foodToAvoid": ["Dairy products", "Alcohol"],
+        "side_effects": ["Nausea", "Diarrhea", "Stomach pain"]
+    },
+
+    # COVID-19 and antiviral medications
+    'remdec': {
+        "name": "Remdec (Remdesivir)",
+        "purpose": "Antiviral medication for COVID-19 treatment",
+        "dosage": "200mg STAT, then 100mg once daily for 4 days",
+        "price": "৳5000-15000",
+        "alternatives": ["Molnupiravir", "Paxlovid", "Favipiravir"],
+        "foodToAvoid": ["Grapefruit juice", "Alcohol", "High-fat meals"],
+        "side_effects": ["Nausea", "Liver problems", "Kidney issues", "Allergic reactions"]
+    },
+    'remdesivir': {
+        "name": "Remdesivir",
+        "purpose": "Antiviral medication for COVID-19 treatment",
+        "dosage": "200mg STAT, then 100mg once daily for 4 days",
+        "price": "৳5000-15000",
+        "alternatives": ["Molnupiravir", "Paxlovid", "Favipiravir"],
+        "foodToAvoid": ["Grapefruit juice", "Alcohol", "High-fat meals"],
+        "side_effects": ["Nausea", "Liver problems", "Kidney issues", "Allergic reactions"]
+    },
+    'actemra': {
+        "name": "Actemra (Tocilizumab)",
+        "purpose": "Immunosuppressive medication for severe COVID-19",
+        "dosage": "400mg once daily for 2 doses with 2-day gap",
+        "price": "৳15000-30000",
+        "alternatives": ["Baricitinib", "Dexamethasone", "Methylprednisolone"],
+        "foodToAvoid": ["Raw foods", "Unpasteurized dairy", "Alcohol"],
+        "side_effects": ["Infection risk", "Liver problems", "Allergic reactions", "Blood clotting issues"]
+    },
+    'tocilizumab': {
+        "name": "Tocilizumab",
+        "purpose": "Immunosuppressive medication for severe COVID-19",
+        "dosage": "400mg once daily for 2 doses with 2-day gap",
+        "price": "৳15000-30000",
+        "alternatives": ["Baricitinib", "Dexamethasone", "Methylprednisolone"],
+        "foodToAvoid": ["Raw foods", "Unpasteurized dairy", "Alcohol"],
+        "side_effects": ["Infection risk", "Liver problems", "Allergic reactions", "Blood clotting issues"]
+    },
+
+    # Pain relievers and fever reducers
+    'paracetamol': {
+        "name": "Paracetamol/Acetaminophen",
+        "purpose": "Fever reducer and pain reliever",
+        "dosage": "500-1000mg every 4-6 hours",
+        "price": "৳5-15",
+        "alternatives": ["Ibuprofen", "Aspirin", "Diclofenac"],
+        "foodToAvoid": ["Alcohol", "High-fat meals"],
+        "side_effects": ["Nausea", "Liver problems (in high doses)"]
+    },
+    'napa': {
+        "name": "Napa (Paracetamol)",
+        "purpose": "Fever reducer and pain reliever",
+        "dosage": "500-1000mg every 4-6 hours",
+        "price": "৳5-15",
+        "alternatives": ["Ace", "Paracetamol", "Fevco"],
+        "foodToAvoid": ["Alcohol", "High-fat meals"],
+        "side_effects": ["Nausea", "Liver problems (in high doses)"]
+    },
+    'zeedol': {
+        "name": "Zeedol PT (Paracetamol + Tramadol)",
+        "purpose": "Pain reliever and fever reducer",
+        "dosage": "As prescribed by doctor",
+        "price": "৳15-30",
+        "alternatives": ["Paracetamol", "Ibuprofen", "Diclofenac"],
+        "foodToAvoid": ["Alcohol", "Grapefruit juice"],
+        "side_effects": ["Drowsiness", "Nausea", "Constipation", "Dizziness"]
+    },
+    'ibuprofen': {
+        "name": "Ibuprofen",
+        "purpose": "Pain reliever, fever reducer, anti-inflammatory",
+        "dosage": "200-400mg every 4-6 hours",
+        "price": "৳8-20",
+        "alternatives": ["Paracetamol", "Aspirin", "Diclofenac"],
+        "foodToAvoid": ["Alcohol", "Spicy foods"],
+        "side_effects": ["Stomach upset", "Heartburn", "Dizziness"]
+    },
+
+    # Stomach acid reducers
+    'omeprazole': {
+        "name": "Omeprazole",
+        "purpose": "Reduce stomach acid production",
+        "dosage": "20-40mg daily",
+        "price": "৳15-30",
+        "alternatives": ["Esomeprazole", "Lansoprazole", "Pantoprazole"],
+        "foodToAvoid": ["Spicy foods", "Citrus fruits", "Coffee"],
+        "side_effects": ["Headache", "Diarrhea", "Vitamin B12 deficiency"]
+    },
+    'sergel': {
+        "name": "Sergel (Omeprazole)",
+        "purpose": "Reduce stomach acid production",
+        "dosage": "20-40mg daily",
+        "price": "৳15-30",
+        "alternatives": ["Esomeprazole", "Lansoprazole", "Pantoprazole"],
+        "foodToAvoid": ["Spicy foods", "Citrus fruits", "Coffee"],
+        "side_effects": ["Headache", "Diarrhea", "Vitamin B12 deficiency"]
+    },
+    'pantoprazole': {
+        "name": "Pantoprazole",
+        "purpose": "Reduce stomach acid production",
+        "dosage": "20-40mg daily",
+        "price": "৳20-40",
+        "alternatives": ["Omeprazole", "Esomeprazole", "Lansoprazole"],
+        "foodToAvoid": ["Spicy foods", "Citrus fruits", "Coffee"],
+        "side_effects": ["Headache", "Diarrhea", "Nausea"]
+    },
+
+    # Oral care products
+    'stolin': {
+        "name": "Stolin Gum Paint",
+        "purpose": "Oral antiseptic for gum problems",
+        "dosage": "Apply 2-3 times daily",
+        "price": "৳50-120",
+        "alternatives": ["Betadine mouthwash", "Chlorhexidine", "Salt water rinse"],
+        "foodToAvoid": ["Spicy foods", "Hot foods", "Alcohol"],
+        "side_effects": ["Temporary staining", "Taste changes", "Mild irritation"]
+    },
+    'colgate': {
+        "name": "Colgate Plax Mouthwash",
+        "purpose": "Oral hygiene and fresh breath",
+        "dosage": "Rinse 2-3 times daily",
+        "price": "৳80-150",
+        "alternatives": ["Listerine", "Betadine mouthwash", "Salt water rinse"],
+        "foodToAvoid": ["None specific"],
+        "side_effects": ["Temporary burning sensation", "Taste changes"]
+    },
+    'oral-b': {
+        "name": "Oral-B Pro 2 2000N",
+        "purpose": "Electric toothbrush for better oral hygiene",
+        "dosage": "Use 2 times daily for 2 minutes",
+        "price": "৳2000-4000",
+        "alternatives": ["Manual toothbrush", "Other electric toothbrushes"],
+        "foodToAvoid": ["None specific"],
+        "side_effects": ["Gum sensitivity initially", "None serious"]
+    },
+
+    # Antihistamines
+    'cetirizine': {
+        "name": "Cetirizine",
+        "purpose": "Antihistamine for allergies",
+        "dosage": "10mg once daily",
+        "price": "৳10-25",
+        "alternatives": ["Loratadine", "Fexofenadine", "Chlorpheniramine"],
+        "foodToAvoid": ["Alcohol", "Grapefruit juice"],
+        "side_effects": ["Drowsiness", "Dry mouth", "Headache"]
+    },
+    'loratadine': {
+        "name": "Loratadine",
+        "purpose": "Antihistamine for allergies",
+        "dosage": "10mg once daily",
+        "price": "৳15-30",
+        "alternatives": ["Cetirizine", "Fexofenadine", "Chlorpheniramine"],
+        "foodToAvoid": ["Alcohol", "Grapefruit juice"],
+        "side_effects": ["Headache", "Dry mouth", "Fatigue"]
+    },
+
+    # Antacids
+    'ranitidine': {
+        "name": "Ranitidine",
+        "purpose": "Reduce stomach acid and treat ulcers",
+        "dosage": "150-300mg twice daily",
+        "price": "৳10-25",
+        "alternatives": ["Omeprazole", "Pantoprazole", "Famotidine"],
+        "foodToAvoid": ["Spicy foods", "Citrus fruits", "Coffee"],
+        "side_effects": ["Headache", "Dizziness", "Constipation"]
+    },
+
+    # Vitamins and supplements
+    'vitamin': {
+        "name": "Vitamin Supplements",
+        "purpose": "Nutritional support",
+        "dosage": "As prescribed by doctor",
+        "price": "৳50-200",
+        "alternatives": ["Natural food sources", "Other vitamin brands"],
+        "foodToAvoid": ["None specific"],
+        "side_effects": ["Nausea (if taken on empty stomach)", "None serious"]
+    },
+
+    # Cough and cold medicines
+    'dextromethorphan': {
+        "name": "Dextromethorphan",
+        "purpose": "Cough suppressant",
+        "dosage": "As prescribed by doctor",
+        "price": "৳20-50",
+        "alternatives": ["Honey", "Salt water gargle", "Other cough syrups"],
+        "foodToAvoid": ["Alcohol", "Grapefruit juice"],
+        "side_effects": ["Drowsiness", "Dizziness", "Nausea"]
+    }
+}
+
+
+def _fingerprint(entry):
+    return hashlib.sha256(json.dumps(entry, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+
+def medicine_fingerprints():
+    """
+    Per-keyword fingerprint over both tables, for change detection
+    """
+    keys = set(MEDICINE_PATTERNS) | set(GEMINI_MEDICINE_PATTERNS)
+    return {
+        key: _fingerprint([MEDICINE_PATTERNS.get(key), GEMINI_MEDICINE_PATTERNS.get(key),
+                           INTERACTIONS.rules_for(key)])
+        for key in sorted(keys)
+    }
+
+
+def mentioned_medicines(*texts):
+    """
+    Knowledge-base keywords that appear in any of the given texts
+    """
+    found = set()
+    for text in texts:
+        text_lower = (text or '').lower()
+        found.update(key for key in ALL_MEDICINE_KEYWORDS if key in text_lower)
+    return found
+
+
+ALL_MEDICINE_KEYWORDS = tuple(sorted(set(MEDICINE_PATTERNS) | set(GEMINI_MEDICINE_PATTERNS)))
+KB_VERSION = _fingerprint(medicine_fingerprints())
+PROMPT_VERSION = hashlib.sha256(f"{ANALYSIS_PROMPT}\0{IMAGE_PROMPT_NOTE}".encode('utf-8')).hexdigest()[:16]
@@ -0,0 +1,152 @@
+"""
+Structured, non-blocking logging for AI Medical Assistant
+
+Log records are pushed onto an in-process queue by request threads and
+written to stdout by a background listener thread, so log I/O stays off
+request latency. Every record carries the current request id, and large
+payloads (prescription text, model responses) are truncated and sampled.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import uuid
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+
+LOGGER_NAME = 'medassist'
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json').lower()
+PAYLOAD_SAMPLE_RATE = float(os.environ.get('LOG_PAYLOAD_SAMPLE_RATE', '0.01'))
+PAYLOAD_MAX_CHARS = int(os.environ.get('LOG_PAYLOAD_MAX_CHARS', '200'))
+
+_listener = None
+
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'request_id'}
+
+
+def get_logger(name=None):
+    return logging.getLogger(f"{LOGGER_NAME}.{name}" if name else LOGGER_NAME)
+
+
+def current_request_id():
+    if has_request_context():
+        return getattr(g, 'request_id', None)
+    return None
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Stamp records with the request id of the thread that emitted them
+    """
+
+    def filter(self, record):
+        record.request_id = current_request_id()
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    One JSON object per line, with any `extra=` fields included
+    """
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.utcfromtimestamp(record.created).isoformat() + 'Z',
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            entry["request_id"] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _AsyncQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Resolve args and traceback on the calling thread; the record is
+        # rendered to text by the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def truncate(text, limit=None):
+    limit = PAYLOAD_MAX_CHARS if limit is None else limit
+    if text is None:
+        return None
+    text = str(text)
+    return text if len(text) <= limit else f"{text[:limit]}... [{len(text) - limit} more chars]"
+
+
+def log_payload(logger, message, payload, **fields):
+    """
+    Log a verbose payload at DEBUG, truncated and sampled
+
+    Unsampled calls record only the payload size so large prescription
+    text or model output never floods the logs.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    size = len(payload) if payload is not None else 0
+    if random.random() < PAYLOAD_SAMPLE_RATE:
+        logger.debug(message, extra=dict(fields, payload=truncate(payload), payload_chars=size))
+    else:
+        logger.debug(message, extra=dict(fields, payload_chars=size))
+
+
+def setup_logging(app):
+    """
+    Install the queue-based handler and request-id hooks on an app
+    """
+    global _listener
+
+    logger = get_logger()
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+    if _listener is None:
+        stream_handler = logging.StreamHandler(sys.stdout)
+        if LOG_FORMAT == 'json':
+            stream_handler.setFormatter(JSONFormatter())
+        else:
+            stream_handler.setFormatter(logging.Formatter(
+                '%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s'))
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = _AsyncQueueHandler(log_queue)
+        queue_handler.addFilter(RequestIdFilter())
+        logger.addHandler(queue_handler)
+
+        _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+    @app.before_request
+    def _assign_request_id():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+
+    @app.after_request
+    def _echo_request_id(response):
+        request_id = getattr(g, 'request_id', None)
+        if request_id:
+            response.headers['X-Request-ID'] = request_id
+        return response
+
+    return logger
@@ -0,0 +1,356 @@
+"""
+Prometheus-style metrics for AI Medical Assistant
+
+A small in-process registry of counters, histograms and callback gauges,
+exposed in the Prometheus text format on /metrics. Recording is a dict
+lookup and a few additions under a lock, cheap enough to leave on.
+
+With several gunicorn workers, set METRICS_DIR to a directory shared by
+the workers: each worker periodically writes a snapshot there and
+/metrics merges all snapshots, so any worker can answer a scrape. When a
+worker exits, its counters and histograms are folded into
+metrics_accumulated.json before its snapshot is removed, so totals never
+go backwards when gunicorn recycles workers.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', '5'))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 1000)
+SIZE_BUCKETS = (1024, 10240, 102400, 512000, 1048576, 4194304, 16777216)
+
+HELP = {
+    "http_requests_total": ("counter", "HTTP requests by route, method and status"),
+    "http_request_duration_seconds": ("histogram", "HTTP request latency by route"),
+    "db_queries_per_request": ("histogram", "SQL statements issued per request"),
+    "db_query_seconds_per_request": ("histogram", "Time spent in SQL per request"),
+    "model_call_duration_seconds": ("histogram", "AI model call latency by outcome"),
+    "model_calls_total": ("counter", "AI model calls by outcome"),
+    "dashboard_cache_evictions_total": ("counter", "Dashboard bodies evicted to stay within DASHBOARD_CACHE_MB"),
+    "analysis_chunks": ("histogram", "Chunks per long prescription analyzed with chunked map-reduce"),
+    "model_first_token_seconds": ("histogram", "Time to the first streamed chunk of an AI model call"),
+    "cache_requests_total": ("counter", "Cache lookups by cache and result"),
+    "image_payload_bytes": ("histogram", "Size of prescription images sent to the model, before and after preprocessing"),
+    "image_preprocess_seconds": ("histogram", "Time to prepare a prescription image for the model"),
+    "upload_bytes": ("histogram", "Size of uploaded prescription files"),
+    "upload_bytes_total": ("counter", "Total bytes of uploaded prescription files"),
+}
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+
+    def inc(self, name, labels=(), amount=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, labels=(), buckets=LATENCY_BUCKETS):
+        key = (name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = {"buckets": list(buckets), "counts": [0] * (len(buckets) + 1),
+                                                "sum": 0.0, "count": 0}
+            hist["counts"][bisect_left(hist["buckets"], value)] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+
+    def gauge(self, name, fn, help_text=""):
+        """
+        Register a gauge whose value is computed at scrape time
+        """
+        self._gauges[name] = (fn, help_text)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": [[n, list(map(list, l)), v] for (n, l), v in self._counters.items()],
+                "histograms": [[n, list(map(list, l)), dict(h, counts=list(h["counts"]))]
+                               for (n, l), h in self._histograms.items()],
+            }
+
+
+REGISTRY = Registry()
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+
+
+def record_cache(cache, hit):
+    REGISTRY.inc("cache_requests_total", (("cache", cache), ("result", "hit" if hit else "miss")))
+
+
+def record_model_call(outcome, seconds):
+    labels = (("outcome", outcome),)
+    REGISTRY.inc("model_calls_total", labels)
+    REGISTRY.observe("model_call_duration_seconds", seconds, labels)
+
+
+def record_upload(size):
+    REGISTRY.inc("upload_bytes_total", (), size)
+    REGISTRY.observe("upload_bytes", size, (), SIZE_BUCKETS)
+
+
+def _labels_text(labels):
+    if not labels:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for k, v in labels
+    )
+    return "{" + body + "}"
+
+
+def _merge(snapshots):
+    counters, histograms = {}, {}
+    for snap in snapshots:
+        for name, labels, value in snap.get("counters", []):
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, hist in snap.get("histograms", []):
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.get(key)
+            if merged is None:
+                histograms[key] = dict(hist, counts=list(hist["counts"]))
+            elif merged["buckets"] == hist["buckets"]:
+                merged["counts"] = [a + b for a, b in zip(merged["counts"], hist["counts"])]
+                merged["sum"] += hist["sum"]
+                merged["count"] += hist["count"]
+    return counters, histograms
+
+
+def _as_snapshot(counters, histograms):
+    return {
+        "counters": [[n, list(map(list, l)), v] for (n, l), v in counters.items()],
+        "histograms": [[n, list(map(list, l)), h] for (n, l), h in histograms.items()],
+    }
+
+
+def _snapshot_path(pid=None):
+    return os.path.join(METRICS_DIR, f"metrics_{pid or os.getpid()}.json")
+
+
+ACCUMULATED_FILE = "metrics_accumulated.json"
+_fold_lock = threading.Lock()
+
+
+def _read_snapshot(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_snapshot(path, snapshot):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, path)
+
+
+def _fold_dead(name):
+    """
+    Add a dead worker's snapshot to the accumulated totals, then remove it
+    """
+    path = os.path.join(METRICS_DIR, name)
+    with _fold_lock, open(os.path.join(METRICS_DIR, "metrics.lock"), "a") as lock:
+        if fcntl is not None:
+            # Workers scraping at the same time must not fold a snapshot twice
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            dead = _read_snapshot(path)
+        except FileNotFoundError:
+            return  # Already folded by another worker
+        except ValueError:
+            dead = {}
+        accumulated_path = os.path.join(METRICS_DIR, ACCUMULATED_FILE)
+        try:
+            accumulated = _read_snapshot(accumulated_path)
+        except (FileNotFoundError, ValueError):
+            accumulated = {}
+        _write_snapshot(accumulated_path, _as_snapshot(*_merge([accumulated, dead])))
+        os.remove(path)
+
+
+def flush_snapshot():
+    """
+    Write this worker's snapshot to METRICS_DIR (atomic rename)
+    """
+    if not METRICS_DIR:
+        return
+    _write_snapshot(_snapshot_path(), REGISTRY.snapshot())
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Exists, owned by another user
+    return True
+
+
+def _collect_snapshots():
+    if not METRICS_DIR:
+        return [REGISTRY.snapshot()]
+    flush_snapshot()
+    names = [name for name in os.listdir(METRICS_DIR) if name.startswith("metrics_") and name.endswith(".json")]
+    for name in names:
+        pid = name[len("metrics_"):-len(".json")]
+        if pid.isdigit() and not _pid_alive(int(pid)):
+            # Left behind by a worker that exited; keep its totals, drop the file
+            try:
+                _fold_dead(name)
+            except OSError:
+                pass
+
+    snapshots = []
+    for name in os.listdir(METRICS_DIR):
+        if name.startswith("metrics_") and name.endswith(".json"):
+            try:
+                snapshots.append(_read_snapshot(os.path.join(METRICS_DIR, name)))
+            except (OSError, ValueError):
+                continue  # Snapshot being replaced or removed
+    return snapshots
+
+
+def render():
+    """
+    Render all metrics in the Prometheus text exposition format
+    """
+    counters, histograms = _merge(_collect_snapshots())
+    lines = []
+    seen = set()
+
+    def header(name):
+        if name in seen:
+            return
+        seen.add(name)
+        kind, help_text = HELP.get(name, ("untyped", ""))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name)
+        lines.append(f"{name}{_labels_text(labels)} {value}")
+
+    for (name, labels), hist in sorted(histograms.items(), key=lambda item: item[0]):
+        header(name)
+        cumulative = 0
+        for bound, count in zip(hist["buckets"] + ["+Inf"], hist["counts"]):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels_text(labels + (('le', bound),))} {cumulative}")
+        lines.append(f"{name}_sum{_labels_text(labels)} {hist['sum']}")
+        lines.append(f"{name}_count{_labels_text(labels)} {hist['count']}")
+
+    for name, (fn, help_text) in sorted(REGISTRY._gauges.items()):
+        try:
+            values = fn()
+        except Exception:
+            continue  # A failing gauge must not break the scrape
+        if not isinstance(values, dict):
+            values = {(): values}
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in values.items():
+            lines.append(f"{name}{_labels_text(labels)} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start"].pop()
+    if has_request_context() and "db_queries" in g:
+        g.db_queries += 1
+        g.db_seconds += time.perf_counter() - started
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start time too
+    conn = exception_context.connection
+    if conn is not None and exception_context.statement is not None:
+        starts = conn.info.get("query_start")
+        if starts:
+            starts.pop()
+
+
+def _flush_loop():
+    while True:
+        time.sleep(METRICS_FLUSH_SECONDS)
+        try:
+            flush_snapshot()
+        except OSError:
+            pass
+
+
+def instrument_engine(engine):
+    """
+    Count an engine's SQL into the per-request metrics
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def setup_metrics(app, engine):
+    """
+    Install request timing hooks and SQL counters on an app and engine
+    """
+    instrument_engine(engine)
+
+    if METRICS_DIR:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True).start()
+
+    @app.before_request
+    def _start_timer():
+        g.request_started = time.perf_counter()
+        g.db_queries = 0
+        g.db_seconds = 0.0
+
+    @app.after_request
+    def _record_request(response):
+        _record(response.status_code)
+        return response
+
+    @app.teardown_request
+    def _record_failed_request(exc):
+        # An exception that propagates out of the view skips after_request
+        if exc is not None:
+            _record(500)
+
+
+def _record(status_code):
+    started = g.pop("request_started", None)
+    if started is None:
+        return  # Not timed, or already recorded
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    if route == "/metrics":
+        return
+    labels = (("method", request.method), ("route", route))
+    REGISTRY.inc("http_requests_total", labels + (("status", str(status_code)),))
+    REGISTRY.observe("http_request_duration_seconds", time.perf_counter() - started, labels)
+    REGISTRY.observe("db_queries_per_request", g.db_queries, (("route", route),), COUNT_BUCKETS)
+    REGISTRY.observe("db_query_seconds_per_request", g.db_seconds, (("route", route),))
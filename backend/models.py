@@ -1,7 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
 
+from db_routing import RoutingSession
 
-db = SQLAlchemy()
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 from datetime import datetime
 
@@ -28,3 +30,89 @@ class User(db.Model):
     age = db.Column(db.Integer, nullable=False)
     gender = db.Column(db.String(10), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ReviewQueueItem(db.Model):
+    # One row per pending prescription; due_at folds age and priority into one sort key
+    prescription_id = db.Column(db.Integer, db.ForeignKey('prescription.id'), primary_key=True)
+    priority = db.Column(db.Integer, nullable=False, default=0)
+    due_at = db.Column(db.DateTime, nullable=False, index=True)
+    claimed_by = db.Column(db.String(100), nullable=True)
+    claim_token = db.Column(db.String(32), nullable=True, index=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
+
+
+class IdempotencyRecord(db.Model):
+    # Stored response for an Idempotency-Key; status_code is NULL while the first request runs
+    owner = db.Column(db.String(50), primary_key=True)  # admin, user:<id> or anonymous
+    key = db.Column(db.String(200), primary_key=True)
+    scope = db.Column(db.String(200), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer, nullable=True)
+    content_type = db.Column(db.String(100), nullable=True)
+    body = db.Column(db.LargeBinary, nullable=True)
+    compressed = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class AnalysisMeta(db.Model):
+    # Which engine, knowledge base and prompt produced a prescription's current analysis
+    prescription_id = db.Column(db.Integer, db.ForeignKey('prescription.id'), primary_key=True)
+    source = db.Column(db.String(20), nullable=False)  # ai, custom
+    kb_version = db.Column(db.String(32), nullable=True, index=True)
+    prompt_version = db.Column(db.String(32), nullable=True, index=True)
+    analyzed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class PrescriptionMedicine(db.Model):
+    # Medicine keyword -> prescription index used to find analyses affected by catalogue edits
+    prescription_id = db.Column(db.Integer, db.ForeignKey('prescription.id'), primary_key=True)
+    medicine_key = db.Column(db.String(100), primary_key=True, index=True)
+
+
+class KnowledgeBaseSnapshot(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kb_version = db.Column(db.String(32), nullable=False, unique=True)
+    fingerprints_json = db.Column(db.Text, nullable=False)  # {medicine_key: fingerprint}
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ChunkAnalysis(db.Model):
+    # Cached model analysis of one chunk of a long prescription, keyed by content digest
+    digest = db.Column(db.String(64), primary_key=True)
+    kb_version = db.Column(db.String(32), nullable=False, index=True)
+    prompt_version = db.Column(db.String(32), nullable=False)
+    analysis_json = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ReanalysisJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    kb_version = db.Column(db.String(32), nullable=False)
+    prompt_version = db.Column(db.String(32), nullable=False)
+    changed_medicines_json = db.Column(db.Text, nullable=False, default='[]')
+    total = db.Column(db.Integer, nullable=False, default=0)
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+
+class ArchivedUpload(db.Model):
+    # An upload that has left the hot uploads/ folder: compressed in place or moved to cold storage
+    filename = db.Column(db.String(255), primary_key=True)
+    tier = db.Column(db.String(20), nullable=False)  # compressed, cold
+    codec = db.Column(db.String(10), nullable=False)  # zstd, gzip
+    original_size = db.Column(db.Integer, nullable=False)
+    stored_size = db.Column(db.Integer, nullable=False)
+    uploaded_at = db.Column(db.DateTime, nullable=False, index=True)  # file age drives the next tier
+
+
+class AnalysisArchive(db.Model):
+    # Heavy fields trimmed from an old analysis_json, as zlib-compressed JSON
+    prescription_id = db.Column(db.Integer, db.ForeignKey('prescription.id'), primary_key=True)
+    payload = db.Column(db.LargeBinary, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
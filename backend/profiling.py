@@ -0,0 +1,194 @@
+"""
+Request-scoped profiling for AI Medical Assistant
+
+Profiling is opt-in per request (X-Profile header) or by sampling rate.
+A profiled request runs under cProfile and records every SQL statement it
+issues. The slowest PROFILE_KEEP requests are kept in PROFILE_DIR and can
+be listed and downloaded from the admin endpoints.
+
+Only one request is profiled at a time per worker; others run normally,
+which keeps overhead bounded when it is switched on in production.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from logging_config import get_logger
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles'))
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', '20'))
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')  # Required in X-Profile when set
+PROFILE_HEADER_ENABLED = os.environ.get('PROFILE_HEADER_ENABLED', 'false').lower() == 'true'
+MAX_SQL_STATEMENTS = 500
+
+logger = get_logger('profiling')
+
+_profile_lock = threading.Lock()
+
+
+def _requested():
+    header = request.headers.get('X-Profile')
+    if header and PROFILE_HEADER_ENABLED:
+        return PROFILE_TOKEN is None or header == PROFILE_TOKEN
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and g.get('profile_sql') is not None:
+        conn.info.setdefault('profile_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context():
+        return
+    captured = g.get('profile_sql')
+    starts = conn.info.get('profile_query_start')
+    if captured is None or not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    if len(captured) < MAX_SQL_STATEMENTS:
+        captured.append({"sql": statement[:2000], "ms": round(elapsed * 1000, 3), "many": executemany})
+
+
+def _profile_files():
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    return sorted(name for name in os.listdir(PROFILE_DIR) if name.endswith('.json'))
+
+
+def _persist(profile_id, duration, profiler, sql, status_code):
+    """
+    Save the profile if it is among the PROFILE_KEEP slowest seen
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    existing = _profile_files()
+    # File names start with the zero-padded duration, so name order is speed order
+    duration_us = int(duration * 1_000_000)
+    if len(existing) >= PROFILE_KEEP and existing and duration_us <= int(existing[0].split('_', 1)[0]):
+        return False
+
+    stats_text = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stats_text)
+    stats.sort_stats('cumulative').print_stats(40)
+
+    base = f"{duration_us:012d}_{profile_id}"
+    stats.dump_stats(os.path.join(PROFILE_DIR, base + '.prof'))
+    with open(os.path.join(PROFILE_DIR, base + '.json'), 'w') as f:
+        json.dump({
+            "id": profile_id,
+            "method": request.method,
+            "path": request.full_path.rstrip('?'),
+            "status": status_code,
+            "duration_ms": round(duration * 1000, 3),
+            "sql_count": len(sql),
+            "sql_ms": round(sum(q["ms"] for q in sql), 3),
+            "created_at": datetime.utcnow().isoformat(),
+            "sql": sql,
+            "stats": stats_text.getvalue(),
+        }, f)
+
+    for name in _profile_files()[:-PROFILE_KEEP or None]:
+        stem = name[:-len('.json')]
+        for ext in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, stem + ext))
+            except OSError:
+                pass
+    return True
+
+
+def list_profiles():
+    """
+    Summaries of stored profiles, slowest first
+    """
+    result = []
+    for name in reversed(_profile_files()):
+        try:
+            with open(os.path.join(PROFILE_DIR, name)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        data.pop('sql', None)
+        data.pop('stats', None)
+        result.append(data)
+    return result
+
+
+def find_profile(profile_id, ext='.json'):
+    """
+    Path to a stored profile file, or None
+    """
+    for name in _profile_files():
+        if name[:-len('.json')].split('_', 1)[1] == profile_id:
+            return os.path.join(PROFILE_DIR, name[:-len('.json')] + ext)
+    return None
+
+
+def _stop(response_status=None):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return None
+    profiler.disable()
+    try:
+        duration = time.perf_counter() - g.pop('profile_started')
+        sql = g.pop('profile_sql', None) or []
+        profile_id = g.pop('profile_id')
+        if response_status is not None and _persist(profile_id, duration, profiler, sql, response_status):
+            return profile_id
+        return None
+    finally:
+        _profile_lock.release()
+
+
+def instrument_engine(engine):
+    """
+    Attribute an engine's SQL to the request being profiled
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def setup_profiling(app, engine):
+    """
+    Install the opt-in profiling hooks on an app and engine
+    """
+    instrument_engine(engine)
+
+    @app.before_request
+    def _start_profile():
+        if not _requested() or not _profile_lock.acquire(blocking=False):
+            return
+        g.profile_id = uuid.uuid4().hex[:12]
+        g.profile_sql = []
+        g.profile_started = time.perf_counter()
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+    @app.after_request
+    def _finish_profile(response):
+        if 'profiler' in g:
+            try:
+                profile_id = _stop(response.status_code)
+                if profile_id:
+                    response.headers['X-Profile-Id'] = profile_id
+            except Exception:
+                logger.exception("Failed to store request profile")
+        return response
+
+    @app.teardown_request
+    def _abort_profile(exc):
+        # Unhandled exceptions skip after_request; make sure the lock is released
+        if 'profiler' in g:
+            _stop()
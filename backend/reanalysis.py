@@ -0,0 +1,283 @@
+"""
+Incremental re-analysis after knowledge-base or prompt changes
+
+Every stored analysis records the KB_VERSION and PROMPT_VERSION that
+produced it (AnalysisMeta) and the medicine keywords it mentions
+(PrescriptionMedicine). When the medicine tables change, the current
+per-medicine fingerprints are diffed against the last snapshot and only
+approved, AI-analyzed prescriptions that mention a changed medicine are
+recomputed, in throttled batches on the background pool. Analyses made
+under any other version, or under an unknown one, are recomputed in full.
+
+Approved prescriptions from before versions were recorded are backfilled
+with unknown versions (and so count as stale), their source guessed from
+the analysis: engine output always carries analysis_confidence.
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+
+import sqlalchemy as sa
+
+import dashboard_cache
+import jobs
+from knowledge_base import KB_VERSION, PROMPT_VERSION, medicine_fingerprints, mentioned_medicines
+from logging_config import get_logger
+from models import (db, Prescription, AnalysisMeta, PrescriptionMedicine, KnowledgeBaseSnapshot,
+                    ReanalysisJob)
+
+BATCH_SIZE = int(os.environ.get('REANALYSIS_BATCH_SIZE', '20'))
+THROTTLE_SECONDS = float(os.environ.get('REANALYSIS_THROTTLE_SECONDS', '1.0'))
+
+logger = get_logger('reanalysis')
+
+_baseline_checked = False
+
+
+def record(prescription_id, raw_text, analysis, source, session=None):
+    """
+    Record versions and the medicine index for a fresh analysis (default: db.session)
+    """
+    session = session or db.session
+    meta = session.get(AnalysisMeta, prescription_id)
+    if meta is None:
+        meta = AnalysisMeta(prescription_id=prescription_id)
+        session.add(meta)
+    meta.source = source
+    meta.kb_version = KB_VERSION
+    meta.prompt_version = PROMPT_VERSION
+    meta.analyzed_at = datetime.utcnow()
+
+    _ensure_baseline(session)
+    session.query(PrescriptionMedicine).filter_by(prescription_id=prescription_id).delete(synchronize_session=False)
+    session.bulk_insert_mappings(PrescriptionMedicine, _index_rows(prescription_id, raw_text, analysis))
+
+
+def _index_rows(prescription_id, raw_text, analysis):
+    medicines = analysis.get('medicines', []) if isinstance(analysis, dict) else []
+    names = ' '.join(m.get('name', '') for m in medicines if isinstance(m, dict))
+    return [{"prescription_id": prescription_id, "medicine_key": key}
+            for key in sorted(mentioned_medicines(raw_text, names))]
+
+
+def backfill():
+    """
+    Record approved prescriptions that have no versions yet; returns how many
+    """
+    missing = (db.session.query(Prescription.id, Prescription.raw_text, Prescription.analysis_json)
+               .outerjoin(AnalysisMeta, AnalysisMeta.prescription_id == Prescription.id)
+               .filter(Prescription.status == 'approved', AnalysisMeta.prescription_id.is_(None))
+               .all())
+    metas, index = [], []
+    for pid, raw_text, analysis_json in missing:
+        try:
+            analysis = json.loads(analysis_json or 'null')
+        except ValueError:
+            analysis = None
+        source = 'ai' if isinstance(analysis, dict) and 'analysis_confidence' in analysis else 'custom'
+        # Versions stay NULL: unknown, so always stale
+        metas.append({"prescription_id": pid, "source": source, "analyzed_at": None})
+        index.extend(_index_rows(pid, raw_text, analysis))
+    if missing:
+        ids = [m["prescription_id"] for m in metas]
+        db.session.execute(sa.delete(PrescriptionMedicine).where(PrescriptionMedicine.prescription_id.in_(ids))
+                           .execution_options(synchronize_session=False))
+        db.session.bulk_insert_mappings(AnalysisMeta, metas)
+        db.session.bulk_insert_mappings(PrescriptionMedicine, index)
+        db.session.commit()
+        logger.info("Backfilled analysis versions", extra={"prescriptions": len(missing)})
+    return len(missing)
+
+
+def _ensure_baseline(session):
+    # The first recorded analysis pins the catalogue it was made with
+    global _baseline_checked
+    if not _baseline_checked:
+        if session.query(KnowledgeBaseSnapshot).first() is None:
+            _save_snapshot(session)
+        _baseline_checked = True
+
+
+def forget(prescription_ids):
+    """
+    Remove versions and index rows for prescriptions (before deleting them)
+    """
+    if prescription_ids:
+        ids = list(prescription_ids)
+        for model in (PrescriptionMedicine, AnalysisMeta):
+            db.session.execute(sa.delete(model).where(model.prescription_id.in_(ids))
+                               .execution_options(synchronize_session=False))
+
+
+def changed_medicines():
+    """
+    (changed keys, added keys, snapshot version) since the last snapshot; changed is None without one
+    """
+    snapshot = KnowledgeBaseSnapshot.query.order_by(KnowledgeBaseSnapshot.id.desc()).first()
+    if snapshot is None:
+        return None, set(), None
+    if snapshot.kb_version == KB_VERSION:
+        return set(), set(), snapshot.kb_version
+    previous = json.loads(snapshot.fingerprints_json)
+    current = medicine_fingerprints()
+    changed = {key for key in set(previous) | set(current) if previous.get(key) != current.get(key)}
+    added = set(current) - set(previous)
+    return changed, added, snapshot.kb_version
+
+
+def _outdated(column, version):
+    return sa.or_(column.is_(None), column != version)
+
+
+def _affected_query(changed, added, include_prompt, baseline):
+    stale = _outdated(AnalysisMeta.kb_version, KB_VERSION)
+    conditions = []
+    if changed is None:
+        conditions.append(stale)
+    else:
+        # The snapshot diff only describes analyses made under the snapshot's version
+        conditions.append(sa.and_(stale, _outdated(AnalysisMeta.kb_version, baseline)))
+        at_baseline = AnalysisMeta.kb_version == baseline
+        if changed:
+            indexed = sa.select(PrescriptionMedicine.prescription_id).where(PrescriptionMedicine.medicine_key.in_(changed))
+            conditions.append(sa.and_(at_baseline, Prescription.id.in_(indexed)))
+        if added:
+            # New keywords are not in the index yet; fall back to a text scan for them
+            text = sa.func.lower(Prescription.raw_text)
+            conditions.append(sa.and_(at_baseline, sa.or_(*[text.contains(key) for key in added])))
+    if include_prompt:
+        conditions.append(_outdated(AnalysisMeta.prompt_version, PROMPT_VERSION))
+    return (db.session.query(Prescription.id)
+            .join(AnalysisMeta, AnalysisMeta.prescription_id == Prescription.id)
+            .filter(AnalysisMeta.source == 'ai', Prescription.status == 'approved', sa.or_(*conditions)))
+
+
+def plan(include_prompt=False):
+    """
+    Summary of what a re-analysis run would touch
+    """
+    backfill()
+    changed, added, baseline = changed_medicines()
+    query = _affected_query(changed, added, include_prompt, baseline)
+    return {
+        "kb_version": KB_VERSION,
+        "prompt_version": PROMPT_VERSION,
+        "changed_medicines": sorted(changed) if changed is not None else None,
+        "affected": query.count(),
+    }
+
+
+def _save_snapshot(session=None):
+    session = session or db.session
+    if session.query(KnowledgeBaseSnapshot).filter_by(kb_version=KB_VERSION).first() is None:
+        session.add(KnowledgeBaseSnapshot(kb_version=KB_VERSION,
+                                             fingerprints_json=json.dumps(medicine_fingerprints())))
+
+
+def start(app, analyze, include_prompt=False, batch_size=None, throttle_seconds=None):
+    """
+    Create a job and run it on the background pool; returns the job or None if one is running
+    """
+    if ReanalysisJob.query.filter(ReanalysisJob.status.in_(['queued', 'running'])).first():
+        return None
+    backfill()
+    changed, added, baseline = changed_medicines()
+    query = _affected_query(changed, added, include_prompt, baseline)
+    job = ReanalysisJob(
+        status='queued',
+        kb_version=KB_VERSION,
+        prompt_version=PROMPT_VERSION,
+        changed_medicines_json=json.dumps(sorted(changed) if changed is not None else None),
+        total=query.count(),
+    )
+    db.session.add(job)
+    db.session.commit()
+    jobs.submit('reanalysis', _run, app, job.id, analyze, include_prompt,
+                batch_size or BATCH_SIZE, THROTTLE_SECONDS if throttle_seconds is None else throttle_seconds)
+    return job
+
+
+def _run(app, job_id, analyze, include_prompt, batch_size, throttle_seconds):
+    with app.app_context():
+        job = db.session.get(ReanalysisJob, job_id)
+        job.status = 'running'
+        db.session.commit()
+        try:
+            changed, added, baseline = changed_medicines()
+            query = _affected_query(changed, added, include_prompt, baseline)
+            failed_ids = []
+            last_id = 0
+            while True:
+                ids = [pid for (pid,) in query.filter(Prescription.id > last_id)
+                       .order_by(Prescription.id).limit(batch_size).all()]
+                if not ids:
+                    break
+                rows = db.session.execute(sa.select(Prescription.id, Prescription.raw_text, Prescription.file_path)
+                                          .where(Prescription.id.in_(ids))).all()
+                # End the read transaction: the model calls must not run inside one
+                db.session.commit()
+                results = {}
+                for pid, raw_text, file_path in rows:
+                    try:
+                        results[pid] = (raw_text, analyze(raw_text, file_path))
+                    except Exception as e:
+                        logger.warning("Re-analysis of prescription %s failed: %s", pid, e)
+                        failed_ids.append(pid)
+                        job.failed += 1
+
+                # One short write transaction for the whole batch
+                batch = Prescription.query.filter(Prescription.id.in_(list(results))).all()
+                for p in batch:
+                    raw_text, analysis = results[p.id]
+                    if p.raw_text != raw_text:
+                        # Edited while the model ran; leave it stale for the next job
+                        failed_ids.append(p.id)
+                        job.failed += 1
+                        continue
+                    p.analysis_json = json.dumps(analysis)
+                    record(p.id, p.raw_text, analysis, 'ai')
+                    job.processed += 1
+                last_id = ids[-1]
+                user_ids = {p.user_id for p in batch}
+                db.session.commit()
+                dashboard_cache.invalidate(user_ids)
+                if throttle_seconds:
+                    time.sleep(throttle_seconds)
+
+            if changed is not None and baseline != KB_VERSION:
+                # Analyses under the snapshot's version that mention no changed medicine are
+                # still valid under the new KB; failed ones keep their version and stay stale
+                db.session.execute(sa.update(AnalysisMeta)
+                                   .where(AnalysisMeta.source == 'ai', AnalysisMeta.kb_version == baseline,
+                                          AnalysisMeta.prescription_id.notin_(failed_ids))
+                                   .values(kb_version=KB_VERSION)
+                                   .execution_options(synchronize_session=False))
+            _save_snapshot()
+            job.status = 'done'
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(ReanalysisJob, job_id)
+            job.status = 'failed'
+            job.error = str(e)
+            logger.exception("Re-analysis job %s failed: %s", job_id, e)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+
+def job_status(job):
+    return {
+        "id": job.id,
+        "status": job.status,
+        "kb_version": job.kb_version,
+        "prompt_version": job.prompt_version,
+        "changed_medicines": json.loads(job.changed_medicines_json),
+        "total": job.total,
+        "processed": job.processed,
+        "failed": job.failed,
+        "progress": round((job.processed + job.failed) / job.total, 3) if job.total else 1.0,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -0,0 +1,316 @@
+"""
+Tiered storage and retention for uploads and analyses
+
+Uploads older than RETENTION_COMPRESS_AFTER_DAYS are compressed in place
+(zstd when the zstandard package is installed, gzip otherwise), and after
+RETENTION_COLD_AFTER_DAYS the compressed copy moves to cold storage (see
+cold_storage.py). ArchivedUpload records where each file went, so
+/uploads/<filename> keeps working and decompresses on the fly.
+
+Reviewed prescriptions older than RETENTION_ARCHIVE_AFTER_DAYS have their
+heavy analysis fields (the raw Gemini text) moved out of analysis_json into
+AnalysisArchive, which keeps the hot prescription table small. Cached chunk
+analyses from an older knowledge base or prompt are dropped.
+
+Run from the admin API (POST /admin/retention/run) or from cron:
+    python retention.py
+
+Only one pass runs at a time per upload folder: a pass holds a lock on
+.retention.lock in it (flock, so other workers and cron see it too; a
+process-local lock where fcntl is unavailable), and a second start is
+refused with 409 from the API or exit status 1 from cron.
+"""
+
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+from werkzeug.security import safe_join
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import chunked_analysis
+import dashboard_cache
+import jobs
+import metrics
+from cold_storage import get_store
+from logging_config import get_logger
+from models import db, Prescription, ArchivedUpload, AnalysisArchive
+
+COMPRESS_AFTER_DAYS = int(os.environ.get('RETENTION_COMPRESS_AFTER_DAYS', '30'))
+COLD_AFTER_DAYS = int(os.environ.get('RETENTION_COLD_AFTER_DAYS', '180'))
+ARCHIVE_AFTER_DAYS = int(os.environ.get('RETENTION_ARCHIVE_AFTER_DAYS', '90'))
+BATCH_SIZE = int(os.environ.get('RETENTION_BATCH_SIZE', '200'))
+CODEC = os.environ.get('RETENTION_CODEC', 'zstd' if zstandard else 'gzip')
+
+# Analysis fields that are only needed for audits once a prescription is reviewed
+HEAVY_FIELDS = ('raw_gemini_response',)
+
+EXTENSIONS = {'zstd': '.zst', 'gzip': '.gz'}
+LOCK_FILENAME = '.retention.lock'
+
+logger = get_logger('retention')
+
+_last_run = None
+_run_lock = threading.Lock()
+
+
+def compress(data, codec):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstd codec requires the zstandard package")
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=9)
+
+
+def decompress(data, codec):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstd codec requires the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def _compressed_path(folder, filename, codec):
+    return os.path.join(folder, filename + EXTENSIONS[codec])
+
+
+def _cold_key(filename, codec):
+    return 'uploads/' + filename + EXTENSIONS[codec]
+
+
+def read_upload(folder, filename):
+    """
+    Bytes of an upload from whichever tier holds it, or None
+    """
+    path = safe_join(folder, filename)
+    if path and os.path.isfile(path):
+        with open(path, 'rb') as f:
+            return f.read()
+    record = db.session.get(ArchivedUpload, filename)
+    if record is None:
+        return None
+    if record.tier == 'cold':
+        data = get_store().get(_cold_key(filename, record.codec))
+    else:
+        with open(_compressed_path(folder, filename, record.codec), 'rb') as f:
+            data = f.read()
+    metrics.REGISTRY.inc("archived_upload_reads_total", (("tier", record.tier),))
+    return decompress(data, record.codec)
+
+
+def _tier_uploads(folder, now):
+    compress_before = (now - timedelta(days=COMPRESS_AFTER_DAYS)).timestamp()
+    cold_before = now - timedelta(days=COLD_AFTER_DAYS)
+    moved = {"compressed": 0, "cold": 0, "bytes_saved": 0}
+
+    # Hot -> compressed, judged by file age on disk
+    archived = {name for (name,) in db.session.query(ArchivedUpload.filename)}
+    for entry in os.scandir(folder):
+        if (not entry.is_file() or entry.name in archived or entry.name.startswith('.')
+                or entry.name.endswith(('.zst', '.gz', '.part'))):
+            continue
+        if entry.stat().st_mtime >= compress_before:
+            continue
+        with open(entry.path, 'rb') as f:
+            data = f.read()
+        packed = compress(data, CODEC)
+        target = _compressed_path(folder, entry.name, CODEC)
+        with open(target + '.part', 'wb') as f:
+            f.write(packed)
+        os.replace(target + '.part', target)
+        db.session.add(ArchivedUpload(filename=entry.name, tier='compressed', codec=CODEC,
+                                      original_size=len(data), stored_size=len(packed),
+                                      uploaded_at=datetime.utcfromtimestamp(entry.stat().st_mtime)))
+        db.session.commit()
+        # Only drop the original once the record points readers at the compressed copy
+        os.remove(entry.path)
+        moved["compressed"] += 1
+        moved["bytes_saved"] += len(data) - len(packed)
+
+    # Compressed -> cold
+    store = get_store()
+    for record in (ArchivedUpload.query.filter(ArchivedUpload.tier == 'compressed',
+                                               ArchivedUpload.uploaded_at < cold_before).all()):
+        path = _compressed_path(folder, record.filename, record.codec)
+        with open(path, 'rb') as f:
+            store.put(_cold_key(record.filename, record.codec), f.read())
+        record.tier = 'cold'
+        db.session.commit()
+        os.remove(path)
+        moved["cold"] += 1
+    return moved
+
+
+def _archive_analyses(now):
+    cutoff = now - timedelta(days=ARCHIVE_AFTER_DAYS)
+    archived = 0
+    last_id = 0
+    while True:
+        rows = (Prescription.query
+                .filter(Prescription.id > last_id,
+                        Prescription.status != 'pending',
+                        Prescription.created_at < cutoff,
+                        sa.or_(*[Prescription.analysis_json.contains(f'"{field}"') for field in HEAVY_FIELDS]))
+                .order_by(Prescription.id)
+                .limit(BATCH_SIZE)
+                .all())
+        if not rows:
+            break
+        for p in rows:
+            analysis = json.loads(p.analysis_json)
+            trimmed = {field: analysis.pop(field) for field in HEAVY_FIELDS if field in analysis}
+            if not trimmed:
+                continue
+            record = db.session.get(AnalysisArchive, p.id)
+            if record is None:
+                record = AnalysisArchive(prescription_id=p.id)
+                db.session.add(record)
+            else:
+                trimmed = dict(json.loads(zlib.decompress(record.payload)), **trimmed)
+            record.payload = zlib.compress(json.dumps(trimmed).encode('utf-8'))
+            record.archived_at = now
+            p.analysis_json = json.dumps(analysis)
+            archived += 1
+        last_id = rows[-1].id
+        user_ids = {p.user_id for p in rows}
+        db.session.commit()
+        dashboard_cache.invalidate(user_ids)
+    return archived
+
+
+def _acquire(folder):
+    """
+    Take the retention lock for folder; returns a handle for _release, or None if a pass holds it
+    """
+    if not _run_lock.acquire(blocking=False):
+        return None
+    if fcntl is None:
+        return True
+    os.makedirs(folder, exist_ok=True)
+    handle = open(os.path.join(folder, LOCK_FILENAME), 'a')
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        _run_lock.release()
+        return None
+    return handle
+
+
+def _release(handle):
+    if fcntl is not None:
+        fcntl.flock(handle, fcntl.LOCK_UN)
+        handle.close()
+    _run_lock.release()
+
+
+def start(app):
+    """
+    Start a pass on the background pool; returns False if one is already running
+    """
+    handle = _acquire(app.config['UPLOAD_FOLDER'])
+    if handle is None:
+        return False
+    jobs.submit('retention', _run_locked, app, handle)
+    return True
+
+
+def run(app):
+    """
+    One retention pass over uploads and analyses; returns what moved, or None if a pass is running
+    """
+    handle = _acquire(app.config['UPLOAD_FOLDER'])
+    if handle is None:
+        return None
+    return _run_locked(app, handle)
+
+
+def _run_locked(app, handle):
+    try:
+        return _run(app)
+    finally:
+        _release(handle)
+
+
+def _run(app):
+    global _last_run
+    with app.app_context():
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        result = _tier_uploads(app.config['UPLOAD_FOLDER'], now)
+        result["analyses_archived"] = _archive_analyses(now)
+        result["chunk_cache_purged"] = chunked_analysis.purge_stale()
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        result["finished_at"] = datetime.utcnow().isoformat()
+        _last_run = result
+        logger.info("Retention run finished", extra=result)
+        return result
+
+
+def load_archived_fields(prescription_id):
+    record = db.session.get(AnalysisArchive, prescription_id)
+    return json.loads(zlib.decompress(record.payload)) if record else None
+
+
+def forget(prescription_ids):
+    """
+    Remove archived analysis fields for prescriptions (before deleting them)
+    """
+    if prescription_ids:
+        db.session.execute(sa.delete(AnalysisArchive)
+                           .where(AnalysisArchive.prescription_id.in_(list(prescription_ids)))
+                           .execution_options(synchronize_session=False))
+
+
+def remove_uploads(app, filenames):
+    """
+    Delete uploads from every tier they may be stored in
+    """
+    with app.app_context():
+        folder = app.config['UPLOAD_FOLDER']
+        records = ArchivedUpload.query.filter(ArchivedUpload.filename.in_(list(filenames))).all()
+        for record in records:
+            if record.tier == 'cold':
+                get_store().delete(_cold_key(record.filename, record.codec))
+            else:
+                jobs.remove_files(folder, [record.filename + EXTENSIONS[record.codec]])
+            db.session.delete(record)
+        db.session.commit()
+        jobs.remove_files(folder, filenames)
+
+
+def stats():
+    rows = (db.session.query(ArchivedUpload.tier, sa.func.count(ArchivedUpload.filename),
+                             sa.func.coalesce(sa.func.sum(ArchivedUpload.original_size), 0),
+                             sa.func.coalesce(sa.func.sum(ArchivedUpload.stored_size), 0))
+            .group_by(ArchivedUpload.tier).all())
+    return {
+        "uploads": {tier: {"files": count, "original_bytes": int(original), "stored_bytes": int(stored)}
+                    for tier, count, original, stored in rows},
+        "archived_analyses": db.session.query(sa.func.count(AnalysisArchive.prescription_id)).scalar(),
+        "codec": CODEC,
+        "last_run": _last_run,
+    }
+
+
+if __name__ == '__main__':
+    from app import app
+    result = run(app)
+    if result is None:
+        sys.exit("A retention pass is already running")
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,201 @@
+"""
+Priority review queue for pending prescriptions
+
+Each pending prescription has a ReviewQueueItem. Reviewers claim the next
+N items with a time-limited lease; an expired lease makes the item
+claimable again. Claims are a single UPDATE over a locked candidate
+subquery (FOR UPDATE SKIP LOCKED on Postgres; on SQLite the statement
+itself holds the write lock), so parallel reviewers never get the same
+item.
+
+Ordering is by due_at: the submission time moved earlier by a priority
+boost, so older items and items with high-cost drugs come first.
+"""
+
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+from models import db, Prescription, ReviewQueueItem
+
+DEFAULT_LEASE_SECONDS = int(os.environ.get('REVIEW_LEASE_SECONDS', '600'))
+MAX_CLAIM = int(os.environ.get('REVIEW_MAX_CLAIM', '50'))
+HIGH_COST_BOOST_HOURS = int(os.environ.get('REVIEW_HIGH_COST_BOOST_HOURS', '24'))
+NO_TEXT_BOOST_HOURS = int(os.environ.get('REVIEW_NO_TEXT_BOOST_HOURS', '0'))
+
+# Drugs priced in the thousands of taka in the medicine tables
+HIGH_COST_KEYWORDS = ('remdesivir', 'remdec', 'tocilizumab', 'actemra', 'oral-b')
+
+_backfilled = False
+
+
+def priority_for(raw_text):
+    """
+    Priority boost in hours for a prescription's text
+    """
+    text_lower = (raw_text or '').lower()
+    boost = 0
+    if any(keyword in text_lower for keyword in HIGH_COST_KEYWORDS):
+        boost += HIGH_COST_BOOST_HOURS
+    if not text_lower.strip():
+        boost += NO_TEXT_BOOST_HOURS
+    return boost
+
+
+def enqueue(prescription, session=None):
+    """
+    Add a queue item for a pending prescription to the session (default: db.session)
+    """
+    priority = priority_for(prescription.raw_text)
+    created_at = prescription.created_at or datetime.utcnow()
+    item = ReviewQueueItem(
+        prescription_id=prescription.id,
+        priority=priority,
+        due_at=created_at - timedelta(hours=priority),
+    )
+    (session or db.session).add(item)
+    return item
+
+
+def complete(prescription_ids, session=None):
+    """
+    Drop queue items for prescriptions that left the pending state
+    """
+    if prescription_ids:
+        (session or db.session).execute(sa.delete(ReviewQueueItem)
+                           .where(ReviewQueueItem.prescription_id.in_(list(prescription_ids)))
+                           .execution_options(synchronize_session=False))
+
+
+def enqueue_missing(prescription_ids=None, session=None):
+    """
+    Add queue items for pending prescriptions (default: all of them) that have none
+
+    Call after moving prescriptions back to 'pending', before committing.
+    """
+    session = session or db.session
+    query = (session.query(Prescription.id, Prescription.raw_text, Prescription.created_at)
+             .outerjoin(ReviewQueueItem, ReviewQueueItem.prescription_id == Prescription.id)
+             .filter(Prescription.status == 'pending', ReviewQueueItem.prescription_id.is_(None)))
+    if prescription_ids is not None:
+        if not prescription_ids:
+            return 0
+        query = query.filter(Prescription.id.in_(list(prescription_ids)))
+    missing = query.all()
+    now = datetime.utcnow()
+    items = []
+    for pid, raw_text, created_at in missing:
+        priority = priority_for(raw_text)
+        items.append({"prescription_id": pid, "priority": priority,
+                      "due_at": (created_at or now) - timedelta(hours=priority)})
+    session.bulk_insert_mappings(ReviewQueueItem, items)
+    return len(items)
+
+
+def backfill():
+    """
+    Create queue items for pending prescriptions that have none
+    """
+    count = enqueue_missing()
+    db.session.commit()
+    return count
+
+
+def _ensure_backfilled():
+    global _backfilled
+    if not _backfilled:
+        backfill()
+        _backfilled = True
+
+
+def _available(now):
+    return sa.and_(
+        Prescription.status == 'pending',
+        sa.or_(ReviewQueueItem.claimed_by.is_(None), ReviewQueueItem.lease_expires_at < now),
+    )
+
+
+def claim(reviewer, count, lease_seconds=None):
+    """
+    Atomically lease up to count items to reviewer; returns (token, expires_at, ids)
+    """
+    _ensure_backfilled()
+    count = max(1, min(int(count), MAX_CLAIM))
+    lease_seconds = lease_seconds or DEFAULT_LEASE_SECONDS
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=lease_seconds)
+    token = uuid.uuid4().hex
+
+    candidates = (sa.select(ReviewQueueItem.prescription_id)
+                  .join(Prescription, Prescription.id == ReviewQueueItem.prescription_id)
+                  .where(_available(now))
+                  .order_by(ReviewQueueItem.due_at)
+                  .limit(count))
+    if db.engine.dialect.name == 'postgresql':
+        candidates = candidates.with_for_update(of=ReviewQueueItem, skip_locked=True)
+
+    db.session.execute(sa.update(ReviewQueueItem)
+                       .where(ReviewQueueItem.prescription_id.in_(candidates))
+                       .values(claimed_by=reviewer, claim_token=token, lease_expires_at=expires_at)
+                       .execution_options(synchronize_session=False))
+    db.session.commit()
+
+    ids = [pid for (pid,) in db.session.query(ReviewQueueItem.prescription_id)
+           .filter(ReviewQueueItem.claim_token == token)
+           .order_by(ReviewQueueItem.due_at).all()]
+    return token, expires_at, ids
+
+
+def renew(reviewer, prescription_ids, lease_seconds=None):
+    """
+    Extend leases held by reviewer; returns the ids that were renewed
+    """
+    expires_at = datetime.utcnow() + timedelta(seconds=lease_seconds or DEFAULT_LEASE_SECONDS)
+    held = _held_by(reviewer, prescription_ids)
+    if held:
+        db.session.execute(sa.update(ReviewQueueItem)
+                           .where(ReviewQueueItem.prescription_id.in_(held))
+                           .values(lease_expires_at=expires_at)
+                           .execution_options(synchronize_session=False))
+    db.session.commit()
+    return held, expires_at
+
+
+def release(reviewer, prescription_ids):
+    """
+    Give back leases held by reviewer so others can claim them
+    """
+    held = _held_by(reviewer, prescription_ids)
+    if held:
+        db.session.execute(sa.update(ReviewQueueItem)
+                           .where(ReviewQueueItem.prescription_id.in_(held))
+                           .values(claimed_by=None, claim_token=None, lease_expires_at=None)
+                           .execution_options(synchronize_session=False))
+    db.session.commit()
+    return held
+
+
+def _held_by(reviewer, prescription_ids):
+    now = datetime.utcnow()
+    return [pid for (pid,) in db.session.query(ReviewQueueItem.prescription_id)
+            .filter(ReviewQueueItem.prescription_id.in_(list(prescription_ids)),
+                    ReviewQueueItem.claimed_by == reviewer,
+                    ReviewQueueItem.lease_expires_at >= now).all()]
+
+
+def stats():
+    now = datetime.utcnow()
+    leased = sa.and_(ReviewQueueItem.claimed_by.isnot(None), ReviewQueueItem.lease_expires_at >= now)
+    total, claimed = db.session.query(
+        sa.func.count(ReviewQueueItem.prescription_id),
+        sa.func.coalesce(sa.func.sum(sa.case((leased, 1), else_=0)), 0),
+    ).one()
+    oldest = db.session.query(sa.func.min(ReviewQueueItem.due_at)).scalar()
+    return {
+        "queued": total,
+        "claimed": int(claimed),
+        "available": total - int(claimed),
+        "oldest_due_at": oldest.isoformat() if oldest else None,
+    }
@@ -12,5 +12,11 @@ pip install -r requirements.txt
 echo "=== Testing app import ==="
 python test_app.py
 
+if [ "$SERVER_MODE" = "asgi" ]; then
+    echo "=== Starting uvicorn (ASGI) ==="
+    pip install -r requirements-asgi.txt
+    exec python -m uvicorn asgi:app --host 0.0.0.0 --port $PORT --log-level debug
+fi
+
 echo "=== Starting gunicorn ==="
 python -m gunicorn --bind 0.0.0.0:$PORT app:app --timeout 120 --workers 1 --log-level debug
@@ -0,0 +1,104 @@
+"""
+ASGI entry point: request validation, approve races and the hooks Flask would have applied
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip('starlette')
+pytest.importorskip('aiosqlite')
+httpx = pytest.importorskip('httpx')
+
+import asgi
+from db_routing import STICKY_HEADER
+from models import db, Prescription
+
+
+def call(scope_headers, body=b''):
+    """
+    Send one raw POST /analyze; returns (status, headers)
+    """
+    scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST',
+             'scheme': 'http', 'path': '/analyze', 'raw_path': b'/analyze', 'root_path': '',
+             'query_string': b'', 'headers': scope_headers, 'client': ('test', 1), 'server': ('test', 80)}
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi.app(scope, receive, send))
+    start = sent[0]
+    return start['status'], {k.decode().lower(): v.decode() for k, v in start['headers']}
+
+
+def post(path, **kwargs):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi.app), base_url='http://test') as client:
+            return await client.post(path, **kwargs)
+    return asyncio.run(run())
+
+
+def test_malformed_content_length_is_rejected(app):
+    status, _ = call([(b'content-length', b'twelve'), (b'content-type', b'multipart/form-data; boundary=x')])
+    assert status == 400
+
+
+def test_declared_oversized_body_is_rejected(app):
+    too_big = str(app.config['MAX_CONTENT_LENGTH'] + 1).encode()
+    status, _ = call([(b'content-length', too_big), (b'content-type', b'multipart/form-data; boundary=x')])
+    assert status == 413
+
+
+def test_writes_get_request_id_and_read_your_writes_marker(app):
+    response = post('/analyze', data={'user_id': '1', 'text': 'Tab. Napa 500mg'}, headers={'X-Request-ID': 'abc'})
+
+    assert response.status_code == 201
+    assert response.headers['X-Request-ID'] == 'abc'
+    assert STICKY_HEADER in response.headers
+
+
+def test_failed_writes_do_not_stick(app):
+    response = post('/analyze', data={'text': 'Tab. Napa 500mg'})
+
+    assert response.status_code == 400
+    assert STICKY_HEADER not in response.headers
+
+
+def test_non_numeric_user_id_is_rejected(app, client):
+    assert post('/analyze', data={'user_id': 'abc', 'text': 'Tab. Napa 500mg'}).status_code == 400
+    assert client.post('/analyze', data={'user_id': 'abc', 'text': 'Tab. Napa 500mg'}).status_code == 400
+
+
+@pytest.mark.parametrize("headers", [[], [(b'idempotency-key', b'k1')]])
+def test_undeclared_oversized_body_is_rejected_while_reading(app, monkeypatch, headers):
+    monkeypatch.setitem(app.config, 'MAX_CONTENT_LENGTH', 1000)
+    body = (b'--x\r\nContent-Disposition: form-data; name="text"\r\n\r\n' + b'a' * 2000 + b'\r\n--x--\r\n')
+    status, _ = call(headers + [(b'content-type', b'multipart/form-data; boundary=x')], body)
+    assert status == 413
+
+
+def test_approve_of_a_prescription_deleted_during_the_model_call(app, submit, monkeypatch):
+    pid = submit("Tab. Napa 500mg")
+
+    async def analyze_with_ai(text, file_path=None):
+        db.session.delete(db.session.get(Prescription, pid))
+        db.session.commit()
+        return {"medicines": []}
+    monkeypatch.setattr(asgi, 'analyze_with_ai', analyze_with_ai)
+
+    assert post(f'/admin/prescription/{pid}/approve', json={}).status_code == 404
+
+
+def test_approve_uses_the_shared_analysis_pipeline(app, submit, monkeypatch):
+    pid = submit("Tab. Napa 500mg")
+    monkeypatch.setattr(asgi.flask_app, 'model', None)
+
+    response = post(f'/admin/prescription/{pid}/approve', json={})
+
+    assert response.status_code == 200
+    assert response.json()["analysis"] == asgi.flask_app.analyze_prescription_mock("Tab. Napa 500mg")
@@ -0,0 +1,102 @@
+"""
+Chunked analysis: split boundaries, the per-chunk cache and the merge
+"""
+
+import pytest
+
+import chunked_analysis
+from chunked_analysis import analyze_in_chunks, merge_analyses, purge_stale, split_chunks
+from models import db, ChunkAnalysis
+
+NAMES = {"napa": "Napa (Paracetamol)", "cetirizine": "Cetirizine", "loratadine": "Loratadine"}
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(chunked_analysis, 'CHUNK_TOKENS', 10)  # 40 characters
+    # Store the cache inline instead of on the background pool
+    monkeypatch.setattr(chunked_analysis.jobs, 'submit', lambda name, fn, *args: fn(*args))
+
+
+def analyzer(cacheable=True):
+    calls = []
+
+    def analyze_chunk(chunk, file_path=None):
+        calls.append(chunk)
+        result = {"medicines": [{"name": name} for word, name in NAMES.items() if word in chunk.lower()],
+                  "explanation": "chunk", "analysis_confidence": 0.9}
+        if cacheable:
+            result["raw_gemini_response"] = chunk
+        return result
+    analyze_chunk.calls = calls
+    return analyze_chunk
+
+
+def test_pages_are_chunked_separately():
+    text = "Tab. Napa 500mg\n\nCap. Seclo\fPage 2\nTab. Cetirizine"
+
+    assert split_chunks(text, 10) == ["Tab. Napa 500mg\n\nCap. Seclo", "Page 2\nTab. Cetirizine"]
+
+
+def test_no_chunk_exceeds_the_limit():
+    text = "\n\n".join(["Tab. Napa 500mg 1+0+1"] * 5) + "\n" + "x" * 100
+
+    chunks = split_chunks(text, 10)
+
+    assert all(len(chunk) <= 40 for chunk in chunks)
+    assert "".join(chunks).replace("\n", "") == text.replace("\n", "")
+
+
+def test_editing_one_page_only_changes_its_chunks():
+    before = split_chunks("Tab. Napa 500mg\fTab. Cetirizine 10mg\fTab. Loratadine", 10)
+    after = split_chunks("Tab. Napa 500mg\fTab. Cetirizine 5mg\fTab. Loratadine", 10)
+
+    assert [a == b for a, b in zip(before, after)] == [True, False, True]
+
+
+def test_unchanged_chunks_are_not_reanalyzed(app):
+    analyze_in_chunks("Tab. Napa 500mg\fTab. Cetirizine 10mg", analyzer())
+
+    analyze_chunk = analyzer()
+    analyze_in_chunks("Tab. Napa 500mg\fTab. Cetirizine 5mg", analyze_chunk)
+
+    assert analyze_chunk.calls == ["Tab. Cetirizine 5mg"]
+
+
+def test_fallback_analyses_are_not_cached(app):
+    analyze_in_chunks("Tab. Napa 500mg\fTab. Cetirizine 10mg", analyzer(cacheable=False))
+
+    assert ChunkAnalysis.query.count() == 0
+
+
+def test_new_knowledge_base_misses_the_cache_and_purges_it(app, monkeypatch):
+    text = "Tab. Napa 500mg\fTab. Cetirizine 10mg"
+    analyze_in_chunks(text, analyzer())
+    monkeypatch.setattr(chunked_analysis, 'KB_VERSION', 'next')
+
+    analyze_chunk = analyzer()
+    analyze_in_chunks(text, analyze_chunk)
+
+    assert len(analyze_chunk.calls) == 2
+    assert purge_stale() == 2
+    assert {row.kb_version for row in db.session.query(ChunkAnalysis)} == {'next'}
+
+
+def test_medicines_split_across_chunks_are_merged_once(app):
+    result = analyze_in_chunks("Tab. Napa 500mg\nTab. Cetirizine 10mg\fTab. NAPA 500mg\nTab. Loratadine",
+                               analyzer())
+
+    assert [m["name"] for m in result["medicines"]] == ["Napa (Paracetamol)", "Cetirizine", "Loratadine"]
+    # Cetirizine and loratadine are in different chunks; the interaction is found across them
+    assert any(i["medicines"] == ["Cetirizine", "Loratadine"] for i in result["interactions"])
+
+
+def test_merge_keeps_the_lowest_confidence_and_first_occurrences():
+    merged = merge_analyses([
+        {"medicines": [{"name": "Napa"}], "analysis_confidence": 0.9, "recommendations": ["Rest"]},
+        {"medicines": [{"name": "napa"}], "analysis_confidence": 0.6, "recommendations": ["Rest", "Fluids"]},
+    ])
+
+    assert merged["medicines"] == [{"name": "Napa"}]
+    assert merged["analysis_confidence"] == 0.6
+    assert merged["recommendations"] == ["Rest", "Fluids"]
@@ -0,0 +1,106 @@
+"""
+Dashboard cache: every write path invalidates, a failed invalidation is never served
+"""
+
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+import dashboard_cache
+import reanalysis
+import retention
+from knowledge_base import KB_VERSION
+from models import db, AnalysisMeta, Prescription, ReanalysisJob
+
+
+def cached_dashboard(client, user_id=1):
+    response = client.get(f'/dashboard?user_id={user_id}')
+    assert dashboard_cache.get(user_id)[0] is not None
+    return response.get_json()
+
+
+def approve(app, client, pid):
+    assert client.post(f'/admin/prescription/{pid}/approve', json={}).status_code == 200
+
+
+def reject(app, client, pid):
+    assert client.post(f'/admin/prescription/{pid}/reject', json={'reason': 'Illegible'}).status_code == 200
+
+
+def delete(app, client, pid):
+    assert client.delete(f'/prescription/{pid}').status_code == 200
+
+
+def bulk(app, client, pid):
+    response = client.post('/admin/prescriptions/bulk', json={'actions': [{'id': pid, 'action': 'status',
+                                                                           'status': 'approved'}]})
+    assert response.status_code == 200
+
+
+def reanalyze(app, client, pid):
+    db.session.get(AnalysisMeta, pid).prompt_version = 'old'
+    job = ReanalysisJob(status='queued', kb_version=KB_VERSION, prompt_version='', changed_medicines_json='[]')
+    db.session.add(job)
+    db.session.commit()
+    reanalysis._run(app, job.id, lambda text, file_path=None: {"medicines": []}, True, 20, 0)
+    db.session.expire_all()
+    assert db.session.get(ReanalysisJob, job.id).processed == 1
+
+
+def archive(app, client, pid):
+    p = db.session.get(Prescription, pid)
+    p.analysis_json = json.dumps({"medicines": [], "raw_gemini_response": "long model output"})
+    p.created_at = datetime.utcnow() - timedelta(days=retention.ARCHIVE_AFTER_DAYS + 1)
+    db.session.commit()
+    assert retention.run(app)["analyses_archived"] == 1
+
+
+@pytest.mark.parametrize("write", [approve, reject, delete, bulk, reanalyze, archive])
+def test_write_paths_invalidate_the_users_dashboard(app, client, submit, write):
+    pid = submit("Tab. Napa 500mg")
+    if write in (reanalyze, archive):
+        approve(app, client, pid)
+    cached_dashboard(client)
+
+    write(app, client, pid)
+
+    assert dashboard_cache.get(1)[0] is None
+
+
+def test_failed_invalidation_is_not_served(app, client, submit, monkeypatch):
+    first = submit("Tab. Napa 500mg")
+    cached_dashboard(client)
+
+    def locked(user_ids):
+        raise sqlite3.OperationalError("database is locked")
+    with monkeypatch.context() as m:
+        m.setattr(dashboard_cache._cache, 'invalidate', locked)
+        second = submit("Tab. Seclo 20mg")
+    assert os.path.exists(dashboard_cache._cache.stale_path)
+
+    assert [p["id"] for p in client.get('/dashboard?user_id=1').get_json()] == [second, first]
+    assert not os.path.exists(dashboard_cache._cache.stale_path)
+
+
+def test_another_workers_failed_invalidation_is_not_served(app, client):
+    cached_dashboard(client)
+    db.session.add(Prescription(user_id=1, raw_text="Tab. Seclo 20mg", analysis_json='{}', status='pending'))
+    db.session.commit()
+    open(dashboard_cache._cache.stale_path, 'a').close()
+
+    assert len(client.get('/dashboard?user_id=1').get_json()) == 1
+
+
+def test_size_is_a_running_total(app, client, submit):
+    submit("Tab. Napa 500mg", user_id=2)
+    cached_dashboard(client, user_id=1)
+    cached_dashboard(client, user_id=2)
+
+    cache = dashboard_cache._cache
+    conn = cache._connect()
+    assert cache.size() == conn.execute("SELECT SUM(size) FROM dashboard_cache").fetchone()[0]
+    dashboard_cache.invalidate([2])
+    assert cache.size() == conn.execute("SELECT SUM(size) FROM dashboard_cache").fetchone()[0]
@@ -0,0 +1,47 @@
+"""
+Read routing: the primary-until token sticks a client to the primary; replica SQL is metered
+"""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+import sqlalchemy as sa
+from flask import Flask, g
+
+import metrics
+from db_routing import STICKY_COOKIE, STICKY_HEADER, _sticky, primary_until, setup_routing
+
+
+@pytest.mark.parametrize("headers, cookie, sticky", [
+    ({}, None, False),
+    ({STICKY_HEADER: "{future}"}, None, True),
+    ({}, "{future}", True),
+    ({STICKY_HEADER: "{past}"}, None, False),
+    ({STICKY_HEADER: "not-a-time"}, "{future}", True),
+])
+def test_echoed_token_sticks_until_it_expires(app, headers, cookie, sticky):
+    now = time.time()
+    values = {"future": f"{now + 5:.3f}", "past": f"{now - 5:.3f}"}
+    headers = {name: value.format(**values) for name, value in headers.items()}
+    if cookie:
+        headers['Cookie'] = f"{STICKY_COOKIE}={cookie.format(**values)}"
+    with app.test_request_context('/dashboard', headers=headers):
+        assert _sticky(now) is sticky
+
+
+def test_token_is_in_the_future():
+    assert float(primary_until()) > time.time()
+
+
+def test_replica_engines_get_the_metrics_listeners(tmp_path):
+    replica = sa.create_engine(f"sqlite:///{tmp_path / 'replica.sqlite3'}")
+    app = Flask(__name__)
+    setup_routing(app, SimpleNamespace(engines={None: sa.create_engine("sqlite://"), 'replica_0': replica}),
+                  metrics.instrument_engine)
+
+    with app.test_request_context('/dashboard'):
+        g.db_queries, g.db_seconds = 0, 0.0
+        with replica.connect() as conn:
+            conn.execute(sa.text("SELECT 1"))
+        assert g.db_queries == 1
@@ -0,0 +1,26 @@
+"""
+Table export: NDJSON/CSV streams, optionally as a gzip file
+"""
+
+import gzip
+import json
+
+
+def test_ndjson_export_lists_every_row(client, submit):
+    ids = [submit("Tab. Napa 500mg"), submit("Tab. Seclo 20mg")]
+
+    response = client.get('/admin/export/prescriptions?format=ndjson')
+
+    assert response.status_code == 200
+    assert [json.loads(line)["id"] for line in response.data.splitlines()] == ids
+
+
+def test_gzip_export_is_a_gzip_file_not_an_encoding(client, submit):
+    submit("Tab. Napa 500mg")
+
+    response = client.get('/admin/export/users?format=csv&gzip=1')
+
+    assert response.mimetype == 'application/gzip'
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Content-Disposition'].endswith('.csv.gz')
+    assert gzip.decompress(response.data).decode('utf-8').splitlines()[0].startswith('id,')
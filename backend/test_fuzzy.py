@@ -0,0 +1,47 @@
+"""
+Fuzzy medicine matching: misspellings are found, ordinary words are not
+"""
+
+import pytest
+
+from app import MEDICINE_INDEX, analyze_prescription_mock
+from fuzzy import allowed_distance, bounded_levenshtein
+
+
+def names(text):
+    return sorted(m["name"] for m in analyze_prescription_mock(text)["medicines"])
+
+
+@pytest.mark.parametrize("token, edits", [("napa", 0), ("serge", 0), ("stolen", 1), ("ibuprofn", 1),
+                                          ("azithromicin", 2)])
+def test_allowed_edits_grow_with_length(token, edits):
+    assert allowed_distance(token) == edits
+
+
+@pytest.mark.parametrize("misspelled, name", [("paracetamoll", "paracetamol"), ("omeprazol", "omeprazole"),
+                                              ("azithromicin", "azithromycin"), ("stollin", "stolin"),
+                                              ("ibuprofn", "ibuprofen")])
+def test_misspellings_match(misspelled, name):
+    assert MEDICINE_INDEX.match_text(f"Tab. {misspelled} 500mg") == {name: misspelled}
+
+
+@pytest.mark.parametrize("text", ["Patient's papa was stolen", "Tab. Nape 500mg", "Take a nap",
+                                  "Compared to Stalin", "Serge from the college", "Go to the kitchen"])
+def test_common_words_do_not_match(text):
+    assert MEDICINE_INDEX.match_text(text) == {}
+
+
+def test_mock_analysis_ignores_lookalike_words():
+    result = analyze_prescription_mock("Patient's papa was stolen. Tab. Nape 500mg")
+
+    assert result["medicines"] == []
+    assert result["interactions"] == []
+
+
+def test_exact_names_still_match_alongside_lookalikes():
+    assert names("Patient's papa was stolen. Tab. Napa 500mg") == names("Tab. Napa 500mg")
+
+
+def test_bounded_levenshtein_stops_at_limit():
+    assert bounded_levenshtein("stolen", "stolin", 1) == 1
+    assert bounded_levenshtein("paracetamol", "pantoprazole", 2) == 3
@@ -0,0 +1,121 @@
+"""
+Idempotency-Key: replay, fingerprint mismatches, per-user scope, what is stored and streamed approvals
+"""
+
+import io
+from datetime import datetime, timedelta
+
+import app as flask_app
+from models import db, IdempotencyRecord, Prescription
+
+
+def analyze(client, key, text="Tab. Napa 500mg", user_id=1, file=None):
+    data = {'user_id': str(user_id), 'text': text}
+    if file is not None:
+        data['file'] = (io.BytesIO(file), 'rx.pdf')
+    return client.post('/analyze', data=data, headers={'Idempotency-Key': key},
+                       content_type='multipart/form-data')
+
+
+def test_retry_replays_the_stored_response(client):
+    first = analyze(client, 'k1')
+    retry = analyze(client, 'k1')
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json() == first.get_json()
+    assert Prescription.query.count() == 1
+
+
+def test_retry_with_same_upload_replays(client):
+    first = analyze(client, 'k1', file=b'%PDF-1.4 same bytes')
+    retry = analyze(client, 'k1', file=b'%PDF-1.4 same bytes')
+
+    assert retry.headers.get('Idempotent-Replayed') == 'true'
+    assert retry.get_json() == first.get_json()
+
+
+def test_reused_key_with_different_body_is_rejected(client):
+    analyze(client, 'k1', text="Tab. Napa 500mg")
+
+    assert analyze(client, 'k1', text="Tab. Seclo 20mg").status_code == 422
+    assert analyze(client, 'k1', file=b'%PDF-1.4 other').status_code == 422
+    assert Prescription.query.count() == 1
+
+
+def test_keys_are_scoped_per_user(client):
+    analyze(client, 'shared', user_id=1)
+    other = analyze(client, 'shared', user_id=2)
+
+    assert other.status_code == 201
+    assert 'Idempotent-Replayed' not in other.headers
+    assert Prescription.query.count() == 2
+
+
+def test_client_errors_are_not_stored(client):
+    rejected = client.post('/analyze', data={'user_id': '1'}, headers={'Idempotency-Key': 'k1'})
+    assert rejected.status_code == 400
+    assert IdempotencyRecord.query.count() == 0
+
+    fixed = analyze(client, 'k1')
+    assert fixed.status_code == 201
+    assert 'Idempotent-Replayed' not in fixed.headers
+
+
+def test_in_flight_key_conflicts_until_its_lock_expires(client):
+    analyze(client, 'k1')
+    record = IdempotencyRecord.query.one()
+    record.status_code = None  # as if the first request were still running
+    db.session.commit()
+
+    assert analyze(client, 'k1').status_code == 409
+
+    record.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    retry = analyze(client, 'k1')
+    assert retry.status_code == 201
+    assert 'Idempotent-Replayed' not in retry.headers
+
+
+def test_stored_response_outlives_the_in_flight_lock(client):
+    analyze(client, 'k1')
+
+    record = IdempotencyRecord.query.one()
+    assert record.expires_at - datetime.utcnow() > timedelta(hours=1)
+
+
+def test_admin_routes_share_one_scope(client, submit):
+    pid = submit("Tab. Napa 500mg")
+    body = {'actions': [{'id': pid, 'action': 'status', 'status': 'approved'}]}
+
+    first = client.post('/admin/prescriptions/bulk', json=body, headers={'Idempotency-Key': 'b1'})
+    retry = client.post('/admin/prescriptions/bulk', json=body, headers={'Idempotency-Key': 'b1'})
+
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json() == first.get_json()
+    assert IdempotencyRecord.query.one().owner == 'admin'
+
+
+def test_retried_streaming_approval_is_refused(client, submit):
+    pid = submit("Tab. Napa 500mg")
+    first = client.post(f'/admin/prescription/{pid}/approve/stream', json={}, headers={'Idempotency-Key': 'k1'})
+    assert b'event: done' in first.data
+
+    retry = client.post(f'/admin/prescription/{pid}/approve/stream', json={}, headers={'Idempotency-Key': 'k1'})
+
+    assert retry.status_code == 409
+    assert db.session.get(Prescription, pid).status == 'approved'
+
+
+def test_streaming_approval_that_loses_the_race_is_not_saved(client, submit, monkeypatch):
+    pid = submit("Tab. Napa 500mg")
+    original = flask_app.stream_analysis_with_ai
+
+    def approved_meanwhile(text, file_path=None):
+        yield from original(text, file_path)
+        assert client.post(f'/admin/prescription/{pid}/approve', json={}).status_code == 200
+
+    monkeypatch.setattr(flask_app, 'stream_analysis_with_ai', approved_meanwhile)
+    response = client.post(f'/admin/prescription/{pid}/approve/stream', json={})
+
+    assert b'already approved' in response.data and b'event: done' not in response.data
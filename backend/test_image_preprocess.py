@@ -0,0 +1,30 @@
+"""
+Image preprocessing: smaller grayscale JPEGs for the model, cached per upload
+"""
+
+import io
+
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+
+import image_preprocess
+
+
+def photo(size=(2000, 1200)):
+    out = io.BytesIO()
+    Image.effect_noise(size, 64).convert('RGB').save(out, 'PNG')
+    return out.getvalue()
+
+
+def test_prepare_downscales_and_caches():
+    data = photo()
+
+    first = image_preprocess.prepare(data, 'rx.png')
+    second = image_preprocess.prepare(data, 'rx.png')
+
+    assert first["mime_type"] == "image/jpeg" and first["bytes"] < first["original_bytes"]
+    with Image.open(io.BytesIO(first["data"])) as img:
+        assert max(img.size) == image_preprocess.IMAGE_MAX_SIDE
+    assert not first["cached"] and second["cached"]
+    assert second["data"] == first["data"]
@@ -0,0 +1,49 @@
+"""
+Metrics: totals survive recycled workers, and failed requests are counted
+"""
+
+import json
+import os
+
+import pytest
+
+import app as flask_app
+import metrics
+
+DEAD_PID = 999999999  # Above any real pid_max
+
+
+def _requests_total(text, status):
+    prefix = 'http_requests_total{method="GET",route="/users",status="%s"} ' % status
+    return sum(int(line[len(prefix):]) for line in text.splitlines() if line.startswith(prefix))
+
+
+def test_dead_worker_totals_are_kept(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_DIR', str(tmp_path))
+    monkeypatch.setattr(metrics, 'REGISTRY', metrics.Registry())
+    dead = {"counters": [["http_requests_total", [["method", "GET"], ["route", "/users"], ["status", "200"]], 7]],
+            "histograms": []}
+    (tmp_path / f"metrics_{DEAD_PID}.json").write_text(json.dumps(dead))
+
+    first = metrics.render()
+    assert not os.path.exists(tmp_path / f"metrics_{DEAD_PID}.json")
+
+    (tmp_path / f"metrics_{DEAD_PID + 1}.json").write_text(json.dumps(dead))
+    second = metrics.render()
+
+    assert _requests_total(first, 200) == 7
+    assert _requests_total(second, 200) == 14
+
+
+def test_unhandled_exception_is_counted_as_500(client, monkeypatch):
+    monkeypatch.setattr(metrics, 'REGISTRY', metrics.Registry())
+    monkeypatch.setitem(flask_app.app.config, 'PROPAGATE_EXCEPTIONS', True)
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(flask_app, 'jsonify', broken)
+
+    with pytest.raises(RuntimeError):
+        client.get('/users')
+
+    assert _requests_total(metrics.render(), 500) == 1
@@ -0,0 +1,131 @@
+"""
+Re-analysis: which analyses a knowledge-base change makes stale, and what a run stamps
+"""
+
+import json
+
+import pytest
+import sqlalchemy as sa
+
+import reanalysis
+from knowledge_base import KB_VERSION
+from models import db, AnalysisMeta, KnowledgeBaseSnapshot, Prescription, ReanalysisJob
+
+
+@pytest.fixture
+def approved(client, submit):
+    def approved(text):
+        pid = submit(text)
+        assert client.post(f'/admin/prescription/{pid}/approve', json={}).status_code == 200
+        return pid
+    return approved
+
+
+def change_medicine(key):
+    # Make the stored catalogue look like the one before an edit to key
+    snapshot = KnowledgeBaseSnapshot.query.one()
+    fingerprints = json.loads(snapshot.fingerprints_json)
+    fingerprints[key] = 'edited'
+    snapshot.kb_version = 'old'
+    snapshot.fingerprints_json = json.dumps(fingerprints)
+    AnalysisMeta.query.filter(AnalysisMeta.kb_version == KB_VERSION).update({"kb_version": 'old'})
+    db.session.commit()
+
+
+def run(app, analyze):
+    job = ReanalysisJob(status='queued', kb_version=KB_VERSION, prompt_version='', changed_medicines_json='[]')
+    db.session.add(job)
+    db.session.commit()
+    reanalysis._run(app, job.id, analyze, False, 20, 0)
+    # The run used its own session
+    db.session.expire_all()
+    return db.session.get(ReanalysisJob, job.id)
+
+
+def kb_version(pid):
+    return db.session.get(AnalysisMeta, pid).kb_version
+
+
+def analyzer(fail_on=()):
+    seen = []
+
+    def analyze(text, file_path=None):
+        seen.append(text)
+        if text in fail_on:
+            raise RuntimeError("model unavailable")
+        return {"medicines": [], "explanation": "re-analyzed", "analysis_confidence": 0.9}
+    analyze.seen = seen
+    return analyze
+
+
+def test_only_prescriptions_mentioning_a_changed_medicine_are_recomputed(app, approved):
+    napa = approved("Tab. Napa 500mg")
+    seclo = approved("Cap. Omeprazole 20mg")
+    change_medicine('napa')
+
+    assert reanalysis.plan()["affected"] == 1
+    analyze = analyzer()
+    job = run(app, analyze)
+
+    assert job.status == 'done' and job.processed == 1
+    assert analyze.seen == ["Tab. Napa 500mg"]
+    assert kb_version(napa) == kb_version(seclo) == KB_VERSION
+    assert reanalysis.plan()["affected"] == 0
+
+
+def test_failed_reanalysis_stays_stale(app, approved):
+    napa = approved("Tab. Napa 500mg")
+    approved("Tab. Napa 500mg and Cap. Omeprazole")
+    change_medicine('napa')
+
+    job = run(app, analyzer(fail_on={"Tab. Napa 500mg"}))
+
+    assert (job.processed, job.failed) == (1, 1)
+    assert kb_version(napa) == 'old'
+    assert reanalysis.plan()["affected"] == 1
+
+    analyze = analyzer()
+    run(app, analyze)
+    assert analyze.seen == ["Tab. Napa 500mg"]
+    assert kb_version(napa) == KB_VERSION
+
+
+def test_legacy_approved_prescriptions_are_stale(app, approved, submit):
+    approved("Cap. Omeprazole 20mg")
+    legacy_ai, legacy_custom = submit("Tab. Napa 500mg"), submit("Tab. Seclo 20mg")
+    for pid, analysis in ((legacy_ai, {"medicines": [], "analysis_confidence": 0.85}),
+                          (legacy_custom, {"medicines": [], "explanation": "Written by the doctor"})):
+        p = db.session.get(Prescription, pid)
+        p.status, p.analysis_json = 'approved', json.dumps(analysis)
+    db.session.commit()
+
+    assert reanalysis.plan()["affected"] == 1
+    meta = db.session.get(AnalysisMeta, legacy_custom)
+    assert meta.source == 'custom' and meta.kb_version is None
+
+    analyze = analyzer()
+    run(app, analyze)
+    assert analyze.seen == ["Tab. Napa 500mg"]
+    assert kb_version(legacy_ai) == KB_VERSION
+
+
+def test_model_calls_run_outside_a_transaction(app, approved):
+    napa = approved("Tab. Napa 500mg")
+    deleted = approved("Tab. Napa 500mg and Cap. Omeprazole")
+    change_medicine('napa')
+    open_transactions = []
+
+    def analyze(text, file_path=None):
+        open_transactions.append(db.session().in_transaction())
+        if text == "Tab. Napa 500mg":
+            # Deleted by someone else while the model runs
+            with db.engine.begin() as conn:
+                conn.execute(sa.delete(Prescription).where(Prescription.id == deleted))
+        return {"medicines": [], "explanation": "re-analyzed", "analysis_confidence": 0.9}
+
+    job = run(app, analyze)
+
+    assert open_transactions == [False, False]
+    assert (job.status, job.processed, job.failed) == ('done', 1, 0)
+    assert json.loads(db.session.get(Prescription, napa).analysis_json)["explanation"] == "re-analyzed"
+    assert db.session.get(Prescription, deleted) is None
@@ -0,0 +1,80 @@
+"""
+Retention: uploads move hot -> compressed -> cold, old analyses are trimmed, passes never overlap
+"""
+
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import retention
+from models import db, AnalysisArchive, ArchivedUpload, Prescription
+
+
+def old_upload(app, name, data, days):
+    path = os.path.join(app.config['UPLOAD_FOLDER'], name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    past = time.time() - days * 86400
+    os.utime(path, (past, past))
+    return path
+
+
+def test_old_uploads_are_compressed_and_still_served(app, client):
+    data = b'%PDF-1.4 ' + b'prescription ' * 200
+    path = old_upload(app, 'old.pdf', data, retention.COMPRESS_AFTER_DAYS + 1)
+    recent = old_upload(app, 'recent.pdf', data, 0)
+
+    result = retention.run(app)
+
+    assert result["compressed"] == 1 and result["bytes_saved"] > 0
+    assert not os.path.exists(path) and os.path.exists(recent)
+    assert db.session.get(ArchivedUpload, 'old.pdf').tier == 'compressed'
+    assert client.get('/uploads/old.pdf').data == data
+
+
+def test_compressed_uploads_move_to_cold_storage(app, client):
+    data = b'%PDF-1.4 cold'
+    old_upload(app, 'cold.pdf', data, retention.COLD_AFTER_DAYS + 1)
+
+    result = retention.run(app)
+
+    assert result["compressed"] == result["cold"] == 1
+    assert db.session.get(ArchivedUpload, 'cold.pdf').tier == 'cold'
+    assert os.listdir(app.config['UPLOAD_FOLDER']) in ([], [retention.LOCK_FILENAME])
+    assert client.get('/uploads/cold.pdf').data == data
+
+    retention.remove_uploads(app, ['cold.pdf'])
+    assert db.session.get(ArchivedUpload, 'cold.pdf') is None
+
+
+def test_reviewed_analyses_are_trimmed_after_archive_age(app, submit):
+    old, pending = submit("Tab. Napa 500mg"), submit("Tab. Seclo 20mg")
+    analysis = {"medicines": [], "raw_gemini_response": "long model output"}
+    for pid, status in ((old, 'approved'), (pending, 'pending')):
+        p = db.session.get(Prescription, pid)
+        p.status, p.analysis_json = status, json.dumps(analysis)
+        p.created_at = datetime.utcnow() - timedelta(days=retention.ARCHIVE_AFTER_DAYS + 1)
+    db.session.commit()
+
+    assert retention.run(app)["analyses_archived"] == 1
+
+    db.session.expire_all()
+    assert "raw_gemini_response" not in json.loads(db.session.get(Prescription, old).analysis_json)
+    assert retention.load_archived_fields(old) == {"raw_gemini_response": "long model output"}
+    assert db.session.get(AnalysisArchive, pending) is None
+
+
+def test_only_one_pass_runs_at_a_time(app, client):
+    handle = retention._acquire(app.config['UPLOAD_FOLDER'])
+    try:
+        assert client.post('/admin/retention/run').status_code == 409
+        assert retention.run(app) is None
+    finally:
+        retention._release(handle)
+
+    assert retention.run(app) is not None
+    assert client.post('/admin/retention/run').status_code == 202
+    # Let the background pass finish before the database is reset
+    assert retention._run_lock.acquire(timeout=10)
+    retention._run_lock.release()
@@ -0,0 +1,94 @@
+"""
+Review queue: leases, validation and re-enqueueing prescriptions moved back to pending
+"""
+
+from datetime import datetime, timedelta
+
+from models import db, ReviewQueueItem
+
+
+def claim(client, reviewer, **body):
+    return client.post('/admin/queue/claim', json={'reviewer': reviewer, **body})
+
+
+def claimed_ids(response):
+    assert response.status_code == 200, response.get_json()
+    return [p['id'] for p in response.get_json()['prescriptions']]
+
+
+def test_claims_never_overlap(client, submit):
+    ids = [submit(f"Tab. Napa 500mg #{i}") for i in range(5)]
+
+    first = claimed_ids(claim(client, 'alice', count=3))
+    second = claimed_ids(claim(client, 'bob', count=3))
+
+    assert len(first) == 3
+    assert not set(first) & set(second)
+    assert sorted(first + second) == ids
+
+
+def test_high_cost_drugs_are_claimed_first(client, submit):
+    submit("Tab. Napa 500mg")
+    urgent = submit("Inj. Remdesivir 100mg")
+
+    assert claimed_ids(claim(client, 'alice', count=1)) == [urgent]
+
+
+def test_expired_lease_is_claimable_again(client, submit):
+    pid = submit("Tab. Napa 500mg")
+    assert claimed_ids(claim(client, 'alice', count=1)) == [pid]
+    assert claimed_ids(claim(client, 'bob', count=1)) == []
+
+    item = db.session.get(ReviewQueueItem, pid)
+    item.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+    assert claimed_ids(claim(client, 'bob', count=1)) == [pid]
+
+
+def test_renew_and_release_only_touch_own_leases(client, submit):
+    pid = submit("Tab. Napa 500mg")
+    claimed_ids(claim(client, 'alice', count=1))
+
+    renewed = client.post('/admin/queue/renew', json={'reviewer': 'bob', 'ids': [pid]})
+    assert renewed.get_json()['renewed'] == []
+    renewed = client.post('/admin/queue/renew', json={'reviewer': 'alice', 'ids': [pid], 'lease_seconds': 60})
+    assert renewed.get_json()['renewed'] == [pid]
+
+    released = client.post('/admin/queue/release', json={'reviewer': 'alice', 'ids': [pid]})
+    assert released.get_json()['released'] == [pid]
+    assert claimed_ids(claim(client, 'bob', count=1)) == [pid]
+
+
+def test_invalid_count_and_lease_are_rejected(client, submit):
+    submit("Tab. Napa 500mg")
+    for body in ({'count': 'ten'}, {'count': 0}, {'count': True}, {'lease_seconds': -5}, {'lease_seconds': '60'}):
+        assert claim(client, 'alice', **body).status_code == 400, body
+
+    renewed = client.post('/admin/queue/renew', json={'reviewer': 'alice', 'ids': [], 'lease_seconds': 'soon'})
+    assert renewed.status_code == 400
+
+
+def test_moving_back_to_pending_requeues(client, submit):
+    pid = submit("Tab. Napa 500mg")
+    other = submit("Tab. Seclo 20mg")
+
+    client.put(f'/admin/prescription/{pid}', json={'status': 'approved'})
+    client.post('/admin/prescriptions/bulk', json={'actions': [{'id': other, 'action': 'status', 'status': 'approved'}]})
+    assert claimed_ids(claim(client, 'alice', count=5)) == []
+
+    assert client.put(f'/admin/prescription/{pid}', json={'status': 'pending'}).status_code == 200
+    response = client.post('/admin/prescriptions/bulk',
+                           json={'actions': [{'id': other, 'action': 'status', 'status': 'pending'}]})
+    assert response.get_json()['results'][0]['ok']
+
+    assert sorted(claimed_ids(claim(client, 'alice', count=5))) == [pid, other]
+
+
+def test_setting_pending_again_keeps_the_lease(client, submit):
+    pid = submit("Tab. Napa 500mg")
+    claimed_ids(claim(client, 'alice', count=1))
+
+    client.put(f'/admin/prescription/{pid}', json={'status': 'pending'})
+
+    assert db.session.get(ReviewQueueItem, pid).claimed_by == 'alice'
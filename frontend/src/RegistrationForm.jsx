@@ -1,7 +1,7 @@
 import { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Eye, EyeOff } from 'lucide-react';
-import { getApiUrl } from './config';
+import { apiFetch } from './config';
 
 export default function RegistrationForm() {
   const [formData, setFormData] = useState({
@@ -59,7 +59,7 @@ export default function RegistrationForm() {
     setIsLoading(true);
     
     try {
-      const response = await fetch(getApiUrl("/register"), {
+      const response = await apiFetch("/register", {
         method: "POST",
         headers: {
           "Content-Type": "application/json"
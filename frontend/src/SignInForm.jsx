@@ -1,6 +1,6 @@
 import { useNavigate } from 'react-router-dom';
 import { useState } from 'react';
-import { getApiUrl } from './config';
+import { apiFetch } from './config';
 
 export default function SignInForm() {
   const [signInData, setSignInData] = useState({
@@ -26,7 +26,7 @@ export default function SignInForm() {
     setIsLoading(true);
 
     try {
-      const response = await fetch(getApiUrl("/login"), {
+      const response = await apiFetch("/login", {
         method: "POST",
         headers: {
           "Content-Type": "application/json"
@@ -30,7 +30,7 @@ import {
   XCircle,
   Image as ImageIcon
 } from 'lucide-react';
-import { getApiUrl, getUploadUrl } from './config';
+import { apiFetch, getUploadUrl } from './config';
 
 const AdminDashboard = () => {
   const [darkMode, setDarkMode] = useState(false);
@@ -47,6 +47,8 @@ const AdminDashboard = () => {
   const [usersLoading, setUsersLoading] = useState(false);
   const [expandedEditForms, setExpandedEditForms] = useState({});
   const [expandedViewPanels, setExpandedViewPanels] = useState({});
+  const [approvalStream, setApprovalStream] = useState(null);
+  const [selectedIds, setSelectedIds] = useState([]);
 
   const [editForm, setEditForm] = useState({
     medicines: [],
@@ -66,7 +68,7 @@ const AdminDashboard = () => {
     setError('');
     
     try {
-      const response = await fetch(getApiUrl('/admin/prescriptions'));
+      const response = await apiFetch('/admin/prescriptions');
       
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
@@ -86,7 +88,7 @@ const AdminDashboard = () => {
     setUsersLoading(true);
     
     try {
-      const response = await fetch(getApiUrl('/admin/users'));
+      const response = await apiFetch('/admin/users');
       
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
@@ -140,7 +142,7 @@ const AdminDashboard = () => {
         recommendations: editForm.recommendations
       };
 
-      const response = await fetch(getApiUrl(`/admin/prescription/${id}`), {
+      const response = await apiFetch(`/admin/prescription/${id}`, {
         method: 'PUT',
         headers: {
           'Content-Type': 'application/json',
@@ -172,8 +174,10 @@ const AdminDashboard = () => {
   };
 
   const handleApprove = async (id) => {
+    setApprovalStream({ id, text: '', medicines: [], notice: '' });
     try {
-      const response = await fetch(getApiUrl(`/admin/prescription/${id}/approve`), {
+      // Server-sent events: partial model output and medicines arrive while the analysis runs
+      const response = await apiFetch(`/admin/prescription/${id}/approve/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -181,14 +185,46 @@ const AdminDashboard = () => {
         body: JSON.stringify({})
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error('Failed to approve prescription');
       }
 
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let finished = false;
+      while (!finished) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const frames = buffer.split('\n\n');
+        buffer = frames.pop();
+        for (const frame of frames) {
+          const event = frame.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(frame.match(/^data: (.*)$/m)?.[1] || '{}');
+          if (event === 'delta') {
+            setApprovalStream(s => ({ ...s, text: s.text + data.text }));
+          } else if (event === 'medicine') {
+            setApprovalStream(s => ({ ...s, medicines: [...s.medicines, data] }));
+          } else if (event === 'fallback') {
+            setApprovalStream(s => ({ ...s, notice: data.reason }));
+          } else if (event === 'error') {
+            throw new Error(data.error);
+          } else if (event === 'done') {
+            finished = true;
+          }
+        }
+      }
+      if (!finished) {
+        throw new Error('Approval stream ended early');
+      }
+
+      setApprovalStream(null);
       await fetchPrescriptions();
       alert('Prescription approved successfully!');
     } catch (error) {
       console.error('Error approving prescription:', error);
+      setApprovalStream(null);
       alert('Failed to approve prescription. Please try again.');
     }
   };
@@ -198,7 +234,7 @@ const AdminDashboard = () => {
     if (!reason) return;
 
     try {
-      const response = await fetch(getApiUrl(`/admin/prescription/${id}/reject`), {
+      const response = await apiFetch(`/admin/prescription/${id}/reject`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -218,13 +254,54 @@ const AdminDashboard = () => {
     }
   };
 
+  const toggleSelected = (id) => {
+    setSelectedIds(ids => ids.includes(id) ? ids.filter(other => other !== id) : [...ids, id]);
+  };
+
+  // Apply one action to every selected prescription in a single request
+  const handleBulk = async (action) => {
+    if (selectedIds.length === 0) return;
+    const item = { action };
+    if (action === 'reject') {
+      const reason = prompt('Please provide a reason for rejection:');
+      if (!reason) return;
+      item.reason = reason;
+    } else if (action === 'delete' && !window.confirm(`Delete ${selectedIds.length} prescriptions?`)) {
+      return;
+    }
+
+    try {
+      const response = await apiFetch('/admin/prescriptions/bulk', {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ actions: selectedIds.map(id => ({ ...item, id })) })
+      });
+      const data = await response.json();
+      if (!response.ok) {
+        throw new Error(data.error || 'Failed to apply bulk action');
+      }
+
+      const failed = data.results.filter(result => !result.ok);
+      setSelectedIds(failed.map(result => result.id));
+      await fetchPrescriptions();
+      alert(failed.length
+        ? `${data.message}. Failed: ${failed.map(result => `#${result.id} (${result.error})`).join(', ')}`
+        : data.message);
+    } catch (error) {
+      console.error('Error applying bulk action:', error);
+      alert(`Failed to apply bulk action: ${error.message}`);
+    }
+  };
+
   const handleDelete = async (id) => {
     if (!window.confirm('Are you sure you want to delete this prescription?')) {
       return;
     }
 
     try {
-      const response = await fetch(getApiUrl(`/prescription/${id}`), {
+      const response = await apiFetch(`/prescription/${id}`, {
         method: 'DELETE'
       });
 
@@ -485,6 +562,34 @@ const AdminDashboard = () => {
         <main className="flex-1 p-6">
           {!showUserPanel ? (
             <div>
+              {/* Streaming AI Analysis */}
+              {approvalStream && (
+                <div className={`${darkMode ? 'bg-gray-800 border-gray-700' : 'bg-white border-gray-200'} rounded-lg shadow-sm border p-6 mb-6`}>
+                  <div className="flex items-center space-x-2 mb-3">
+                    <Loader size={16} className="animate-spin text-blue-500" />
+                    <h3 className={`font-semibold ${darkMode ? 'text-white' : 'text-gray-900'}`}>
+                      Analyzing prescription #{approvalStream.id}
+                    </h3>
+                  </div>
+                  {approvalStream.notice && (
+                    <p className="text-sm text-yellow-600 mb-2">{approvalStream.notice}</p>
+                  )}
+                  {approvalStream.medicines.length > 0 && (
+                    <div className="flex flex-wrap gap-2 mb-3">
+                      {approvalStream.medicines.map((medicine, index) => (
+                        <span key={index} className={`flex items-center space-x-1 px-3 py-1 rounded-full text-sm ${darkMode ? 'bg-green-900/30 text-green-300' : 'bg-green-100 text-green-800'}`}>
+                          <Pill size={14} />
+                          <span>{medicine.name}</span>
+                        </span>
+                      ))}
+                    </div>
+                  )}
+                  <pre className={`whitespace-pre-wrap text-sm max-h-64 overflow-y-auto ${darkMode ? 'text-gray-300' : 'text-gray-700'}`}>
+                    {approvalStream.text}
+                  </pre>
+                </div>
+              )}
+
               {/* Search and Filters */}
               <div className={`${darkMode ? 'bg-gray-800' : 'bg-white'} rounded-lg shadow-sm border ${darkMode ? 'border-gray-700' : 'border-gray-200'} p-6 mb-6`}>
                 <div className="flex flex-wrap gap-4">
@@ -531,6 +636,42 @@ const AdminDashboard = () => {
                 </div>
               </div>
 
+              {/* Bulk Actions */}
+              {selectedIds.length > 0 && (
+                <div className={`${darkMode ? 'bg-gray-800 border-gray-700' : 'bg-white border-gray-200'} rounded-lg shadow-sm border p-4 mb-6 flex flex-wrap items-center gap-2`}>
+                  <span className={`mr-2 text-sm font-medium ${darkMode ? 'text-gray-300' : 'text-gray-700'}`}>
+                    {selectedIds.length} selected
+                  </span>
+                  <button
+                    onClick={() => handleBulk('approve')}
+                    className={`flex items-center space-x-2 px-4 py-2 rounded-lg text-sm font-medium ${darkMode ? 'bg-green-600 hover:bg-green-700' : 'bg-green-500 hover:bg-green-600'} text-white`}
+                  >
+                    <Check size={16} />
+                    <span>Approve</span>
+                  </button>
+                  <button
+                    onClick={() => handleBulk('reject')}
+                    className={`flex items-center space-x-2 px-4 py-2 rounded-lg text-sm font-medium ${darkMode ? 'bg-red-600 hover:bg-red-700' : 'bg-red-500 hover:bg-red-600'} text-white`}
+                  >
+                    <X size={16} />
+                    <span>Reject</span>
+                  </button>
+                  <button
+                    onClick={() => handleBulk('delete')}
+                    className={`flex items-center space-x-2 px-4 py-2 rounded-lg text-sm font-medium ${darkMode ? 'bg-red-600 hover:bg-red-700' : 'bg-red-500 hover:bg-red-600'} text-white`}
+                  >
+                    <Trash2 size={16} />
+                    <span>Delete</span>
+                  </button>
+                  <button
+                    onClick={() => setSelectedIds([])}
+                    className={`px-4 py-2 rounded-lg text-sm font-medium ${darkMode ? 'text-gray-300 hover:bg-gray-700' : 'text-gray-600 hover:bg-gray-100'}`}
+                  >
+                    Clear
+                  </button>
+                </div>
+              )}
+
               {/* Prescriptions Table */}
               <div className={`${darkMode ? 'bg-gray-800' : 'bg-white'} rounded-lg shadow-sm border ${darkMode ? 'border-gray-700' : 'border-gray-200'} overflow-hidden`}>
                 {loading ? (
@@ -565,6 +706,14 @@ const AdminDashboard = () => {
                         {/* Summary Row */}
                         <div className="flex items-center justify-between px-6 py-5 cursor-pointer group" onClick={() => toggleViewPanelExpansion(prescription.id)}>
                           <div className="flex items-center space-x-5">
+                            <input
+                              type="checkbox"
+                              checked={selectedIds.includes(prescription.id)}
+                              onClick={(e) => e.stopPropagation()}
+                              onChange={() => toggleSelected(prescription.id)}
+                              className="w-4 h-4"
+                              title="Select for bulk action"
+                            />
                             <div className={`rounded-full p-3 ${darkMode ? 'bg-blue-900' : 'bg-blue-100'}`}>
                               <FileText size={28} className={darkMode ? 'text-blue-300' : 'text-blue-500'} />
                             </div>
@@ -24,3 +24,26 @@ export const getApiUrl = (endpoint) => {
 export const getUploadUrl = (filename) => {
   return `${currentConfig.UPLOAD_BASE_URL}/uploads/${filename}`;
 };
+
+// After a write the backend returns X-DB-Primary-Until (a server timestamp);
+// echoing it keeps this client's reads on the primary database until then,
+// so a replica that is still catching up never hides the write.
+const PRIMARY_UNTIL_HEADER = 'X-DB-Primary-Until';
+const PRIMARY_UNTIL_KEY = 'dbPrimaryUntil';
+// Stop sending it well after it can matter, allowing for clock skew
+const PRIMARY_UNTIL_GRACE_SECONDS = 60;
+
+export const apiFetch = async (endpoint, options = {}) => {
+  const headers = new Headers(options.headers || {});
+  const primaryUntil = sessionStorage.getItem(PRIMARY_UNTIL_KEY);
+  if (primaryUntil && parseFloat(primaryUntil) + PRIMARY_UNTIL_GRACE_SECONDS > Date.now() / 1000) {
+    headers.set(PRIMARY_UNTIL_HEADER, primaryUntil);
+  }
+
+  const response = await fetch(getApiUrl(endpoint), { ...options, headers });
+  const until = response.headers.get(PRIMARY_UNTIL_HEADER);
+  if (until) {
+    sessionStorage.setItem(PRIMARY_UNTIL_KEY, until);
+  }
+  return response;
+};
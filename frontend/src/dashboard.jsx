@@ -1,8 +1,10 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { PlusCircle, LogOut, ChevronDown, ChevronUp, Upload, FileText, Clock, AlertTriangle, Lightbulb, Trash2, Search, Filter, Moon, Sun, Download, Image as ImageIcon, Calendar, Check, X } from 'lucide-react';
-import { getApiUrl, getUploadUrl } from './config';
+import { apiFetch, getUploadUrl } from './config';
 
 const Dashboard = () => {
+  // Reused across retries of the same submission so the backend can de-duplicate it
+  const submissionKey = useRef(null);
   const [user, setUser] = useState(null);
   const [prescriptionText, setPrescriptionText] = useState('');
   const [selectedFile, setSelectedFile] = useState(null);
@@ -35,12 +37,17 @@ const Dashboard = () => {
     }
   }, []);
 
+  // Edited input is a new submission, not a retry of the last one
+  useEffect(() => {
+    submissionKey.current = null;
+  }, [prescriptionText, selectedFile]);
+
   const fetchPrescriptions = async (userId) => {
     setLoading(true);
     setError('');
     
     try {
-      const response = await fetch(getApiUrl(`/dashboard?user_id=${userId}`));
+      const response = await apiFetch(`/dashboard?user_id=${userId}`);
       
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
@@ -118,8 +125,13 @@ const Dashboard = () => {
         formData.append('file', selectedFile);
       }
 
-      const response = await fetch(getApiUrl('/analyze'), {
+      if (!submissionKey.current) {
+        submissionKey.current = `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+      }
+
+      const response = await apiFetch('/analyze', {
         method: 'POST',
+        headers: { 'Idempotency-Key': submissionKey.current },
         body: formData
       });
       
@@ -128,6 +140,7 @@ const Dashboard = () => {
       }
       
       const result = await response.json();
+      submissionKey.current = null;
       
       // Refresh prescriptions list
       await fetchPrescriptions(user.id);
@@ -164,7 +177,7 @@ const Dashboard = () => {
     }
 
     try {
-      const response = await fetch(getApiUrl(`/prescription/${prescriptionId}`), {
+      const response = await apiFetch(`/prescription/${prescriptionId}`, {
         method: 'DELETE'
       });
 